@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+ANN index tuning report for the RAG Chatbot knowledge base
+Measures recall@k of the LanceDB vector index against exact search, next to
+p50/p99 query latency, for a grid of nprobes / refine_factor settings.
+
+Usage:
+    python benchmark_ann_index.py [--kb-path PATH] [--k 5] [--queries 200] [--build]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+import lancedb
+from rag_app.vector_index import (ANN_INDEX_MIN_ROWS, build_vector_index, choose_index_params,
+                                  has_vector_index, apply_search_params)
+
+VECTOR_TABLE_NAME = "documents"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Report ANN recall@k and latency against exact search")
+    parser.add_argument("--kb-path", default=os.environ.get("RAG_PATH_CHAT_DATA_KNOWLEDGE_BASE",
+                                                            os.path.join("chat_data", "knowledge_base")))
+    parser.add_argument("--k", type=int, default=5, help="Number of results per query")
+    parser.add_argument("--queries", type=int, default=200, help="Number of sampled query vectors")
+    parser.add_argument("--nprobes", type=int, nargs="+", default=[1, 5, 10, 20, 50, 100])
+    parser.add_argument("--refine", type=int, nargs="+", default=[0, 5, 10])
+    parser.add_argument("--build", action="store_true", help="(Re)build the index before measuring")
+    parser.add_argument("--partitions", type=int, default=None, help="Override num_partitions when building")
+    parser.add_argument("--sub-vectors", type=int, default=None, help="Override num_sub_vectors when building")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+def percentile_ms(latencies, q):
+    return float(np.percentile(latencies, q) * 1000)
+
+def main():
+    args = parse_args()
+
+    db = lancedb.connect(args.kb_path)
+    if VECTOR_TABLE_NAME not in db.table_names():
+        print(f"Table {VECTOR_TABLE_NAME} not found in {args.kb_path}")
+        sys.exit(1)
+    table = db.open_table(VECTOR_TABLE_NAME)
+
+    # Load all vectors once for exact ground truth
+    arrow_table = table.to_arrow()
+    ids = arrow_table.column("id").to_pylist()
+    vectors = np.asarray(arrow_table.column("vector").to_pylist(), dtype=np.float32)
+    row_count, dimension = vectors.shape
+    print(f"Table: {row_count} rows, dimension {dimension}")
+    print(f"Automatic index parameters: {choose_index_params(row_count, dimension)} "
+          f"(built automatically at >= {ANN_INDEX_MIN_ROWS} rows)")
+
+    if args.build:
+        start = time.perf_counter()
+        params = build_vector_index(table, num_partitions=args.partitions, num_sub_vectors=args.sub_vectors)
+        print(f"Built index {params} in {time.perf_counter() - start:.1f}s")
+
+    if not has_vector_index(table):
+        print("Table has no vector index; pass --build to create one. Results below are exact search.")
+
+    # Sample stored vectors (with a little noise) as queries
+    rng = np.random.default_rng(args.seed)
+    sample = rng.choice(row_count, size=min(args.queries, row_count), replace=False)
+    queries = vectors[sample] + rng.normal(scale=0.01, size=(len(sample), dimension)).astype(np.float32)
+
+    # Exact ground truth by brute force in NumPy
+    exact_latencies = []
+    ground_truth = []
+    for query in queries:
+        start = time.perf_counter()
+        distances = np.sum((vectors - query) ** 2, axis=1)
+        top = np.argpartition(distances, min(args.k, row_count - 1))[:args.k]
+        top = top[np.argsort(distances[top])]
+        exact_latencies.append(time.perf_counter() - start)
+        ground_truth.append({ids[i] for i in top})
+
+    print(f"\n{'setting':<28}{'recall@' + str(args.k):>12}{'p50 ms':>10}{'p99 ms':>10}")
+    print(f"{'exact (numpy)':<28}{1.0:>12.3f}{percentile_ms(exact_latencies, 50):>10.2f}"
+          f"{percentile_ms(exact_latencies, 99):>10.2f}")
+
+    for nprobes in args.nprobes:
+        for refine in args.refine:
+            latencies = []
+            hits = 0
+            for query, truth in zip(queries, ground_truth):
+                search = apply_search_params(table.search(query.tolist()).limit(args.k).select(["id"]),
+                                             nprobes=nprobes, refine_factor=refine)
+                start = time.perf_counter()
+                results = search.to_list()
+                latencies.append(time.perf_counter() - start)
+                hits += len(truth & {row["id"] for row in results})
+            recall = hits / (len(ground_truth) * args.k)
+            label = f"nprobes={nprobes} refine={refine}"
+            print(f"{label:<28}{recall:>12.3f}{percentile_ms(latencies, 50):>10.2f}"
+                  f"{percentile_ms(latencies, 99):>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""
+Chunking benchmark for the RAG Chatbot engine
+Splits a document with each chunking strategy and reports, per strategy, the
+number of chunks, the average and largest chunk size in model tokens, and the
+fraction of chunks longer than the embedding model's sequence limit (text the
+model would silently truncate).
+
+Usage:
+    python benchmark_chunking.py path/to/document.pdf [--strategies character token structure]
+"""
+import argparse
+import os
+from rag_app.chunking import CHUNKING_STRATEGIES, chunking_report, make_token_counter
+
+TOKENIZER_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+def load_fragments(path):
+    """Read a document into fragments the same way the app's loaders do"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        from PyPDF2 import PdfReader
+        from rag_app.document_loader import iter_pdf_pages
+        return list(iter_pdf_pages(PdfReader(path), name=path))
+    if extension == ".docx":
+        from docx import Document
+        from rag_app.document_loader import iter_docx_paragraphs
+        return list(iter_docx_paragraphs(Document(path)))
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return [f.read()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chunking strategies on a document")
+    parser.add_argument("path", help="PDF, DOCX, TXT or markdown file")
+    parser.add_argument("--strategies", nargs="+", default=list(CHUNKING_STRATEGIES), choices=CHUNKING_STRATEGIES)
+    parser.add_argument("--tokenizer", default=TOKENIZER_NAME)
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+    # Leave room for the [CLS] and [SEP] tokens the model adds
+    max_tokens = min(tokenizer.model_max_length, 256) - 2
+
+    fragments = load_fragments(args.path)
+    print(f"{sum(len(f) for f in fragments)} characters in {len(fragments)} fragments, "
+          f"limit {max_tokens} tokens per chunk")
+    report = chunking_report(fragments, make_token_counter(tokenizer), max_tokens, args.strategies)
+
+    print(f"{'strategy':<12}{'chunks':>8}{'avg tokens':>12}{'max tokens':>12}{'truncated':>11}")
+    for row in report:
+        print(f"{row['strategy']:<12}{row['chunks']:>8}{row['avg_tokens']:>12.1f}"
+              f"{row['max_tokens']:>12}{row['truncation_rate']:>10.1%}")
+
+if __name__ == "__main__":
+    main()
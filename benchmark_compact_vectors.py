@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""
+Compact vector storage report for the RAG Chatbot knowledge base
+Writes the knowledge base vectors into scratch LanceDB tables using each
+storage mode (float32, float16, binary sign codes + float16) and reports the
+on-disk size, brute-force search latency (p50/p99) and recall@k against
+exact float32 search.
+
+Usage:
+    python benchmark_compact_vectors.py [--kb-path PATH] [--k 5] [--queries 200]
+    python benchmark_compact_vectors.py --synthetic 50000 [--dimension 384]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+import pyarrow as pa
+
+import lancedb
+from rag_app.compact_vectors import (BINARY_PREFILTER_MULTIPLIER, VECTOR_STORAGE_MODES, BinaryCodeIndex,
+                                     code_bytes, rescore, sign_codes, vector_arrow_type, vector_dtype)
+
+VECTOR_TABLE_NAME = "documents"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Report footprint, latency and recall of compact vector storage")
+    parser.add_argument("--kb-path", default=os.environ.get("RAG_PATH_CHAT_DATA_KNOWLEDGE_BASE",
+                                                            os.path.join("chat_data", "knowledge_base")))
+    parser.add_argument("--synthetic", type=int, default=0, help="Use this many random vectors instead of the KB")
+    parser.add_argument("--dimension", type=int, default=384, help="Dimension of synthetic vectors")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+def load_vectors(args, rng):
+    if args.synthetic:
+        vectors = rng.normal(size=(args.synthetic, args.dimension)).astype(np.float32)
+    else:
+        db = lancedb.connect(args.kb_path)
+        if VECTOR_TABLE_NAME not in db.table_names():
+            print(f"Table {VECTOR_TABLE_NAME} not found in {args.kb_path}; use --synthetic N")
+            sys.exit(1)
+        column = db.open_table(VECTOR_TABLE_NAME).to_arrow().column("vector")
+        vectors = np.asarray(column.to_pylist(), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def write_table(db, storage, ids, vectors):
+    dimension = vectors.shape[1]
+    stored = vectors.astype(vector_dtype(storage))
+    columns = {
+        "id": ids,
+        "vector": pa.FixedSizeListArray.from_arrays(pa.array(stored.reshape(-1)), dimension),
+    }
+    fields = [pa.field("id", pa.string()), pa.field("vector", pa.list_(vector_arrow_type(storage), dimension))]
+    if storage == "binary":
+        columns["code"] = [code.tobytes() for code in sign_codes(stored)]
+        fields.append(pa.field("code", pa.binary(code_bytes(dimension))))
+    return db.create_table(storage, data=pa.table(columns, schema=pa.schema(fields)))
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def search(table, storage, code_index, query, k):
+    if storage != "binary":
+        return [row["id"] for row in table.search(query.tolist()).limit(k).to_list()]
+    candidates = code_index.candidates(query, k * BINARY_PREFILTER_MULTIPLIER)
+    id_list = ", ".join(f"'{candidate}'" for candidate in candidates)
+    rows = table.search().where(f"id IN ({id_list})").limit(len(candidates)).to_list()
+    return [row["id"] for row in rescore(query, rows, k)]
+
+def main():
+    args = parse_args()
+    rng = np.random.default_rng(args.seed)
+    vectors = load_vectors(args, rng)
+    row_count, dimension = vectors.shape
+    ids = [str(i) for i in range(row_count)]
+    print(f"{row_count} vectors of dimension {dimension}, k={args.k}")
+
+    sample = rng.choice(row_count, size=min(args.queries, row_count), replace=False)
+    queries = vectors[sample] + rng.normal(scale=0.02, size=(len(sample), dimension)).astype(np.float32)
+    ground_truth = []
+    for query in queries:
+        distances = np.sum((vectors - query) ** 2, axis=1)
+        ground_truth.append({str(i) for i in np.argsort(distances)[:args.k]})
+
+    scratch = tempfile.mkdtemp(prefix="compact_vectors_")
+    try:
+        db = lancedb.connect(scratch)
+        print(f"{'storage':<10}{'disk MB':>10}{'p50 ms':>10}{'p99 ms':>10}{'recall@' + str(args.k):>11}")
+        for storage in VECTOR_STORAGE_MODES:
+            table = write_table(db, storage, ids, vectors)
+            code_index = None
+            if storage == "binary":
+                arrow_table = table.to_arrow().select(["id", "code"])
+                codes = np.frombuffer(b"".join(arrow_table.column("code").to_pylist()), dtype=np.uint8)
+                code_index = BinaryCodeIndex(arrow_table.column("id").to_pylist(), codes.reshape(row_count, -1))
+
+            latencies = []
+            recalls = []
+            for query, expected in zip(queries, ground_truth):
+                start = time.perf_counter()
+                found = search(table, storage, code_index, query, args.k)
+                latencies.append(time.perf_counter() - start)
+                recalls.append(len(expected & set(found)) / args.k)
+
+            size_mb = directory_size(os.path.join(scratch, f"{storage}.lance")) / 1e6
+            print(f"{storage:<10}{size_mb:>10.2f}{np.percentile(latencies, 50) * 1000:>10.2f}"
+                  f"{np.percentile(latencies, 99) * 1000:>10.2f}{np.mean(recalls):>11.3f}")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
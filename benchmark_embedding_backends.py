@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Embedding backend benchmark for the RAG Chatbot engine
+Encodes the same chunks with the PyTorch and int8 ONNX backends and reports
+encode throughput (chunks/sec) for each, the mean cosine similarity between
+the two backends' embeddings of each chunk, and retrieval agreement: the
+overlap of the top-k chunks each backend finds for the same queries.
+
+Usage:
+    python benchmark_embedding_backends.py path/to/document.txt [--k 5] [--queries 100] [--batch-size 32]
+"""
+import argparse
+import os
+import time
+import numpy as np
+from rag_app.chunking import iter_text_chunks
+from rag_app.embedding_backends import EMBEDDING_BACKENDS, load_embedding_backend
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+def load_chunks(path, limit):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        chunks = list(iter_text_chunks([f.read()]))
+    return chunks[:limit] if limit else chunks
+
+def make_queries(chunks, count, rng):
+    """Use the opening words of sampled chunks as queries"""
+    sample = rng.choice(len(chunks), size=min(count, len(chunks)), replace=False)
+    return [" ".join(chunks[i].split()[:12]) for i in sample]
+
+def top_k(corpus, queries, k):
+    scores = queries @ corpus.T
+    return [set(np.argsort(-row)[:k]) for row in scores]
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backends on throughput and retrieval agreement")
+    parser.add_argument("path", help="Text file to chunk and embed")
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--limit", type=int, default=2000, help="Maximum chunks to embed (0 for all)")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--cache-dir", default=os.path.join("chat_data", "models"),
+                        help="Where converted ONNX models are stored")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.path, args.limit)
+    queries = make_queries(chunks, args.queries, np.random.default_rng(args.seed))
+    print(f"{len(chunks)} chunks, {len(queries)} queries, k={args.k}")
+
+    results = {}
+    print(f"{'backend':<12}{'load s':>8}{'chunks/s':>10}{'dim':>6}")
+    for name in args.backends:
+        start = time.perf_counter()
+        backend = load_embedding_backend(name, MODEL_NAME, args.cache_dir)
+        load_time = time.perf_counter() - start
+
+        backend.encode(chunks[:args.batch_size], batch_size=args.batch_size)  # Warm-up
+        start = time.perf_counter()
+        corpus = backend.encode(chunks, batch_size=args.batch_size)
+        rate = len(chunks) / (time.perf_counter() - start)
+        query_embeddings = backend.encode(queries, batch_size=args.batch_size)
+        results[name] = (corpus, query_embeddings)
+        print(f"{name:<12}{load_time:>8.1f}{rate:>10.1f}{backend.dimension:>6}")
+
+    names = list(results)
+    for i, first in enumerate(names):
+        for second in names[i + 1:]:
+            corpus_a, queries_a = results[first]
+            corpus_b, queries_b = results[second]
+            cosine = float(np.mean(np.sum(corpus_a * corpus_b, axis=1)))
+            overlaps = [len(a & b) / args.k for a, b in
+                        zip(top_k(corpus_a, queries_a, args.k), top_k(corpus_b, queries_b, args.k))]
+            print(f"{first} vs {second}: mean cosine {cosine:.4f}, "
+                  f"top-{args.k} agreement {np.mean(overlaps):.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""
+PDF extraction benchmark for the RAG Chatbot engine
+Extracts the text of a PDF with the serial page loop the loader used before
+(iter_pdf_pages) and with the process pool (extract_pdf_pages) at each worker
+count, and reports pages per second, speedup over the serial loop and whether
+the extracted text is identical.
+
+Usage:
+    python benchmark_pdf_extraction.py path/to/document.pdf [--workers 1 2 4] [--runs 3]
+"""
+import argparse
+import os
+import time
+from io import BytesIO
+from PyPDF2 import PdfReader
+from rag_app.document_loader import iter_pdf_pages
+from rag_app.pdf_extraction import default_workers, extract_pdf_pages
+
+def best_time(extract, runs):
+    """Run extract runs times; return the fastest time and the last result"""
+    best = None
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = extract()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare serial and process-pool PDF page extraction")
+    parser.add_argument("path", help="PDF file")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+                        help="Worker process counts to measure (capped by PDF_EXTRACTION_MAX_WORKERS and the CPU count)")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per configuration; the fastest is reported")
+    args = parser.parse_args()
+
+    with open(args.path, "rb") as f:
+        pdf_bytes = f.read()
+    total_pages = len(PdfReader(BytesIO(pdf_bytes)).pages)
+    name = os.path.basename(args.path)
+    print(f"{name}: {total_pages} pages, {len(pdf_bytes) / 1024:.0f} KB, {os.cpu_count()} CPUs")
+
+    # Parsing is part of both measurements, as it is when a file is uploaded
+    serial_time, serial_pages = best_time(
+        lambda: list(iter_pdf_pages(PdfReader(BytesIO(pdf_bytes)), name=name)), args.runs)
+    print(f"{'method':<28}{'seconds':>10}{'pages/s':>10}{'speedup':>10}{'failed':>8}  same text")
+    print(f"{'serial loop':<28}{serial_time:>10.2f}{total_pages / serial_time:>10.1f}{1.0:>10.2f}{0:>8}  -")
+
+    for workers in args.workers:
+        elapsed, (pages, failed) = best_time(
+            lambda: extract_pdf_pages(pdf_bytes, max_workers=workers, name=name), args.runs)
+        used = min(workers, default_workers())
+        label = f"process pool x{used}" + (f" ({workers} asked)" if used != workers else "")
+        print(f"{label:<28}{elapsed:>10.2f}{total_pages / elapsed:>10.1f}{serial_time / elapsed:>10.2f}"
+              f"{len(failed):>8}  {'yes' if pages == serial_pages else 'NO'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+Startup benchmark for the RAG Chatbot engine
+Reports, for a cold interpreter: time to import rag_app.rag_engine, time until
+the background embedding model load finishes, and latency of the first query
+(embedding + vector search when a knowledge base exists, embedding only otherwise).
+
+Usage:
+    python benchmark_startup.py [--runs 3] [--query "What is this document about?"]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from dotenv import load_dotenv
+
+# Code run in a fresh interpreter per measurement so imports are cold
+PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+from rag_app import rag_engine
+import_time = time.perf_counter() - start
+
+start = time.perf_counter()
+ready = rag_engine.wait_for_model()
+model_wait = time.perf_counter() - start
+
+start = time.perf_counter()
+if rag_engine.check_knowledge_base_exists():
+    rag_engine.search_chunks(sys.argv[1])
+    first_query_kind = "embed+search"
+else:
+    rag_engine.embed_query(sys.argv[1])
+    first_query_kind = "embed"
+first_query = time.perf_counter() - start
+
+print("BENCH " + json.dumps({
+    "import_s": import_time,
+    "model_ready_after_import_s": model_wait,
+    "model_ready": ready,
+    "first_query_s": first_query,
+    "first_query_kind": first_query_kind,
+}))
+"""
+
+def run_probe(query):
+    result = subprocess.run([sys.executable, "-c", PROBE, query], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), env=os.environ.copy())
+    for line in result.stdout.splitlines():
+        if line.startswith("BENCH "):
+            return json.loads(line[len("BENCH "):])
+    raise RuntimeError(f"Probe failed:\n{result.stderr[-2000:]}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import, model load and first-query latency")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--query", default="What is this document about?")
+    args = parser.parse_args()
+
+    load_dotenv()
+    if not os.environ.get("GEMINI_API_KEY"):
+        # The engine refuses to import without a key; no Gemini call is made here
+        os.environ["GEMINI_API_KEY"] = "benchmark-placeholder"
+
+    print(f"{'run':<6}{'import s':>10}{'model s':>10}{'first query s':>16}  kind")
+    for run in range(1, args.runs + 1):
+        stats = run_probe(args.query)
+        print(f"{run:<6}{stats['import_s']:>10.2f}{stats['model_ready_after_import_s']:>10.2f}"
+              f"{stats['first_query_s']:>16.3f}  {stats['first_query_kind']}"
+              f"{'' if stats['model_ready'] else ' (model failed to load)'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Vector store backend benchmark for the RAG Chatbot engine
+Loads the same synthetic corpus into the LanceDB and NumPy vector stores for
+a range of corpus sizes and reports p50/p99 search latency of each, plus the
+overlap of their top-k results, to check where the automatic backend choice
+(NUMPY_STORE_MAX_ROWS) should switch from NumPy to LanceDB.
+
+Usage:
+    python benchmark_vector_store.py [--sizes 1000 5000 20000 100000] [--queries 200] [--k 5]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+from rag_app.knowledge_base import KnowledgeBaseHandle
+from rag_app.vector_store import NUMPY_STORE_MAX_ROWS, LanceDBVectorStore, NumpyVectorStore
+
+def make_corpus(size, dimension, rng):
+    vectors = rng.normal(size=(size, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    rows = [{"id": f"doc:{i}", "doc_id": "doc", "source": "synthetic", "chunk_index": i,
+             "content_hash": str(i), "text": f"chunk {i}"} for i in range(size)]
+    return rows, vectors
+
+def measure(store, queries, k):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        rows = store.search(query, k)
+        latencies.append(time.perf_counter() - start)
+        results.append({row["id"] for row in rows})
+    return np.percentile(latencies, 50) * 1000, np.percentile(latencies, 99) * 1000, results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare LanceDB and NumPy vector store search latency")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000, 100000])
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"Automatic choice uses NumPy up to {NUMPY_STORE_MAX_ROWS} rows")
+    print(f"{'rows':>8}{'lancedb p50':>13}{'p99':>8}{'numpy p50':>11}{'p99':>8}{'overlap':>9}")
+    for size in args.sizes:
+        rows, vectors = make_corpus(size, args.dimension, rng)
+        queries = vectors[rng.choice(size, size=min(args.queries, size), replace=False)]
+        scratch = tempfile.mkdtemp(prefix="vector_store_")
+        try:
+            lance_store = LanceDBVectorStore(KnowledgeBaseHandle(os.path.join(scratch, "lancedb"), "documents"))
+            numpy_store = NumpyVectorStore(os.path.join(scratch, "numpy"))
+            lance_store.create(rows, vectors)
+            numpy_store.create(rows, vectors)
+
+            lance_p50, lance_p99, lance_results = measure(lance_store, queries, args.k)
+            numpy_p50, numpy_p99, numpy_results = measure(numpy_store, queries, args.k)
+            overlap = np.mean([len(a & b) / args.k for a, b in zip(lance_results, numpy_results)])
+            print(f"{size:>8}{lance_p50:>13.2f}{lance_p99:>8.2f}{numpy_p50:>11.2f}{numpy_p99:>8.2f}{overlap:>9.3f}")
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# rag_app/answer_cache.py
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+from rag_app.logging_config import logger
+from rag_app.namespaces import DEFAULT_NAMESPACE
+
+class SemanticAnswerCache:
+    """Persistent cache of generated answers, looked up by query similarity
+
+    Each entry stores the query embedding, the ids of the chunks the answer
+    was generated from, and the answer. A new query is served from the cache
+    when its embedding is within the cosine similarity threshold of a stored
+    query and it retrieved exactly the same chunks. Entries live in SQLite so
+    they survive restarts; embeddings are mirrored in memory for lookup.
+
+    Entries belong to the knowledge base namespace they were answered from:
+    lookups only see their own namespace, max_entries applies per namespace
+    (so a busy workspace cannot evict the others), and clearing after an
+    ingest only drops the changed namespace's answers.
+    """
+
+    def __init__(self, db_path: str, similarity_threshold: float = 0.92,
+                 max_entries: int = 2000, ttl_seconds: float = 7 * 24 * 3600):
+        self.db_path = db_path
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._ids: List[int] = []
+        self._namespaces: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._init_db()
+        self._load()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        """Create the answers table if it does not exist yet"""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS answers (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    query TEXT,
+                    embedding BLOB,
+                    chunk_ids TEXT,
+                    answer TEXT,
+                    created_at REAL,
+                    last_access REAL,
+                    namespace TEXT
+                )
+            ''')
+            columns = [row[1] for row in cursor.execute('PRAGMA table_info(answers)')]
+            if "namespace" not in columns:
+                # Entries from before namespaces cannot be attributed to one, so start over
+                cursor.execute('DELETE FROM answers')
+                cursor.execute('ALTER TABLE answers ADD COLUMN namespace TEXT')
+                logger.info("Semantic answer cache upgraded to per-namespace entries, old entries dropped")
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_answers_namespace ON answers (namespace, last_access)')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _load(self):
+        """Drop expired entries and load the stored embeddings into memory"""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM answers WHERE created_at < ?', (time.time() - self.ttl_seconds,))
+            conn.commit()
+            cursor.execute('SELECT id, namespace, embedding FROM answers ORDER BY id')
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        self._ids = [row[0] for row in rows]
+        self._namespaces = [row[1] for row in rows]
+        if rows:
+            self._matrix = np.vstack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+        else:
+            self._matrix = None
+        logger.info(f"Semantic answer cache loaded with {len(self._ids)} entries from {self.db_path}")
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    @staticmethod
+    def _chunk_key(chunk_ids: Iterable[Any]) -> str:
+        return json.dumps(sorted(str(chunk_id) for chunk_id in chunk_ids))
+
+    def lookup(self, embedding, chunk_ids: Iterable[Any], namespace: str = DEFAULT_NAMESPACE) -> Optional[str]:
+        """Find a stored answer for a similar query that retrieved the same chunks
+
+        Args:
+            embedding: Embedding of the new query
+            chunk_ids: Ids of the chunks retrieved for the new query
+            namespace: Knowledge base namespace the query was asked in
+
+        Returns:
+            The stored answer, or None on a miss
+        """
+        chunk_key = self._chunk_key(chunk_ids)
+        query = self._normalize(embedding)
+
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+
+            similarities = self._matrix @ query
+            candidates = [position for position in np.nonzero(similarities >= self.similarity_threshold)[0]
+                          if self._namespaces[position] == namespace]
+            candidates = sorted(candidates, key=lambda position: -similarities[position])
+            if len(candidates) == 0:
+                self.misses += 1
+                return None
+
+            conn = self._connect()
+            try:
+                cursor = conn.cursor()
+                now = time.time()
+                for position in candidates:
+                    entry_id = self._ids[position]
+                    cursor.execute('SELECT chunk_ids, answer, created_at FROM answers WHERE id = ?', (entry_id,))
+                    row = cursor.fetchone()
+                    if row is None or row[0] != chunk_key or row[2] < now - self.ttl_seconds:
+                        continue
+                    cursor.execute('UPDATE answers SET last_access = ? WHERE id = ?', (now, entry_id))
+                    conn.commit()
+                    self.hits += 1
+                    logger.info(f"Semantic answer cache hit (similarity {similarities[position]:.3f})")
+                    return row[1]
+            finally:
+                conn.close()
+
+            self.misses += 1
+            return None
+
+    def store(self, query_text: str, embedding, chunk_ids: Iterable[Any], answer: str,
+              namespace: str = DEFAULT_NAMESPACE):
+        """Store a generated answer, evicting the namespace's least recently used entries if over capacity"""
+        vector = self._normalize(embedding)
+        now = time.time()
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO answers (query, embedding, chunk_ids, answer, created_at, last_access, namespace)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (query_text, vector.tobytes(), self._chunk_key(chunk_ids), answer, now, now, namespace))
+                entry_id = cursor.lastrowid
+
+                cursor.execute('SELECT COUNT(*) FROM answers WHERE namespace = ?', (namespace,))
+                overflow = cursor.fetchone()[0] - self.max_entries
+                evicted = []
+                if overflow > 0:
+                    cursor.execute('SELECT id FROM answers WHERE namespace = ? ORDER BY last_access ASC LIMIT ?',
+                                   (namespace, overflow))
+                    evicted = [row[0] for row in cursor.fetchall()]
+                    cursor.executemany('DELETE FROM answers WHERE id = ?', [(i,) for i in evicted])
+                conn.commit()
+            finally:
+                conn.close()
+
+            self._ids.append(entry_id)
+            self._namespaces.append(namespace)
+            row = vector.reshape(1, -1)
+            self._matrix = row if self._matrix is None else np.vstack([self._matrix, row])
+            if evicted:
+                evicted_ids = set(evicted)
+                self._keep([position for position, i in enumerate(self._ids) if i not in evicted_ids])
+
+    def _keep(self, positions: List[int]):
+        """Keep only these positions of the in-memory mirror"""
+        self._ids = [self._ids[position] for position in positions]
+        self._namespaces = [self._namespaces[position] for position in positions]
+        self._matrix = self._matrix[positions] if positions and self._matrix is not None else None
+
+    def clear(self, namespace: Optional[str] = None):
+        """Remove the stored answers of a namespace, or of all of them (call whenever its knowledge base changes)"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                if namespace is None:
+                    conn.execute('DELETE FROM answers')
+                else:
+                    conn.execute('DELETE FROM answers WHERE namespace = ?', (namespace,))
+                conn.commit()
+            finally:
+                conn.close()
+            self._keep([position for position, entry_namespace in enumerate(self._namespaces)
+                        if namespace is not None and entry_namespace != namespace])
+        logger.info(f"Semantic answer cache cleared{'' if namespace is None else f' for namespace {namespace}'}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._ids),
+                "max_entries": self.max_entries,
+                "similarity_threshold": self.similarity_threshold,
+            }
@@ -0,0 +1,57 @@
+# rag_app/async_runtime.py
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional
+from rag_app.logging_config import logger
+
+# Threads for CPU-bound embedding work, shared by all in-flight requests
+EMBEDDING_WORKERS = 2
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_embedding_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Get the process-wide event loop, starting it on a daemon thread on first use
+
+    The synchronous engine API submits its coroutines to this loop, so all
+    Streamlit sessions share one loop instead of one blocked thread each.
+    """
+    global _loop, _loop_thread
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="rag-event-loop", daemon=True)
+            _loop_thread.start()
+            logger.info("Started shared RAG event loop")
+        return _loop
+
+def run_sync(coro: Awaitable[Any]) -> Any:
+    """Run a coroutine on the shared event loop and block until it finishes
+
+    Args:
+        coro: Coroutine to run
+
+    Returns:
+        The coroutine's result
+    """
+    loop = get_event_loop()
+    if threading.current_thread() is _loop_thread:
+        raise RuntimeError("Synchronous RAG API called from the event loop; use the async API instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+def get_embedding_executor() -> ThreadPoolExecutor:
+    """Get the thread pool used for CPU-bound embedding work"""
+    global _embedding_executor
+    with _lock:
+        if _embedding_executor is None:
+            _embedding_executor = ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS,
+                                                     thread_name_prefix="rag-embedding")
+        return _embedding_executor
+
+async def run_in_embedding_executor(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a CPU-bound function on the embedding executor without blocking the loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_embedding_executor(), func, *args)
@@ -0,0 +1,336 @@
+# rag_app/chunking.py
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from rag_app.logging_config import logger
+
+# Character strategy settings
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+FRAGMENT_SLICE_SIZE = 65536  # Characters of input text cleaned up at a time
+
+# Token-bounded strategies: overlap between consecutive windows of one unit
+TOKEN_CHUNK_OVERLAP = 32
+
+# Used when the embedding model's tokenizer is unavailable
+DEFAULT_MAX_TOKENS = 254
+
+# Ends every PDF page and starts every loaded URL. The form feed marks a page
+# break for the structure strategy and, unlike a blank line, is still there
+# after the pages are joined into one string; whitespace cleanup turns the
+# whole separator into one space for the other strategies
+PAGE_BREAK = "\n\f\n"
+
+CHUNKING_STRATEGIES = ("character", "token", "structure")
+DEFAULT_CHUNKING_STRATEGY = "character"
+
+# Counts tokens for a batch of texts (without special tokens)
+TokenCounter = Callable[[List[str]], List[int]]
+
+_HEADING_PATTERN = re.compile(r'^#{1,6}\s+\S')
+
+def make_token_counter(tokenizer) -> TokenCounter:
+    """Build a batch token counter from a Hugging Face tokenizer"""
+    def count_tokens(texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        encoded = tokenizer(texts, add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+    return count_tokens
+
+def approximate_token_counter(texts: List[str]) -> List[int]:
+    """Rough token count (about 4 characters per token of each word) when no tokenizer is available"""
+    return [sum(max(1, (len(word) + 3) // 4) for word in text.split()) for text in texts]
+
+def _iter_normalized_pieces(fragments: Iterable[str]) -> Iterator[str]:
+    """Split fragments into bounded slices so whitespace cleanup never runs on one huge string"""
+    for fragment in fragments:
+        for start in range(0, len(fragment), FRAGMENT_SLICE_SIZE):
+            yield re.sub(r'\s+', ' ', fragment[start:start + FRAGMENT_SLICE_SIZE])
+
+def iter_text_chunks(fragments: Iterable[str], chunk_size: int = CHUNK_SIZE,
+                     chunk_overlap: int = CHUNK_OVERLAP) -> Iterator[str]:
+    """Split a stream of text fragments into overlapping character windows
+
+    Works on a rolling buffer, so chunks can span fragment boundaries (pages,
+    sections) and memory stays bounded by the chunk size instead of the
+    document size. Produces the same chunks as chunking the concatenated text.
+
+    Args:
+        fragments: Text fragments in document order
+        chunk_size: Characters per chunk
+        chunk_overlap: Characters shared by consecutive chunks
+
+    Yields:
+        Text chunks
+    """
+    step = chunk_size - chunk_overlap
+    buffer = ""
+    for piece in _iter_normalized_pieces(fragments):
+        # Collapse whitespace that spans a fragment boundary, and drop leading whitespace
+        if piece.startswith(" ") and (not buffer or buffer.endswith(" ")):
+            piece = piece[1:]
+        buffer += piece
+
+        # A window ending in whitespace may still be trimmed if the text ends there,
+        # so wait for more text before emitting it
+        position = 0
+        while (len(buffer) - position > chunk_size
+               or (len(buffer) - position == chunk_size and not buffer.endswith(" "))):
+            yield buffer[position:position + chunk_size]
+            position += step
+        buffer = buffer[position:]
+
+    # Emit the tail, skipping chunks that are too small
+    buffer = buffer.rstrip()
+    for position in range(0, len(buffer), step):
+        chunk = buffer[position:position + chunk_size]
+        if len(chunk) > 50:  # Avoid too small chunks
+            yield chunk
+
+def _iter_words(fragments: Iterable[str]) -> Iterator[str]:
+    """Yield whitespace-separated words of the concatenated fragments, reading them in bounded slices"""
+    carry = ""
+    for fragment in fragments:
+        for start in range(0, len(fragment), FRAGMENT_SLICE_SIZE):
+            piece = carry + fragment[start:start + FRAGMENT_SLICE_SIZE]
+            words = piece.split()
+            # The last word may continue in the next slice or fragment
+            if words and not piece[-1].isspace():
+                carry = words.pop()
+            else:
+                carry = ""
+            yield from words
+    if carry:
+        yield carry
+
+def iter_token_windows(words: Iterable[str], count_tokens: TokenCounter, max_tokens: int,
+                       overlap_tokens: int, batch_size: int = 512) -> Iterator[str]:
+    """Pack words into windows of at most max_tokens tokens, overlapping by about overlap_tokens
+
+    Words are never split; a single word longer than max_tokens becomes its own
+    window. Shared by the token-bounded chunkers and prompt context assembly.
+    """
+    window: List[str] = []
+    window_counts: List[int] = []
+    window_tokens = 0
+
+    def word_batches():
+        batch = []
+        for word in words:
+            batch.append(word)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    for batch in word_batches():
+        for word, tokens in zip(batch, count_tokens(batch)):
+            if window and window_tokens + tokens > max_tokens:
+                yield " ".join(window)
+                # Carry trailing words into the next window as overlap
+                keep = 0
+                kept_tokens = 0
+                while keep < len(window) and kept_tokens + window_counts[-1 - keep] <= overlap_tokens:
+                    kept_tokens += window_counts[-1 - keep]
+                    keep += 1
+                window = window[len(window) - keep:]
+                window_counts = window_counts[len(window_counts) - keep:]
+                window_tokens = kept_tokens
+            window.append(word)
+            window_counts.append(tokens)
+            window_tokens += tokens
+
+    if window:
+        yield " ".join(window)
+
+class CharacterChunker:
+    """Fixed-size character windows with overlap (the original strategy)"""
+
+    name = "character"
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def chunk(self, fragments: Iterable[str]) -> Iterator[str]:
+        return iter_text_chunks(fragments, self.chunk_size, self.chunk_overlap)
+
+class TokenChunker:
+    """Word-aligned windows bounded by the embedding model's own token limit
+
+    No chunk is cut mid-word and none exceeds what the model can embed, so no
+    text is silently truncated during embedding.
+    """
+
+    name = "token"
+
+    def __init__(self, count_tokens: TokenCounter, max_tokens: int = DEFAULT_MAX_TOKENS,
+                 overlap_tokens: int = TOKEN_CHUNK_OVERLAP):
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def chunk(self, fragments: Iterable[str]) -> Iterator[str]:
+        for chunk in iter_token_windows(_iter_words(fragments), self.count_tokens,
+                                         self.max_tokens, self.overlap_tokens):
+            if len(chunk) > 50:  # Avoid too small chunks
+                yield chunk
+
+class StructureChunker:
+    """Chunks that follow document structure
+
+    Markdown headings (from html2text) start a new section. Each line
+    (a DOCX paragraph, a markdown paragraph, a line of a PDF page) is a
+    block, and consecutive blocks of one section are packed up to the token
+    limit, so no chunk starts or ends mid-paragraph unless the paragraph
+    alone exceeds the limit; such paragraphs are split into token-bounded
+    windows. Page breaks (form feeds, see PAGE_BREAK) also end a chunk once
+    it holds a reasonable amount of text, wherever they fall in the input,
+    so pages given as separate fragments and pages joined into one string
+    give the same chunks. Each chunk is prefixed with its section heading.
+    """
+
+    name = "structure"
+
+    def __init__(self, count_tokens: TokenCounter, max_tokens: int = DEFAULT_MAX_TOKENS,
+                 overlap_tokens: int = TOKEN_CHUNK_OVERLAP):
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    @staticmethod
+    def _line_blocks(line: str) -> Iterator[Dict[str, Any]]:
+        """Blocks of one line: its text, with a break marker at every form feed in it"""
+        # Split before cleaning up whitespace, which would drop the form feeds
+        for index, part in enumerate(line.split("\f")):
+            if index:
+                yield {"break": True}
+            part = " ".join(part.split())
+            if part:
+                yield {"heading": bool(_HEADING_PATTERN.match(part)), "text": part}
+
+    def _iter_blocks(self, fragments: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """Yield one block per non-empty line, plus a break marker at every page break"""
+        carry = ""
+        for fragment in fragments:
+            for start in range(0, len(fragment), FRAGMENT_SLICE_SIZE):
+                lines = (carry + fragment[start:start + FRAGMENT_SLICE_SIZE]).split("\n")
+                # The last line may continue in the next slice or fragment
+                carry = lines.pop()
+                for line in lines:
+                    yield from self._line_blocks(line)
+        yield from self._line_blocks(carry)
+
+    def chunk(self, fragments: Iterable[str]) -> Iterator[str]:
+        heading = ""
+        heading_tokens = 0
+        parts: List[str] = []
+        parts_tokens = 0
+
+        def flush():
+            nonlocal parts, parts_tokens
+            if parts:
+                body = " ".join(parts)
+                chunk = f"{heading}\n{body}" if heading else body
+                parts = []
+                parts_tokens = 0
+                if len(chunk) > 50:  # Avoid too small chunks
+                    return chunk
+            return None
+
+        for block in self._iter_blocks(fragments):
+            if block.get("break"):
+                # End the chunk at a page break unless that would leave a tiny chunk behind
+                if parts_tokens >= self.max_tokens // 4:
+                    chunk = flush()
+                    if chunk:
+                        yield chunk
+                continue
+
+            text = block["text"]
+            if block["heading"]:
+                chunk = flush()
+                if chunk:
+                    yield chunk
+                heading = text
+                heading_tokens = self.count_tokens([heading])[0]
+                continue
+
+            budget = max(1, self.max_tokens - heading_tokens)
+            tokens = self.count_tokens([text])[0]
+            if tokens > budget:
+                # Oversized block: flush what we have and split the block into windows
+                chunk = flush()
+                if chunk:
+                    yield chunk
+                for window in iter_token_windows(text.split(), self.count_tokens, budget, self.overlap_tokens):
+                    parts = [window]
+                    chunk = flush()
+                    if chunk:
+                        yield chunk
+                continue
+
+            if parts and parts_tokens + tokens > budget:
+                chunk = flush()
+                if chunk:
+                    yield chunk
+            parts.append(text)
+            parts_tokens += tokens
+
+        chunk = flush()
+        if chunk:
+            yield chunk
+
+def get_chunker(strategy: str = DEFAULT_CHUNKING_STRATEGY, count_tokens: Optional[TokenCounter] = None,
+                max_tokens: Optional[int] = None):
+    """Build a chunker for a strategy name
+
+    Args:
+        strategy: One of CHUNKING_STRATEGIES
+        count_tokens: Token counter of the embedding model (approximate counter if omitted)
+        max_tokens: Token limit per chunk for the token-bounded strategies
+
+    Returns:
+        Chunker with a chunk(fragments) method
+    """
+    if strategy not in CHUNKING_STRATEGIES:
+        raise ValueError(f"Unknown chunking strategy: {strategy}. Choose one of {', '.join(CHUNKING_STRATEGIES)}")
+    if strategy == "character":
+        return CharacterChunker()
+
+    if count_tokens is None:
+        logger.warning("Tokenizer unavailable, using approximate token counts for chunking")
+        count_tokens = approximate_token_counter
+    max_tokens = max_tokens or DEFAULT_MAX_TOKENS
+    if strategy == "token":
+        return TokenChunker(count_tokens, max_tokens)
+    return StructureChunker(count_tokens, max_tokens)
+
+def chunking_report(fragments: List[str], count_tokens: TokenCounter, max_tokens: int,
+                    strategies: Iterable[str] = CHUNKING_STRATEGIES) -> List[Dict[str, Any]]:
+    """Compare chunking strategies on the same document
+
+    Args:
+        fragments: Document fragments (a list, since each strategy reads it again)
+        count_tokens: Token counter of the embedding model
+        max_tokens: Tokens the embedding model can take per chunk (excluding special tokens)
+        strategies: Strategy names to compare
+
+    Returns:
+        One dict per strategy with chunk count, average tokens per chunk and
+        the fraction of chunks that the model would truncate
+    """
+    report = []
+    for strategy in strategies:
+        chunks = list(get_chunker(strategy, count_tokens, max_tokens).chunk(fragments))
+        counts = count_tokens(chunks)
+        truncated = sum(1 for count in counts if count > max_tokens)
+        report.append({
+            "strategy": strategy,
+            "chunks": len(chunks),
+            "avg_tokens": sum(counts) / len(counts) if counts else 0.0,
+            "max_tokens": max(counts) if counts else 0,
+            "truncation_rate": truncated / len(chunks) if chunks else 0.0,
+        })
+    return report
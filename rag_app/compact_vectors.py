@@ -0,0 +1,119 @@
+# rag_app/compact_vectors.py
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from rag_app.logging_config import logger
+
+# float32: full precision (default). float16: half the vector bytes.
+# binary: float16 vectors plus a 1-bit sign code per dimension, used for a
+# Hamming-distance prefilter whose candidates are rescored exactly.
+VECTOR_STORAGE_MODES = ("float32", "float16", "binary")
+DEFAULT_VECTOR_STORAGE = "float32"
+
+# Candidates kept by the Hamming prefilter per requested result
+BINARY_PREFILTER_MULTIPLIER = 20
+
+# Number of set bits of every byte value
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+def vector_dtype(storage: str):
+    """NumPy dtype of the stored vectors for a storage mode"""
+    return np.float32 if storage == "float32" else np.float16
+
+def vector_arrow_type(storage: str):
+    """Arrow value type of the stored vectors for a storage mode"""
+    import pyarrow as pa
+    return pa.float32() if storage == "float32" else pa.float16()
+
+def code_bytes(dimension: int) -> int:
+    """Bytes of the binary sign code of one vector"""
+    return (dimension + 7) // 8
+
+def sign_codes(vectors: np.ndarray) -> np.ndarray:
+    """Pack the sign of every dimension into bits (1 for positive), one row per vector"""
+    return np.packbits(np.asarray(vectors) > 0, axis=-1)
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    """Hamming distance between each row of codes and a query code"""
+    return _POPCOUNT[np.bitwise_xor(codes, query_code)].sum(axis=1, dtype=np.int32)
+
+def storage_of_schema(schema) -> str:
+    """Work out the storage mode of an existing documents table from its schema"""
+    import pyarrow as pa
+    if "code" in schema.names:
+        return "binary"
+    if pa.types.is_float16(schema.field("vector").type.value_type):
+        return "float16"
+    return "float32"
+
+class BinaryCodeIndex:
+    """In-memory sign codes of one table version, for the Hamming prefilter
+
+    Codes take dimension / 8 bytes per row (48 bytes for 384 dimensions), so
+    a scan over all of them is much cheaper than over the float vectors.
+    """
+
+    def __init__(self, ids: List[str], codes: np.ndarray):
+        self.ids = ids
+        self.codes = codes
+
+    def candidates(self, query_vector: np.ndarray, count: int) -> List[str]:
+        """Ids of the count rows whose codes are closest to the query's code"""
+        if not self.ids:
+            return []
+        distances = hamming_distances(self.codes, sign_codes(query_vector))
+        count = min(count, len(self.ids))
+        nearest = np.argpartition(distances, count - 1)[:count]
+        return [self.ids[i] for i in nearest[np.argsort(distances[nearest], kind="stable")]]
+
+def rescore(query_vector: np.ndarray, rows: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """Order candidate rows by exact L2 distance to the query, using their stored vectors
+
+    Returns:
+        The best limit rows, with _distance set and the vector and code columns removed
+    """
+    if not rows:
+        return []
+    vectors = np.asarray([row["vector"] for row in rows], dtype=np.float32)
+    query = np.asarray(query_vector, dtype=np.float32)
+    distances = np.sum((vectors - query) ** 2, axis=1)
+    order = np.argsort(distances)[:limit]
+    results = []
+    for i in order:
+        row = {key: value for key, value in rows[i].items() if key not in ("vector", "code")}
+        row["_distance"] = float(distances[i])
+        results.append(row)
+    return results
+
+_code_indexes: Dict[Tuple[str, Any], BinaryCodeIndex] = {}
+_code_lock = threading.Lock()
+
+async def get_code_index(table, path: str, version: Any) -> BinaryCodeIndex:
+    """Load (or reuse) the sign codes of an async table at a version (any hashable version tag)"""
+    key = (path, version)
+    with _code_lock:
+        index = _code_indexes.get(key)
+    if index is not None:
+        return index
+
+    arrow_table = await table.query().select(["id", "code"]).to_arrow()
+    ids = arrow_table.column("id").to_pylist()
+    codes = arrow_table.column("code").combine_chunks()
+    width = codes.type.byte_width
+    # Fixed-size binary values are stored back to back, so the buffer is the code matrix
+    matrix = np.frombuffer(codes.buffers()[1], dtype=np.uint8,
+                           count=(codes.offset + len(codes)) * width).reshape(-1, width)[codes.offset:]
+    index = BinaryCodeIndex(ids, matrix)
+    with _code_lock:
+        # Only the latest version of each table is worth keeping
+        for stale in [k for k in _code_indexes if k[0] == path]:
+            del _code_indexes[stale]
+        _code_indexes[key] = index
+    logger.info(f"Loaded {len(ids)} binary codes ({matrix.nbytes} bytes) for the Hamming prefilter")
+    return index
+
+def drop_code_index(path: str):
+    """Forget the loaded sign codes of a table (when its knowledge base is closed)"""
+    with _code_lock:
+        for stale in [k for k in _code_indexes if k[0] == path]:
+            del _code_indexes[stale]
@@ -0,0 +1,146 @@
+# rag_app/context_assembly.py
+import heapq
+from typing import Any, Dict, List, Optional
+from rag_app.chunking import TokenCounter, approximate_token_counter, iter_token_windows
+from rag_app.logging_config import logger
+
+# Tokens of retrieved text placed in the prompt
+CONTEXT_TOKEN_BUDGET = 1500
+
+# Shortest suffix/prefix match treated as overlap between adjacent chunks
+MIN_OVERLAP_CHARS = 8
+
+# Do not start a truncated span with less room than this
+MIN_PARTIAL_TOKENS = 64
+
+SPAN_SEPARATOR = "\n\n"
+
+def _overlap_length(left: str, right: str) -> int:
+    """Length of the longest suffix of left that is also a prefix of right"""
+    for length in range(min(len(left), len(right)), MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:length]):
+            return length
+    return 0
+
+def _split_heading(text: str):
+    """Split a structure-chunker heading line off the chunk text"""
+    first_line, newline, rest = text.partition("\n")
+    if newline and first_line.startswith("#"):
+        return first_line, rest
+    return "", text
+
+def _make_span(members: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "rank": min(member["rank"] for member in members),
+        "text": "".join(member["joiner"] + member["piece"] for member in members),
+        "members": members,
+    }
+
+def _build_spans(search_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Group results into spans of consecutive chunks of the same document
+
+    Each member of a span keeps its rank, its full text, and the piece that
+    remains after removing the overlap with the previous member. A span's
+    rank is the best (lowest) rank of its members.
+    """
+    by_document: Dict[Any, List[tuple]] = {}
+    for rank, result in enumerate(search_results):
+        key = result.get("doc_id", result.get("id", rank))
+        by_document.setdefault(key, []).append((result.get("chunk_index"), rank, result["text"]))
+
+    spans = []
+    for chunks in by_document.values():
+        if any(chunk_index is None for chunk_index, _, _ in chunks):
+            # Rows without positions cannot be stitched together
+            spans.extend(_make_span([{"rank": rank, "text": text, "joiner": "", "piece": text}])
+                         for _, rank, text in chunks)
+            continue
+
+        members: List[Dict[str, Any]] = []
+        previous_index = None
+        for chunk_index, rank, text in sorted(chunks):
+            if chunk_index == previous_index:
+                continue  # Same chunk retrieved twice
+            member = {"rank": rank, "text": text, "joiner": "", "piece": text}
+            if members and chunk_index == previous_index + 1:
+                heading, body = _split_heading(text)
+                if heading and heading == _split_heading(members[0]["text"])[0]:
+                    body_overlap = _overlap_length(members[-1]["text"], body)
+                    member["piece"] = body[body_overlap:] if body_overlap else body
+                    member["joiner"] = "" if body_overlap else " "
+                else:
+                    overlap = _overlap_length(members[-1]["text"], text)
+                    member["piece"] = text[overlap:] if overlap else text
+                    member["joiner"] = "" if overlap else " "
+                members.append(member)
+            else:
+                if members:
+                    spans.append(_make_span(members))
+                members = [member]
+            previous_index = chunk_index
+        if members:
+            spans.append(_make_span(members))
+    return spans
+
+def _truncate_to_tokens(text: str, count_tokens: TokenCounter, max_tokens: int) -> str:
+    """Keep the leading words of text that fit in max_tokens"""
+    for window in iter_token_windows(text.split(), count_tokens, max_tokens, 0):
+        return window
+    return ""
+
+def assemble_context(search_results: List[Dict[str, Any]], count_tokens: Optional[TokenCounter] = None,
+                     token_budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """Build the prompt context from search results within a token budget
+
+    Adjacent and overlapping chunks of one document are merged back into
+    contiguous spans, duplicate text is dropped, and spans are added in
+    relevance order (the rank of their best chunk) while they fit in the
+    budget. A span that does not fit is broken back into its chunks; the
+    first chunk that still does not fit is cut at a word boundary if enough
+    room is left, and later chunks are only added if they fit whole.
+
+    Args:
+        search_results: Search result rows, most relevant first
+        count_tokens: Token counter (approximate counter if omitted)
+        token_budget: Maximum tokens of context
+
+    Returns:
+        Context string, spans separated by blank lines
+    """
+    count_tokens = count_tokens or approximate_token_counter
+    queue = [(span["rank"], position, span) for position, span in enumerate(_build_spans(search_results))]
+    heapq.heapify(queue)
+    next_position = len(queue)
+
+    seen = set()
+    parts = []
+    used_tokens = 0
+    truncated = False
+    while queue:
+        _, _, span = heapq.heappop(queue)
+        key = " ".join(span["text"].split()).lower()
+        if not key or key in seen:
+            continue
+
+        # Count per member: each piece is at most one chunk long, which stays within the tokenizer limit
+        tokens = sum(count_tokens([member["piece"] for member in span["members"]]))
+        remaining = token_budget - used_tokens
+        if tokens <= remaining:
+            seen.add(key)
+            parts.append(span["text"].strip())
+            used_tokens += tokens
+        elif len(span["members"]) > 1:
+            # Too long as a whole: consider its chunks separately, best first
+            for member in span["members"]:
+                single = _make_span([dict(member, joiner="", piece=member["text"])])
+                heapq.heappush(queue, (single["rank"], next_position, single))
+                next_position += 1
+        elif not truncated and remaining >= MIN_PARTIAL_TOKENS:
+            seen.add(key)
+            parts.append(_truncate_to_tokens(span["text"], count_tokens, remaining) + "...")
+            used_tokens = token_budget
+            truncated = True
+
+    logger.info(f"Assembled context from {len(search_results)} chunks into {len(parts)} spans "
+                f"(~{used_tokens} of {token_budget} tokens)")
+    return SPAN_SEPARATOR.join(parts)
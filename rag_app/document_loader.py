@@ -1,9 +1,11 @@
 # rag_app/document_loader.py
 import streamlit as st
 import os
+import re
 import sys
 import traceback
 from io import BytesIO
+from rag_app.chunking import PAGE_BREAK
 from rag_app.logging_config import logger
 
 # Import potentially problematic libraries in try-except blocks
@@ -16,6 +18,7 @@ except ImportError:
 
 try:
     from PyPDF2 import PdfReader
+    from rag_app.pdf_extraction import extract_pdf_pages
     PDF_AVAILABLE = True
 except ImportError:
     logger.warning("PDF support unavailable: PyPDF2 library not found")
@@ -32,37 +35,131 @@ except ImportError:
     URL_LOADERS_AVAILABLE = False
 
 def get_input_data(input_type):
-    """Main function to get data based on selected input type"""
+    """Main function to get data based on selected input type
+    
+    Returns:
+        The loaded content as a list of text fragments (pages, sections,
+        paragraphs) in document order, empty if nothing is loaded. Fragments
+        are kept apart all the way into ingestion, so the document is never
+        copied into one string and page boundaries reach the chunker.
+    """
     logger.info(f"Getting input data for type: {input_type}")
     
     if input_type == "Link":
         if not URL_LOADERS_AVAILABLE:
             st.error("URL loading functionality is not available. Required libraries not installed.")
-            return ""
+            return []
         return input_links()
     elif input_type == "Text":
         return input_text()
     elif input_type == "PDF":
         if not PDF_AVAILABLE:
             st.error("PDF processing functionality is not available. PyPDF2 library not installed.")
-            return ""
+            return []
         return input_file("pdf")
     elif input_type == "DOCX":
         if not DOCX_AVAILABLE:
             st.error("Word document processing functionality is not available. python-docx library not installed.")
-            return ""
+            return []
         return input_file("docx")
     elif input_type == "TXT":
         return input_file("txt")
     else:
         st.error("Unsupported input type")
-        return ""
+        return []
+
+def content_length(fragments):
+    """Total characters of loaded content"""
+    return sum(len(fragment) for fragment in fragments)
+
+def content_preview(fragments, limit=500):
+    """The first limit characters of loaded content, without joining all of its fragments"""
+    preview = []
+    size = 0
+    for fragment in fragments:
+        if size >= limit:
+            break
+        preview.append(fragment[:limit - size])
+        size += len(preview[-1])
+    return "".join(preview)
+
+def show_content_summary(fragments, limit=500):
+    """Show the size of loaded content and a preview of its start"""
+    total = content_length(fragments)
+    st.markdown(f"**Total characters:** {total}")
+    st.text(content_preview(fragments, limit) + ("..." if total > limit else ""))
+
+def iter_pdf_pages(reader, on_page=None, name="PDF"):
+    """Yield the text of each PDF page that has any, followed by PAGE_BREAK
+    
+    Args:
+        reader: PdfReader of the document
+        on_page: Optional callback(page_number, total_pages) called after each page
+        name: Document name used in log messages
+    """
+    total_pages = len(reader.pages)
+    for i, page in enumerate(reader.pages):
+        text = page.extract_text()
+        if on_page is not None:
+            on_page(i + 1, total_pages)
+        if text:  # Only yield if text was successfully extracted
+            yield text + PAGE_BREAK
+        else:
+            logger.warning(f"No text extracted from page {i+1} in {name}")
+
+def iter_docx_paragraphs(doc):
+    """Yield each non-empty paragraph of a Word document, one line each"""
+    for paragraph in doc.paragraphs:
+        if paragraph.text:
+            yield paragraph.text + "\n"
+
+def iter_url_sections(url):
+    """Fetch a URL and yield its content as markdown sections, split at headings
+    
+    The first section starts with a page break and a "Source: <url>" line,
+    so content of different URLs never shares a structure chunk. Raises on network
+    or HTTP errors so callers can fall back to another loader.
+    """
+    response = requests.get(url, timeout=10)
+    response.raise_for_status()
+    soup = BeautifulSoup(response.text, 'html.parser')
+    
+    # Remove script and style elements
+    for script in soup(["script", "style"]):
+        script.extract()
+    
+    # Convert to markdown
+    h = html2text.HTML2Text()
+    h.ignore_links = False
+    text = h.handle(str(soup))
+    
+    yield f"{PAGE_BREAK}Source: {url}\n"
+    for section in re.split(r'\n(?=#{1,6} )', text):
+        if section:
+            yield section + "\n"
+
+def get_input_source(input_type):
+    """Get the source name (file name or URLs) of the content loaded for an input type
+    
+    Returns:
+        Source string, or None for pasted text and when nothing has been loaded
+    """
+    source_keys = {
+        "Link": "url_source",
+        "PDF": "pdf_source",
+        "DOCX": "docx_source",
+        "TXT": "txt_source",
+    }
+    key = source_keys.get(input_type)
+    if key is None:
+        return None
+    return st.session_state.get(key)
 
 def input_links():
     """Handle URL input and loading"""
     if not URL_LOADERS_AVAILABLE:
         st.error("URL loading functionality is not available. Required libraries not installed.")
-        return ""
+        return []
         
     st.markdown("""
     <div style="background-color: #f1f8e9; padding: 0.5rem; border-radius: 5px; margin-bottom: 0.8rem;">
@@ -86,13 +183,13 @@ def input_links():
                                             use_container_width=True,
                                             type="primary")
     
-    content = ""  # Initialize content outside the conditional block
+    sections = []  # Initialize content outside the conditional block
     
     if submit_button:
         # Double-check URL_LOADERS_AVAILABLE in case it changed during runtime
         if not URL_LOADERS_AVAILABLE:
             st.error("URL loading functionality is not available. Required libraries not installed.")
-            return ""
+            return []
             
         urls = [url.strip()]
         if additional_urls:
@@ -102,14 +199,12 @@ def input_links():
         
         if not valid_urls:
             st.error("Please enter at least one valid URL starting with http:// or https://.")
-            return ""
+            return []
         
         with st.spinner("Loading content from URLs..."):
             progress_bar = st.progress(0)
             try:
-                h = html2text.HTML2Text()
-                h.ignore_links = False
-                
+                sections = []
                 for i, url in enumerate(valid_urls):
                     try:
                         # Update progress
@@ -117,27 +212,18 @@ def input_links():
                         progress_bar.progress(progress_value, text=f"Loading {url}")
                         
                         # First try using requests + BeautifulSoup + html2text for better control
-                        response = requests.get(url, timeout=10)
-                        response.raise_for_status()
-                        soup = BeautifulSoup(response.text, 'html.parser')
-                        
-                        # Remove script and style elements
-                        for script in soup(["script", "style"]):
-                            script.extract()
-                            
-                        # Convert to markdown
-                        text = h.handle(str(soup))
-                        content += f"\n\nSource: {url}\n{text}\n"
+                        url_sections = list(iter_url_sections(url))
+                        sections.extend(url_sections)
                         
                         # Debug log to check content
-                        logger.info(f"Content retrieved from {url}: {len(text)} characters")
+                        logger.info(f"Content retrieved from {url}: {sum(len(section) for section in url_sections)} characters")
                     except Exception as e:
                         # Fall back to WebBaseLoader
                         st.warning(f"Using fallback loader for {url}: {str(e)}")
                         try:
                             loader = WebBaseLoader([url])
                             docs = loader.load()
-                            content += f"\n\nSource: {url}\n{docs[0].page_content}\n"
+                            sections.append(f"{PAGE_BREAK}Source: {url}\n{docs[0].page_content}\n")
                             logger.info(f"Content retrieved via fallback from {url}: {len(docs[0].page_content)} characters")
                         except Exception as e2:
                             st.error(f"Failed to load {url}: {str(e2)}")
@@ -146,33 +232,29 @@ def input_links():
                 # Complete the progress bar
                 progress_bar.progress(1.0, text="Loading complete")
                 
-                if content:
+                if sections:
                     st.success(f"Successfully loaded content from {len(valid_urls)} URL(s)")
-                    logger.info(f"Total content from URLs: {len(content)} characters")
+                    logger.info(f"Total content from URLs: {content_length(sections)} characters in {len(sections)} sections")
                     
                     # Show content directly instead of using an expander
-                    st.markdown(f"**Total characters:** {len(content)}")
-                    if len(content) > 500:
-                        st.text(content[:500] + "...")
-                    else:
-                        st.text(content)
+                    show_content_summary(sections)
                 else:
                     st.error("No content could be extracted from the provided URLs")
                     logger.error("No content extracted from URLs")
-                    content = ""  # Ensure empty string is returned
             except Exception as e:
                 st.error(f"Error loading URLs: {str(e)}")
                 logger.error(f"Error loading URLs: {str(e)}")
-                content = ""  # Ensure empty string is returned
+                sections = []  # Ensure nothing is returned
     
-    # Important: Store content in session state to persist it
-    if content:
-        st.session_state['url_content'] = content
-        return content
+    # Important: Store the sections in session state to persist them
+    if sections:
+        st.session_state['url_content'] = sections
+        st.session_state['url_source'] = ", ".join(valid_urls)
+        return sections
     elif 'url_content' in st.session_state:
         # Return previously stored content
         return st.session_state['url_content']
-    return ""
+    return []
 
 def input_text():
     """Handle direct text input"""
@@ -205,14 +287,14 @@ def input_text():
             st.markdown(f"**Preview content:**")
             st.text(text[:500] + ("..." if len(text) > 500 else ""))
         
-        return text
+        return [text]
     elif 'text_content' in st.session_state:
         # Return previously stored content
         if st.session_state['text_content']:
             # Show character count for persistent content
             st.info(f"Stored text: {len(st.session_state['text_content'])} characters")
-        return st.session_state['text_content']
-    return ""
+            return [st.session_state['text_content']]
+    return []
 
 def input_file(file_type):
     """Handle file uploads for different file types"""
@@ -225,10 +307,10 @@ def input_file(file_type):
     # Check if required libraries are available
     if file_type == "pdf" and not PDF_AVAILABLE:
         st.error("PDF processing functionality is not available. PyPDF2 library not installed.")
-        return ""
+        return []
     elif file_type == "docx" and not DOCX_AVAILABLE:
         st.error("Word document processing functionality is not available. python-docx library not installed.")
-        return ""
+        return []
     
     st.markdown(f"""
     <div style="background-color: #fff3e0; padding: 0.5rem; border-radius: 5px; margin-bottom: 0.8rem;">
@@ -241,7 +323,7 @@ def input_file(file_type):
                           type=[file_type], 
                           help=f"Select a {file_type} file from your device")
     
-    content = ""  # Initialize content outside the conditional block
+    fragments = []  # Initialize content outside the conditional block
     
     if file is not None:
         # Display file info
@@ -260,39 +342,41 @@ def input_file(file_type):
                 if file_type == "pdf":
                     if not PDF_AVAILABLE:
                         st.error("PDF processing functionality is not available.")
-                        return ""
+                        return []
                         
                     try:
-                        # Use BytesIO buffer to prevent file reading issues
-                        file_bytes = BytesIO(file.read())
-                        reader = PdfReader(file_bytes)
+                        file_bytes = file.read()
+                        reader = PdfReader(BytesIO(file_bytes))
                         total_pages = len(reader.pages)
                         
                         if total_pages == 0:
                             st.error(f"No pages found in PDF file: {file.name}")
                             logger.error(f"PDF has no pages: {file.name}")
-                            return ""
+                            return []
+                        
+                        def report_page(pages_done, total):
+                            progress.progress(pages_done / total, text=f"Processed {pages_done} of {total} pages")
                         
-                        # Flag to track if we extracted any content
-                        extraction_success = False
+                        # Long documents are split into page ranges across worker processes;
+                        # page texts come back in page order and stay separate fragments
+                        pages, failed_pages = extract_pdf_pages(file_bytes, on_progress=report_page,
+                                                               name=file.name, reader=reader)
+                        fragments = pages
                         
-                        for i, page in enumerate(reader.pages):
-                            progress.progress((i+1)/total_pages, text=f"Processing page {i+1} of {total_pages}")
-                            text = page.extract_text()
-                            if text:  # Only add if text was successfully extracted
-                                content += text + "\n\n"
-                                extraction_success = True
-                            else:
-                                logger.warning(f"No text extracted from page {i+1} in {file.name}")
+                        if failed_pages:
+                            shown = ", ".join(str(page) for page in failed_pages[:20])
+                            more = f" and {len(failed_pages) - 20} more" if len(failed_pages) > 20 else ""
+                            st.warning(f"Could not extract {len(failed_pages)} page(s) of {file.name}, "
+                                       f"they were skipped: {shown}{more}")
                         
                         # Check if we got any content at all
-                        if not extraction_success or not content.strip():
+                        if not any(page.strip() for page in pages):
                             st.error(f"No text could be extracted from {file.name}. The PDF might be scanned or image-based.")
                             logger.error(f"No text extracted from any page in PDF: {file.name}")
                             # Clear any previous PDF content to prevent using old data
                             if f'{file_type}_content' in st.session_state:
                                 del st.session_state[f'{file_type}_content']
-                            return ""
+                            return []
                     except Exception as e:
                         st.error(f"Failed to process PDF file: {str(e)}")
                         logger.error(f"Failed to process PDF file: {str(e)}")
@@ -300,49 +384,46 @@ def input_file(file_type):
                         # Clear any previous PDF content to prevent using old data
                         if f'{file_type}_content' in st.session_state:
                             del st.session_state[f'{file_type}_content']
-                        return ""
+                        return []
                 elif file_type == "docx":
                     if not DOCX_AVAILABLE:
                         st.error("Word document processing functionality is not available.")
-                        return ""
+                        return []
                         
                     doc = Document(BytesIO(file.read()))
                     progress.progress(0.5, text="Extracting text...")
-                    content = "\n".join([p.text for p in doc.paragraphs if p.text])
+                    fragments = list(iter_docx_paragraphs(doc))
                     progress.progress(1.0, text="Processing complete!")
                 elif file_type == "txt":
                     progress.progress(0.5, text="Reading text file...")
-                    content = file.read().decode("utf-8")
+                    text = file.read().decode("utf-8")
+                    fragments = [text] if text else []
                     progress.progress(1.0, text="Processing complete!")
                 
-                if content:
+                if fragments:
                     st.success(f"Successfully processed {file.name}")
-                    logger.info(f"File content extracted: {len(content)} characters")
+                    logger.info(f"File content extracted: {content_length(fragments)} characters in {len(fragments)} fragments")
                     
                     # Store file info directly instead of using an expander which causes nesting issues
-                    st.markdown(f"**Total characters:** {len(content)}")
-                    if len(content) > 500:
-                        st.text(content[:500] + "...")
-                    else:
-                        st.text(content)
+                    show_content_summary(fragments)
                     
                     # Store in session state
-                    st.session_state[f'{file_type}_content'] = content
+                    st.session_state[f'{file_type}_content'] = fragments
+                    st.session_state[f'{file_type}_source'] = file.name
                 else:
                     st.error(f"No text could be extracted from {file.name}")
                     logger.error(f"No text extracted from {file.name}")
-                    content = ""
             except Exception as e:
                 st.error(f"Failed to process {file_type.upper()} file: {str(e)}")
                 logger.error(f"Failed to process {file_type.upper()} file: {str(e)}")
-                content = ""
+                fragments = []
     
     # Return content from this run or from session state if available
-    if content:
-        return content
+    if fragments:
+        return fragments
     elif f'{file_type}_content' in st.session_state:
         if st.session_state[f'{file_type}_content']:
             # Show character count for persistent content
-            st.info(f"Stored {file_type.upper()} content: {len(st.session_state[f'{file_type}_content'])} characters")
+            st.info(f"Stored {file_type.upper()} content: {content_length(st.session_state[f'{file_type}_content'])} characters")
         return st.session_state[f'{file_type}_content']
-    return ""
\ No newline at end of file
+    return []
\ No newline at end of file
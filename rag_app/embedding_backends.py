@@ -0,0 +1,142 @@
+# rag_app/embedding_backends.py
+import os
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Union
+import numpy as np
+from rag_app.logging_config import logger
+
+EMBEDDING_BACKENDS = ("pytorch", "onnx-int8")
+DEFAULT_EMBEDDING_BACKEND = "pytorch"
+
+def hub_model_id(model_name: str) -> str:
+    """Full Hugging Face id of a model (bare names live under sentence-transformers/)"""
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+class EmbeddingBackend(ABC):
+    """Base class of embedding backends
+
+    A backend loads one model and reports what the rest of the engine needs
+    to know about it: its id, embedding dimension, tokenizer and sequence
+    limit. encode returns L2-normalized float32 embeddings, one row per text
+    (a single vector for a single string). Subclasses must implement encode.
+    """
+
+    name = "base"
+
+    def __init__(self, model_name: str):
+        self.model_id = hub_model_id(model_name)
+        self.dimension = 0
+        self.tokenizer = None
+        self.max_seq_length = 256
+
+    @abstractmethod
+    def encode(self, texts: Union[str, List[str]], batch_size: int = 32) -> np.ndarray:
+        """Embed a text, or a list of texts in batches of batch_size"""
+
+    def describe(self) -> Dict[str, Any]:
+        """Identity of the backend, as recorded in the knowledge base manifest"""
+        return {"backend": self.name, "model_id": self.model_id, "dimension": self.dimension}
+
+    @property
+    def cache_id(self) -> str:
+        """Model identity used in embedding cache keys (embeddings differ between backends)"""
+        return f"{self.name}:{self.model_id}"
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """The model run by sentence-transformers on PyTorch (CPU)"""
+
+    name = "pytorch"
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        from sentence_transformers import SentenceTransformer
+
+        token = os.environ.get("HUGGING_FACE_HUB_TOKEN")
+        self.model = SentenceTransformer(model_name, device='cpu', use_auth_token=token)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.tokenizer = self.model.tokenizer
+        self.max_seq_length = self.model.max_seq_length
+
+    def encode(self, texts: Union[str, List[str]], batch_size: int = 32) -> np.ndarray:
+        embeddings = self.model.encode(texts, batch_size=batch_size, show_progress_bar=False,
+                                       normalize_embeddings=True)
+        return np.asarray(embeddings, dtype=np.float32)
+
+class OnnxInt8Backend(EmbeddingBackend):
+    """The same model exported to ONNX with dynamically quantized int8 weights
+
+    On first use the model is exported with optimum and quantized with
+    onnxruntime into cache_dir; later loads only need onnxruntime and the
+    tokenizer. Embeddings are mean-pooled over the attention mask and
+    L2-normalized, matching the sentence-transformers pipeline of the model.
+    """
+
+    name = "onnx-int8"
+
+    def __init__(self, model_name: str, cache_dir: str):
+        super().__init__(model_name)
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        model_dir = os.path.join(cache_dir, self.model_id.replace("/", "__"))
+        quantized_path = os.path.join(model_dir, "model_int8.onnx")
+        if not os.path.exists(quantized_path):
+            self._export_and_quantize(model_dir, quantized_path)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(quantized_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_seq_length = min(self.tokenizer.model_max_length, 256)
+        self.dimension = int(self.encode("dimension probe").shape[0])
+
+    def _export_and_quantize(self, model_dir: str, quantized_path: str):
+        """Export the model to ONNX and write an int8 dynamically quantized copy"""
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        from transformers import AutoTokenizer
+
+        logger.info(f"Exporting {self.model_id} to ONNX in {model_dir}")
+        os.makedirs(model_dir, exist_ok=True)
+        ORTModelForFeatureExtraction.from_pretrained(self.model_id, export=True).save_pretrained(model_dir)
+        AutoTokenizer.from_pretrained(self.model_id).save_pretrained(model_dir)
+
+        logger.info("Quantizing ONNX model weights to int8")
+        quantize_dynamic(os.path.join(model_dir, "model.onnx"), quantized_path, weight_type=QuantType.QInt8)
+
+    def encode(self, texts: Union[str, List[str]], batch_size: int = 32) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        batches = []
+        for start in range(0, len(texts), max(1, batch_size)):
+            inputs = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                                    max_length=self.max_seq_length, return_tensors="np")
+            feed = {name: value.astype(np.int64) for name, value in inputs.items() if name in self.input_names}
+            token_embeddings = self.session.run(None, feed)[0]
+
+            # Mean pooling over real (non-padding) tokens, then L2 normalization
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            batches.append(pooled.astype(np.float32))
+
+        embeddings = np.vstack(batches) if batches else np.zeros((0, self.dimension), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+def load_embedding_backend(backend: str, model_name: str, cache_dir: str) -> EmbeddingBackend:
+    """Load an embedding backend by name
+
+    Args:
+        backend: One of EMBEDDING_BACKENDS
+        model_name: sentence-transformers model name
+        cache_dir: Directory for converted model files
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    if backend == "pytorch":
+        return SentenceTransformerBackend(model_name)
+    if backend == "onnx-int8":
+        return OnnxInt8Backend(model_name, os.path.join(cache_dir, "onnx_models"))
+    raise ValueError(f"Unknown embedding backend: {backend}. Choose one of {', '.join(EMBEDDING_BACKENDS)}")
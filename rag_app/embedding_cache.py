@@ -0,0 +1,172 @@
+# rag_app/embedding_cache.py
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable
+import numpy as np
+from rag_app.logging_config import logger
+
+# Default number of embeddings kept on disk before LRU eviction kicks in
+DEFAULT_MAX_ENTRIES = 100000
+
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH_SIZE = 500
+
+class EmbeddingCache:
+    """Content-addressed on-disk cache of chunk embeddings
+
+    Entries are keyed by a hash of (model name, chunk text) and stored as
+    float32 blobs in SQLite. The cache is bounded by entry count and evicts
+    the least recently used entries first.
+    """
+
+    def __init__(self, db_path: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        """Create the cache table if it does not exist yet"""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    dim INTEGER,
+                    vector BLOB,
+                    last_access REAL
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)')
+            conn.commit()
+        finally:
+            conn.close()
+        logger.info(f"Embedding cache initialized at {self.db_path}")
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        """Build the content-addressed key for a chunk"""
+        digest = hashlib.sha256()
+        digest.update(model_name.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Look up embeddings for the given keys
+
+        Args:
+            keys: Cache keys built with make_key
+
+        Returns:
+            Dictionary of key to embedding for the keys found in the cache
+        """
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, np.ndarray] = {}
+        if not keys:
+            return found
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                cursor = conn.cursor()
+                for start in range(0, len(keys), _SQL_BATCH_SIZE):
+                    batch = keys[start:start + _SQL_BATCH_SIZE]
+                    placeholders = ",".join("?" * len(batch))
+                    cursor.execute(f'SELECT key, dim, vector FROM embeddings WHERE key IN ({placeholders})', batch)
+                    for key, dim, blob in cursor.fetchall():
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        if vector.shape[0] == dim:
+                            found[key] = vector
+
+                # Touch the entries we served so they survive eviction
+                now = time.time()
+                cursor.executemany('UPDATE embeddings SET last_access = ? WHERE key = ?',
+                                   [(now, key) for key in found])
+                conn.commit()
+            finally:
+                conn.close()
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        """Store embeddings and evict the least recently used entries if over capacity
+
+        Args:
+            items: Dictionary of key to embedding
+        """
+        if not items:
+            return
+
+        now = time.time()
+        rows = []
+        for key, embedding in items.items():
+            vector = np.asarray(embedding, dtype=np.float32)
+            rows.append((key, int(vector.shape[0]), vector.tobytes(), now))
+
+        with self._lock:
+            conn = self._connect()
+            try:
+                cursor = conn.cursor()
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO embeddings (key, dim, vector, last_access)
+                    VALUES (?, ?, ?, ?)
+                ''', rows)
+                cursor.execute('SELECT COUNT(*) FROM embeddings')
+                count = cursor.fetchone()[0]
+                overflow = count - self.max_entries
+                if overflow > 0:
+                    cursor.execute('''
+                        DELETE FROM embeddings WHERE key IN (
+                            SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?
+                        )
+                    ''', (overflow,))
+                    logger.info(f"Evicted {overflow} least recently used embeddings from cache")
+                conn.commit()
+            finally:
+                conn.close()
+
+    def count(self) -> int:
+        """Return the number of cached embeddings"""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) FROM embeddings')
+            return cursor.fetchone()[0]
+        finally:
+            conn.close()
+
+    def clear(self):
+        """Remove every cached embedding and reset the counters"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute('DELETE FROM embeddings')
+                conn.commit()
+            finally:
+                conn.close()
+            self.hits = 0
+            self.misses = 0
+        logger.info("Embedding cache cleared")
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters and the current cache size"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self.count(),
+            "max_entries": self.max_entries,
+        }
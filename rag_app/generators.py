@@ -0,0 +1,186 @@
+# rag_app/generators.py
+import asyncio
+import hashlib
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Iterator, Optional
+from rag_app.logging_config import logger
+
+GENERATOR_BACKENDS = ("gemini", "local")
+GEMINI_MODEL_NAME = "gemini-2.0-flash-lite"
+
+GENERATION_TIMEOUT = 30.0  # Seconds per Gemini request
+GENERATION_MAX_RETRIES = 3  # Retries after the first attempt, for retryable errors only
+RETRY_BASE_DELAY = 0.5  # Seconds; the backoff cap doubles with every retry
+RETRY_MAX_DELAY = 8.0
+
+# HTTP status codes worth retrying: rate limited, server errors, timeouts
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class GenerationUnavailableError(Exception):
+    """The generator kept failing with retryable errors (rate limits, timeouts, outages)"""
+
+class GenerationInterruptedError(Exception):
+    """A streamed answer failed after part of it had already been yielded"""
+
+def is_retryable(error: Exception) -> bool:
+    """Check whether a generation error is transient and worth retrying"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    try:
+        from google.api_core import exceptions as google_exceptions
+        if isinstance(error, (google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable,
+                              google_exceptions.InternalServerError, google_exceptions.DeadlineExceeded,
+                              google_exceptions.TooManyRequests)):
+            return True
+    except ImportError:
+        pass
+    code = getattr(error, "code", None)
+    code = getattr(code, "value", code)
+    return code in RETRYABLE_STATUS_CODES
+
+def backoff_delay(attempt: int, base_delay: float = RETRY_BASE_DELAY, max_delay: float = RETRY_MAX_DELAY) -> float:
+    """Jittered exponential backoff: a random delay up to base_delay * 2^attempt (capped)"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+class GeneratorBackend(ABC):
+    """Base class of answer generators
+
+    generate returns the whole answer; generate_stream yields it in pieces.
+    Both raise GenerationUnavailableError once retryable failures exhaust
+    the retries, and let other errors through unchanged. Subclasses must
+    implement both.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def generate(self, prompt: str) -> str:
+        """Generate the whole answer to a prompt"""
+
+    @abstractmethod
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        """Yield the answer to a prompt in pieces as they are generated"""
+
+    def warm_up(self):
+        """Prepare the client ahead of the first request"""
+
+class GeminiGenerator(GeneratorBackend):
+    """Gemini, through one GenerativeModel client reused for every request"""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, model_name: str = GEMINI_MODEL_NAME, timeout: float = GENERATION_TIMEOUT,
+                 max_retries: int = GENERATION_MAX_RETRIES):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _client(self):
+        """Import, configure and create the Gemini client on first use"""
+        with self._lock:
+            if self._model is None:
+                import google.generativeai as genai
+                genai.configure(api_key=self.api_key)
+                self._model = genai.GenerativeModel(self.model_name)
+            return self._model
+
+    def warm_up(self):
+        self._client()
+
+    async def generate(self, prompt: str) -> str:
+        client = self._client()
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await asyncio.wait_for(
+                    client.generate_content_async(prompt, request_options={"timeout": self.timeout}),
+                    timeout=self.timeout)
+                return (getattr(response, "text", "") or "").strip()
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                if attempt == self.max_retries:
+                    raise GenerationUnavailableError(str(e) or type(e).__name__) from e
+                delay = backoff_delay(attempt)
+                logger.warning(f"Gemini request failed ({type(e).__name__}: {str(e)}), "
+                               f"retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        client = self._client()
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                response = client.generate_content(prompt, stream=True, request_options={"timeout": self.timeout})
+                for chunk in response:
+                    text = getattr(chunk, "text", "")
+                    if text:
+                        started = True
+                        yield text
+                return
+            except Exception as e:
+                # Once text has been shown, a retry would repeat it
+                if started or not is_retryable(e):
+                    raise
+                if attempt == self.max_retries:
+                    raise GenerationUnavailableError(str(e) or type(e).__name__) from e
+                delay = backoff_delay(attempt)
+                logger.warning(f"Gemini stream failed ({type(e).__name__}: {str(e)}), "
+                               f"retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+
+class LocalGenerator(GeneratorBackend):
+    """Deterministic offline stand-in for load tests and benchmarks
+
+    Answers are built from the prompt alone (the question and the start of
+    the context), so the same prompt always gives the same answer. latency
+    is the delay before the first piece, and pieces of the answer follow
+    every piece_delay seconds when streaming.
+    """
+
+    name = "local"
+
+    def __init__(self, latency: float = 0.5, piece_delay: float = 0.02):
+        self.latency = latency
+        self.piece_delay = piece_delay
+
+    @staticmethod
+    def _answer(prompt: str) -> str:
+        question = re.search(r'QUESTION:\s*(.*?)\s*ANSWER:', prompt, re.S)
+        context = re.search(r'CONTEXT:\s*(.*?)\s*QUESTION:', prompt, re.S)
+        question_text = " ".join(question.group(1).split()) if question else ""
+        context_text = " ".join(context.group(1).split())[:300] if context else ""
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        return f"[local answer {digest}] {question_text} The context says: {context_text}"
+
+    async def generate(self, prompt: str) -> str:
+        await asyncio.sleep(self.latency)
+        return self._answer(prompt)
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        time.sleep(self.latency)
+        words = self._answer(prompt).split(" ")
+        for start in range(0, len(words), 8):
+            if start:
+                time.sleep(self.piece_delay)
+            yield " ".join(words[start:start + 8]) + (" " if start + 8 < len(words) else "")
+
+def create_generator(backend: str, api_key: Optional[str] = None, local_latency: float = 0.5) -> GeneratorBackend:
+    """Create a generator backend by name
+
+    Raises:
+        ValueError: If the backend is unknown, or Gemini is requested without an API key
+    """
+    if backend == "gemini":
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY environment variable not set. Please set it before running the application.")
+        return GeminiGenerator(api_key)
+    if backend == "local":
+        return LocalGenerator(latency=local_latency)
+    raise ValueError(f"Unknown generator backend: {backend}. Choose one of {', '.join(GENERATOR_BACKENDS)}")
@@ -0,0 +1,356 @@
+# rag_app/ingestion_jobs.py
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from rag_app.logging_config import logger
+
+# Documents ingested at once. Each job chunks and embeds on its own thread,
+# so this bounds the CPU ingestion takes from query embedding.
+INGESTION_WORKERS = 1
+
+# Jobs queued or running before new submissions are refused
+INGESTION_MAX_PENDING = 16
+
+# Finished jobs kept in the status table
+JOB_HISTORY_LIMIT = 200
+
+# Seconds between progress writes to the status table
+PROGRESS_WRITE_INTERVAL = 0.5
+
+# Seconds between heartbeats of a process's queued and running jobs
+JOB_HEARTBEAT_INTERVAL = 10.0
+
+# Active jobs whose heartbeat is older than this are taken to belong to a
+# process that stopped, and are marked failed
+JOB_STALE_AFTER = 60.0
+
+# Identifies this process in the owner column; the token tells it apart
+# from an earlier process that had the same pid
+PROCESS_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+ACTIVE_JOB_STATUSES = ("queued", "running")
+
+class JobCancelledError(Exception):
+    """Raised inside a job when cancellation was requested"""
+
+class JobQueueFullError(Exception):
+    """Too many ingestion jobs are queued or running to accept another"""
+
+class IngestionJobStore:
+    """Status and progress of ingestion jobs, persisted in SQLite
+
+    Status survives browser refreshes and app restarts. Several app processes
+    can share the table: each job records the process that owns it
+    ("host:pid:token") and that process refreshes its heartbeat, so only jobs
+    whose owner stopped (a dead pid on this host, or no heartbeat for
+    JOB_STALE_AFTER seconds) are marked failed.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.owner = PROCESS_OWNER
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        """Create the jobs table if needed and fail jobs left over from stopped processes"""
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                    id TEXT PRIMARY KEY,
+                    namespace TEXT,
+                    source TEXT,
+                    status TEXT,
+                    progress REAL,
+                    message TEXT,
+                    created_at REAL,
+                    started_at REAL,
+                    finished_at REAL,
+                    owner TEXT,
+                    heartbeat_at REAL
+                )
+            ''')
+            columns = [row[1] for row in cursor.execute('PRAGMA table_info(ingestion_jobs)')]
+            for name, kind in (("owner", "TEXT"), ("heartbeat_at", "REAL")):
+                if name not in columns:
+                    cursor.execute(f'ALTER TABLE ingestion_jobs ADD COLUMN {name} {kind}')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_created ON ingestion_jobs (created_at)')
+            conn.commit()
+        finally:
+            conn.close()
+        self.fail_orphaned_jobs()
+        logger.info(f"Ingestion job store initialized at {self.db_path}")
+
+    def _owner_alive(self, owner: Optional[str], heartbeat_at: Optional[float], now: float) -> bool:
+        """Whether the process that owns a job is still running, as far as can be told"""
+        if owner == self.owner:
+            return True
+        if not owner or heartbeat_at is None or now - heartbeat_at > JOB_STALE_AFTER:
+            return False
+        host, pid, _ = owner.rsplit(":", 2)
+        if host != socket.gethostname() or os.name != "posix":
+            return True
+        if int(pid) == os.getpid():
+            # A restarted container can reuse the pid of the process before it
+            return False
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def fail_orphaned_jobs(self) -> int:
+        """Mark queued and running jobs of stopped processes as failed
+
+        Returns:
+            Number of jobs marked failed
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT id, owner, heartbeat_at FROM ingestion_jobs
+                    WHERE status IN ({", ".join("?" for _ in ACTIVE_JOB_STATUSES)})
+                ''', ACTIVE_JOB_STATUSES)
+                orphaned = [job_id for job_id, owner, heartbeat_at in cursor.fetchall()
+                            if not self._owner_alive(owner, heartbeat_at, now)]
+                cursor.executemany(f'''
+                    UPDATE ingestion_jobs SET status = 'failed', message = 'Interrupted by an application restart',
+                        finished_at = ? WHERE id = ? AND status IN ({", ".join("?" for _ in ACTIVE_JOB_STATUSES)})
+                ''', [(now, job_id, *ACTIVE_JOB_STATUSES) for job_id in orphaned])
+                conn.commit()
+            finally:
+                conn.close()
+        if orphaned:
+            logger.warning(f"Marked {len(orphaned)} interrupted ingestion jobs as failed")
+        return len(orphaned)
+
+    def heartbeat(self):
+        """Refresh the heartbeat of this process's queued and running jobs"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(f'''
+                    UPDATE ingestion_jobs SET heartbeat_at = ?
+                    WHERE owner = ? AND status IN ({", ".join("?" for _ in ACTIVE_JOB_STATUSES)})
+                ''', (time.time(), self.owner, *ACTIVE_JOB_STATUSES))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def create(self, job_id: str, namespace: str, source: str):
+        """Record a new queued job, dropping the oldest finished jobs beyond JOB_HISTORY_LIMIT"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                cursor = conn.cursor()
+                now = time.time()
+                cursor.execute('''
+                    INSERT INTO ingestion_jobs (id, namespace, source, status, progress, message, created_at,
+                                                owner, heartbeat_at)
+                    VALUES (?, ?, ?, 'queued', 0.0, 'Waiting for a worker', ?, ?, ?)
+                ''', (job_id, namespace, source, now, self.owner, now))
+                cursor.execute(f'''
+                    DELETE FROM ingestion_jobs WHERE status NOT IN ({", ".join("?" for _ in ACTIVE_JOB_STATUSES)})
+                    AND id NOT IN (SELECT id FROM ingestion_jobs ORDER BY created_at DESC LIMIT ?)
+                ''', (*ACTIVE_JOB_STATUSES, JOB_HISTORY_LIMIT))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def update(self, job_id: str, **fields: Any):
+        """Set columns of a job (status, progress, message, started_at, finished_at)"""
+        if not fields:
+            return
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(f'UPDATE ingestion_jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job as a dict, or None if unknown"""
+        jobs = self._select('WHERE id = ?', (job_id,))
+        return jobs[0] if jobs else None
+
+    def list_jobs(self, namespace: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent jobs first, optionally only those of one namespace"""
+        if namespace is None:
+            return self._select('ORDER BY created_at DESC LIMIT ?', (limit,))
+        return self._select('WHERE namespace = ? ORDER BY created_at DESC LIMIT ?', (namespace, limit))
+
+    def _select(self, clause: str, params: Tuple[Any, ...]) -> List[Dict[str, Any]]:
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.row_factory = sqlite3.Row
+                rows = conn.execute(f'SELECT * FROM ingestion_jobs {clause}', params).fetchall()
+                return [dict(row) for row in rows]
+            finally:
+                conn.close()
+
+class JobProgress:
+    """Handed to a running job to report progress and notice cancellation"""
+
+    def __init__(self, store: IngestionJobStore, job_id: str, cancel_event: threading.Event):
+        self.store = store
+        self.job_id = job_id
+        self.cancel_event = cancel_event
+        self._last_write = 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        """Raise JobCancelledError if cancellation was requested"""
+        if self.cancel_event.is_set():
+            raise JobCancelledError(f"Ingestion job {self.job_id} was cancelled")
+
+    def update(self, fraction: Optional[float], message: str, force: bool = False):
+        """Record progress (0-1, None if unknown) and a status message, then stop here if the job was cancelled
+
+        Writes are throttled to one per PROGRESS_WRITE_INTERVAL unless force is set.
+        """
+        now = time.monotonic()
+        if force or now - self._last_write >= PROGRESS_WRITE_INTERVAL:
+            if fraction is None:
+                self.store.update(self.job_id, message=message)
+            else:
+                self.store.update(self.job_id, progress=max(0.0, min(1.0, fraction)), message=message)
+            self._last_write = now
+        self.check_cancelled()
+
+# A job's work: takes its JobProgress and returns (success, message)
+JobWork = Callable[[JobProgress], Tuple[bool, str]]
+
+class IngestionJobManager:
+    """Bounded worker pool that runs ingestion jobs in the background
+
+    submit returns a job id at once; the work runs on one of at most
+    workers threads while callers poll get() for status and progress.
+    Cancellation is cooperative: the job stops at its next progress update.
+    A daemon thread keeps the heartbeat of this process's jobs fresh and
+    fails jobs abandoned by other processes that stopped.
+    """
+
+    def __init__(self, store: IngestionJobStore, workers: int = INGESTION_WORKERS,
+                 max_pending: int = INGESTION_MAX_PENDING):
+        self.store = store
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag-ingestion")
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        threading.Thread(target=self._heartbeat_loop, name="rag-ingestion-heartbeat", daemon=True).start()
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(JOB_HEARTBEAT_INTERVAL)
+            try:
+                if self.pending():
+                    self.store.heartbeat()
+                self.store.fail_orphaned_jobs()
+            except Exception as e:
+                logger.error(f"Error refreshing ingestion job heartbeats: {str(e)}")
+
+    def submit(self, work: JobWork, namespace: str, source: str) -> str:
+        """Queue a job and return its id
+
+        Raises:
+            JobQueueFullError: If max_pending jobs are already queued or running
+        """
+        with self._lock:
+            if len(self._cancel_events) >= self.max_pending:
+                raise JobQueueFullError(f"{len(self._cancel_events)} documents are already being processed. "
+                                        f"Please wait for some of them to finish.")
+            job_id = uuid.uuid4().hex[:16]
+            self._cancel_events[job_id] = threading.Event()
+        created = False
+        try:
+            self.store.create(job_id, namespace, source)
+            created = True
+            self._executor.submit(self._run, job_id, work)
+        except Exception as e:
+            # Give the reserved slot back, and do not leave the job queued forever
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
+            if created:
+                self.store.update(job_id, status="failed", message=f"Could not start the job: {str(e)}",
+                                  finished_at=time.time())
+            raise
+        logger.info(f"Queued ingestion job {job_id} for {source or 'pasted text'} in namespace {namespace}")
+        return job_id
+
+    def _run(self, job_id: str, work: JobWork):
+        with self._lock:
+            cancel_event = self._cancel_events[job_id]
+        try:
+            if cancel_event.is_set():
+                self.store.update(job_id, status="cancelled", message="Cancelled before it started",
+                                  finished_at=time.time())
+                return
+            self.store.update(job_id, status="running", message="Starting", started_at=time.time())
+            start_time = time.perf_counter()
+            try:
+                success, message = work(JobProgress(self.store, job_id, cancel_event))
+            except JobCancelledError:
+                logger.info(f"Ingestion job {job_id} cancelled")
+                self.store.update(job_id, status="cancelled", message="Cancelled", finished_at=time.time())
+                return
+            except Exception as e:
+                logger.error(f"Ingestion job {job_id} failed: {str(e)}", exc_info=True)
+                success, message = False, f"Error processing documents: {str(e)}"
+            if success:
+                self.store.update(job_id, status="succeeded", progress=1.0, message=message, finished_at=time.time())
+            else:
+                self.store.update(job_id, status="failed", message=message, finished_at=time.time())
+            logger.info(f"Ingestion job {job_id} {'succeeded' if success else 'failed'} "
+                        f"in {time.perf_counter() - start_time:.2f}s: {message}")
+        finally:
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
+
+    def cancel(self, job_id: str) -> bool:
+        """Request cancellation of a queued or running job
+
+        Returns:
+            True if the job was still active, False if it already finished or is unknown
+        """
+        with self._lock:
+            cancel_event = self._cancel_events.get(job_id)
+        if cancel_event is None:
+            return False
+        cancel_event.set()
+        logger.info(f"Cancellation requested for ingestion job {job_id}")
+        return True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status, progress and message of a job"""
+        return self.store.get(job_id)
+
+    def list_jobs(self, namespace: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent jobs first, optionally only those of one namespace"""
+        return self.store.list_jobs(namespace, limit)
+
+    def pending(self) -> int:
+        """Number of jobs queued or running"""
+        with self._lock:
+            return len(self._cancel_events)
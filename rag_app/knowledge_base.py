@@ -0,0 +1,310 @@
+# rag_app/knowledge_base.py
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from rag_app.logging_config import logger
+
+# Seconds between checks for table changes made outside this process
+VERSION_CHECK_INTERVAL = 5.0
+
+# File in the knowledge base directory recording which embedding backend built it
+MANIFEST_FILE = "manifest.json"
+
+# Schema metadata key holding a random id given to a table when it is created.
+# Table versions start over when a table is dropped and created again, so
+# cached state is keyed by (id, version).
+TABLE_ID_METADATA_KEY = b"rag_table_id"
+
+# Open knowledge base handles kept per process (one per namespace), and the
+# seconds after which an unused handle is closed
+MAX_OPEN_HANDLES = 64
+HANDLE_IDLE_TIMEOUT = 900.0
+
+def new_table_id() -> str:
+    """Random id for a newly created table"""
+    return uuid.uuid4().hex
+
+def table_id_of_schema(schema) -> Optional[str]:
+    """Id stamped on a table at creation, or None for tables created before ids were recorded"""
+    table_id = (schema.metadata or {}).get(TABLE_ID_METADATA_KEY)
+    return table_id.decode("utf-8") if table_id is not None else None
+
+class KnowledgeBaseHandle:
+    """Long-lived connection and table handle for one knowledge base
+
+    Keeps the LanceDB connection and the opened table alive between
+    queries, and tracks the table version and row count so callers can
+    check for data without scanning the table. The state is refreshed
+    after an ingest (via invalidate) or when a periodic version check
+    notices the table changed on disk. Every invalidate bumps a generation
+    counter, so an async refresh that was already running when the table
+    changed drops its now stale result instead of caching it.
+    """
+
+    def __init__(self, path: str, table_name: str, check_interval: float = VERSION_CHECK_INTERVAL):
+        self.path = path
+        self.table_name = table_name
+        self.check_interval = check_interval
+        self.version: Optional[int] = None
+        self.row_count = 0
+        self._db = None
+        self._table = None
+        self._last_check = 0.0
+        self._lock = threading.RLock()
+        # Async connection and table used by the async query path
+        self._async_db = None
+        self._async_table = None
+        self._async_version: Optional[int] = None
+        self._async_table_id: Optional[str] = None
+        self._async_row_count = 0
+        self._async_last_check = 0.0
+        self._generation = 0
+        self._manifest: Optional[Dict[str, Any]] = None
+
+    def db(self):
+        """Get the (cached) LanceDB connection, creating the directory if needed"""
+        with self._lock:
+            if self._db is None:
+                import lancedb
+                os.makedirs(self.path, exist_ok=True)
+                logger.info(f"Connecting to LanceDB at: {self.path}")
+                self._db = lancedb.connect(self.path)
+            return self._db
+
+    def table(self):
+        """Get the opened table, or None if it does not exist
+
+        Re-checks the table version at most every check_interval seconds.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_check >= self.check_interval:
+                self._refresh()
+                self._last_check = now
+            return self._table
+
+    def _refresh(self):
+        """Open the table if needed and update version and row count if it changed"""
+        db = self.db()
+        if self._table is None:
+            if self.table_name not in db.table_names():
+                self.version = None
+                self.row_count = 0
+                return
+            self._table = db.open_table(self.table_name)
+            logger.info(f"Opened knowledge base table {self.table_name}")
+        elif hasattr(self._table, "checkout_latest"):
+            # Pick up writes made by other processes
+            self._table.checkout_latest()
+
+        version = self._table.version
+        if version != self.version:
+            self.row_count = self._table.count_rows()
+            self.version = version
+            logger.info(f"Knowledge base table at version {version} with {self.row_count} rows")
+
+    async def async_table(self):
+        """Get the opened async table, or None if it does not exist
+
+        Async counterpart of table(), backed by LanceDB's async connection.
+        """
+        now = time.monotonic()
+        if now - self._async_last_check >= self.check_interval:
+            await self._refresh_async(now)
+        return self._async_table
+
+    async def _refresh_async(self, now: float):
+        """Open the async table if needed and update its version and row count
+
+        Works on local copies of the state, as invalidate() and close() may
+        run on other threads while this awaits. The result is only stored
+        (and now recorded as the last check) if no invalidate() ran in the
+        meantime; otherwise the next access refreshes again.
+        """
+        with self._lock:
+            generation = self._generation
+            db = self._async_db
+            table = self._async_table
+            version = self._async_version
+            table_id = self._async_table_id
+            row_count = self._async_row_count
+
+        if db is None:
+            import lancedb
+            os.makedirs(self.path, exist_ok=True)
+            db = await lancedb.connect_async(self.path)
+
+        if table is None:
+            if self.table_name in await db.table_names():
+                table = await db.open_table(self.table_name)
+        else:
+            await table.checkout_latest()
+
+        if table is None:
+            version, table_id, row_count = None, None, 0
+        else:
+            latest = await table.version()
+            if latest != version:
+                row_count = await table.count_rows()
+                # Re-read: a table dropped and created again restarts its versions under a new id
+                table_id = table_id_of_schema(await table.schema())
+                version = latest
+
+        with self._lock:
+            if generation != self._generation:
+                logger.info(f"Knowledge base {self.path} changed during a refresh, dropping its result")
+                return
+            self._async_db = db
+            self._async_table = table
+            self._async_version = version
+            self._async_table_id = table_id
+            self._async_row_count = row_count
+            self._async_last_check = now
+
+    async def exists_async(self) -> bool:
+        """Async counterpart of exists()"""
+        return await self.async_table() is not None and self._async_row_count > 0
+
+    @property
+    def async_version(self) -> Optional[int]:
+        """Version of the table as last seen by the async path"""
+        return self._async_version
+
+    @property
+    def async_table_key(self) -> Tuple[Optional[str], Optional[int]]:
+        """Id and version of the table as last seen by the async path, for keying state cached per table content"""
+        return self._async_table_id, self._async_version
+
+    @property
+    def async_row_count(self) -> int:
+        """Row count of the table as last seen by the async path"""
+        return self._async_row_count
+
+    def manifest(self) -> Optional[Dict[str, Any]]:
+        """Get the recorded embedding backend of the knowledge base, or None if none was recorded"""
+        with self._lock:
+            if self._manifest is None:
+                path = os.path.join(self.path, MANIFEST_FILE)
+                if os.path.exists(path):
+                    try:
+                        with open(path, encoding="utf-8") as f:
+                            self._manifest = json.load(f)
+                    except (OSError, ValueError) as e:
+                        logger.error(f"Could not read knowledge base manifest: {str(e)}")
+            return self._manifest
+
+    def write_manifest(self, manifest: Dict[str, Any]):
+        """Record the embedding backend that built the knowledge base"""
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            path = os.path.join(self.path, MANIFEST_FILE)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(path + ".tmp", path)
+            self._manifest = dict(manifest)
+
+    def invalidate(self):
+        """Forget the opened tables so the next access reopens them (call after every ingest)"""
+        with self._lock:
+            self._generation += 1
+            self._table = None
+            self.version = None
+            self.row_count = 0
+            self._last_check = 0.0
+            self._async_table = None
+            self._async_version = None
+            self._async_table_id = None
+            self._async_row_count = 0
+            self._async_last_check = 0.0
+            self._manifest = None
+
+    def exists(self) -> bool:
+        """Check whether the table exists and has at least one row"""
+        return self.table() is not None and self.row_count > 0
+
+    def close(self):
+        """Drop the connections and tables; the handle reopens them if used again"""
+        with self._lock:
+            self.invalidate()
+            self._db = None
+            self._async_db = None
+
+class KnowledgeBaseHandlePool:
+    """LRU of open knowledge base handles with idle eviction
+
+    One deployment can serve many namespaces without reopening tables on
+    every query, while holding at most max_open handles. Handles unused for
+    idle_timeout seconds are closed on the next access to the pool. A caller
+    still holding an evicted handle can keep using it; it just reconnects.
+    State kept elsewhere per knowledge base can be released along with its
+    handle through add_close_listener.
+    """
+
+    def __init__(self, max_open: int = MAX_OPEN_HANDLES, idle_timeout: float = HANDLE_IDLE_TIMEOUT):
+        self.max_open = max_open
+        self.idle_timeout = idle_timeout
+        self.opened = 0
+        self.evicted = 0
+        self._handles: "OrderedDict[Tuple[str, str], Tuple[KnowledgeBaseHandle, float]]" = OrderedDict()
+        self._close_listeners: List[Callable[[KnowledgeBaseHandle], None]] = []
+        self._lock = threading.Lock()
+
+    def add_close_listener(self, listener: Callable[[KnowledgeBaseHandle], None]):
+        """Call listener with every handle the pool evicts, after closing it"""
+        with self._lock:
+            self._close_listeners.append(listener)
+
+    def get(self, path: str, table_name: str) -> KnowledgeBaseHandle:
+        """Get the handle for a knowledge base, opening it if it is not in the pool"""
+        key = (path, table_name)
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            entry = self._handles.pop(key, None)
+            handle = entry[0] if entry is not None else KnowledgeBaseHandle(path, table_name)
+            if entry is None:
+                self.opened += 1
+            # Entries are in last-use order, so idle ones are at the front
+            while self._handles:
+                oldest_key, (oldest, last_used) = next(iter(self._handles.items()))
+                if len(self._handles) < self.max_open and now - last_used < self.idle_timeout:
+                    break
+                del self._handles[oldest_key]
+                evicted.append(oldest)
+            self._handles[key] = (handle, now)
+            self.evicted += len(evicted)
+            listeners = list(self._close_listeners)
+        for stale in evicted:
+            logger.info(f"Closing knowledge base handle for {stale.path}")
+            stale.close()
+            for listener in listeners:
+                try:
+                    listener(stale)
+                except Exception as e:
+                    logger.error(f"Error releasing state of knowledge base {stale.path}: {str(e)}")
+        return handle
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of open handles and how many were opened and evicted"""
+        with self._lock:
+            return {
+                "open": len(self._handles),
+                "max_open": self.max_open,
+                "opened": self.opened,
+                "evicted": self.evicted,
+                "idle_timeout_seconds": self.idle_timeout,
+            }
+
+_handles = KnowledgeBaseHandlePool()
+
+def get_knowledge_base_handle(path: str, table_name: str) -> KnowledgeBaseHandle:
+    """Get the process-wide handle for a knowledge base path from the handle pool"""
+    return _handles.get(path, table_name)
+
+def get_handle_pool() -> KnowledgeBaseHandlePool:
+    """Get the process-wide pool of knowledge base handles"""
+    return _handles
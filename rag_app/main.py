@@ -10,11 +10,19 @@ os.environ["STREAMLIT_SERVER_WATCH_INPUTS"] = "false"
 os.environ["USER_AGENT"] = "RAG-Chatbot/1.0"
 
 # Import after setting environment variables
-from rag_app.rag_engine import process_documents, answer_question, check_knowledge_base_exists
-from rag_app.document_loader import get_input_data
+from rag_app.rag_engine import (submit_ingestion_job, list_ingestion_jobs, cancel_ingestion_job,
+                                 answer_question_stream, check_knowledge_base_exists,
+                                 list_documents, delete_document, get_model_status, get_namespaces,
+                                 CHUNKING_STRATEGIES, CHUNKING_STRATEGY)
+from rag_app.generators import GenerationInterruptedError
+from rag_app.namespaces import DEFAULT_NAMESPACE, validate_namespace
+from rag_app.document_loader import content_length, get_input_data, get_input_source
 from rag_app.history_storage import save_interaction, init_db, get_chat_history, clear_history
 from rag_app.logging_config import logger
 
+# Seconds between refreshes of the ingestion job list while jobs are active
+JOB_POLL_INTERVAL = 1.0
+
 # Configure page settings
 st.set_page_config(
     page_title="RAG Chatbot",
@@ -149,8 +157,8 @@ init_db()
 # Function to ensure knowledge base state is correct
 def initialize_knowledge_base_state():
     """Check if the knowledge base really exists and update session state accordingly"""
-    exists = check_knowledge_base_exists()
-    logger.info(f"Knowledge base existence check on startup: {exists}")
+    exists = check_knowledge_base_exists(st.session_state.namespace)
+    logger.info(f"Knowledge base existence check for workspace {st.session_state.namespace}: {exists}")
     
     # Update session state
     st.session_state.knowledge_base_exists = exists
@@ -164,9 +172,11 @@ def initialize_knowledge_base_state():
         
         # Reset input processed flag
         st.session_state.input_processed = False
-        st.session_state.current_input_data = ""
+        st.session_state.current_input_data = []
 
 # Initialize session state variables
+if "namespace" not in st.session_state:
+    st.session_state.namespace = DEFAULT_NAMESPACE
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 if "knowledge_base_exists" not in st.session_state:
@@ -176,9 +186,11 @@ if "input_processed" not in st.session_state:
 if "query_text" not in st.session_state:
     st.session_state.query_text = ""
 if "current_input_data" not in st.session_state:
-    st.session_state.current_input_data = ""
+    st.session_state.current_input_data = []  # Fragments (pages, sections) of the loaded document
 if "show_history" not in st.session_state:
     st.session_state.show_history = False
+if "active_jobs" not in st.session_state:
+    st.session_state.active_jobs = set()
 
 # Initialize knowledge base state
 initialize_knowledge_base_state()
@@ -200,9 +212,25 @@ def handle_query_submit():
             # Add user question to history
             st.session_state.chat_history.append({"role": "user", "content": query})
             
-            # Get answer
+            # Stream the answer into a placeholder as it is generated
+            placeholder = st.empty()
+            response = ""
             with st.spinner("Thinking..."):
-                response = answer_question(query)
+                try:
+                    for piece in answer_question_stream(query, st.session_state.namespace):
+                        response += piece
+                        placeholder.markdown(f"""
+                        <div class="message bot-message">
+                            <strong>Bot:</strong> {response}
+                        </div>
+                        """, unsafe_allow_html=True)
+                except GenerationInterruptedError as e:
+                    # Keep the partial answer visible but marked incomplete, and don't save it
+                    st.session_state.chat_history.append({"role": "assistant", "content": response.strip(),
+                                                          "error": str(e)})
+                    st.session_state.query_text = ""
+                    return
+                response = response.strip()
                 if response:
                     # Add response to history
                     st.session_state.chat_history.append({"role": "assistant", "content": response})
@@ -223,6 +251,42 @@ def clear_chat_history():
 def toggle_history():
     st.session_state.show_history = not st.session_state.show_history
 
+# Ingestion job list; run as a fragment that re-runs on its own while jobs
+# are active, so the page stays usable during background processing
+def show_ingestion_jobs():
+    jobs = list_ingestion_jobs(st.session_state.namespace, limit=5)
+    finished = False
+    for job in jobs:
+        label = job['source'] or 'Pasted text'
+        if job['status'] in ("queued", "running"):
+            st.session_state.active_jobs.add(job['id'])
+            job_cols = st.columns([4, 1])
+            with job_cols[0]:
+                st.progress(job['progress'] or 0.0, text=f"{label}: {job['message']}")
+            with job_cols[1]:
+                if st.button("Cancel", key=f"cancel_{job['id']}"):
+                    cancel_ingestion_job(job['id'])
+        else:
+            if job['id'] in st.session_state.active_jobs:
+                st.session_state.active_jobs.discard(job['id'])
+                finished = True
+            if job['status'] == "succeeded":
+                st.caption(f"✅ {label}: {job['message']}")
+            elif job['status'] == "cancelled":
+                st.caption(f"⏹️ {label}: cancelled")
+            else:
+                st.caption(f"⚠️ {label}: {job['message']}")
+    if finished:
+        # A job of this session finished: refresh the knowledge base status and document list
+        initialize_knowledge_base_state()
+        st.rerun()
+
+# Function to switch to another workspace (knowledge base namespace)
+def switch_workspace(namespace):
+    st.session_state.namespace = namespace
+    clear_chat_history()
+    initialize_knowledge_base_state()
+
 # Set page structure with a clean header
 st.markdown('<div class="header"><h1>RAG Chatbot</h1><p>Retrieval-Augmented Generation for smarter responses</p></div>', unsafe_allow_html=True)
 
@@ -233,12 +297,43 @@ col1, col2 = st.columns([1, 2])
 with col1:
     st.markdown("### 📚 Knowledge Base")
     
+    # Workspace selector: every workspace has its own knowledge base
+    workspaces = get_namespaces()
+    if st.session_state.namespace not in workspaces:
+        # Created in this session, appears on disk once a document is processed
+        workspaces.append(st.session_state.namespace)
+    selected_workspace = st.selectbox(
+        "Workspace",
+        workspaces,
+        index=workspaces.index(st.session_state.namespace),
+        help="Documents processed in a workspace are only searched by questions asked in it"
+    )
+    if selected_workspace != st.session_state.namespace:
+        switch_workspace(selected_workspace)
+        st.rerun()
+    
+    with st.expander("New Workspace"):
+        new_workspace = st.text_input("Workspace name", placeholder="e.g. team-docs")
+        if st.button("Create Workspace", use_container_width=True) and new_workspace:
+            try:
+                switch_workspace(validate_namespace(new_workspace.strip()))
+                st.rerun()
+            except ValueError as e:
+                st.error(str(e))
+    
     # Status indicator
     if st.session_state.knowledge_base_exists:
         st.markdown('<div class="status-indicator status-ready">Knowledge base ready</div>', unsafe_allow_html=True)
     else:
         st.markdown('<div class="status-indicator status-warning">No knowledge base</div>', unsafe_allow_html=True)
     
+    # Embedding model loads in the background; show it until it is ready
+    model_status = get_model_status()
+    if model_status in ("not_started", "loading"):
+        st.markdown('<div class="status-indicator status-warning">Embedding model loading...</div>', unsafe_allow_html=True)
+    elif model_status == "failed":
+        st.markdown('<div class="status-indicator status-warning">Embedding model unavailable</div>', unsafe_allow_html=True)
+    
     # Upload section
     with st.expander("Upload Documents", expanded=not st.session_state.knowledge_base_exists):
         input_type = st.selectbox(
@@ -251,10 +346,18 @@ with col1:
         input_data = get_input_data(input_type)
         if input_data:
             st.session_state.current_input_data = input_data
-            st.success(f"Content loaded: {len(input_data)} characters")
+            st.success(f"Content loaded: {content_length(input_data)} characters")
         else:
             # Clear the current_input_data if no data was returned
-            st.session_state.current_input_data = ""
+            st.session_state.current_input_data = []
+        
+        chunking = st.selectbox(
+            "Chunking Strategy",
+            CHUNKING_STRATEGIES,
+            index=CHUNKING_STRATEGIES.index(CHUNKING_STRATEGY),
+            help="character: fixed-size windows; token: windows bounded by the embedding model's token limit; "
+                 "structure: follows headings, paragraphs and pages"
+        )
         
         # Process button
         process_btn = st.button("Process Documents", type="primary", use_container_width=True)
@@ -262,23 +365,46 @@ with col1:
         if process_btn:
             data_to_process = st.session_state.current_input_data
             
-            if data_to_process and len(data_to_process) > 0:
-                with st.spinner("Processing documents..."):
-                    try:
-                        success, message = process_documents(data_to_process)
-                        if success:
-                            st.session_state.knowledge_base_exists = True
-                            st.session_state.input_processed = True
-                            st.success(f"{message}")
-                            st.rerun()
-                        else:
-                            st.error(message)
-                    except Exception as e:
-                        st.error(f"Error during document processing: {str(e)}")
-                        logger.error(f"Unhandled error in document processing: {str(e)}")
+            if data_to_process:
+                # Processing runs on the background ingestion workers; progress shows below.
+                # The fragments are handed over as they are, never joined into one string
+                job_id, message = submit_ingestion_job(data_to_process, source=get_input_source(input_type),
+                                                       chunking=chunking, namespace=st.session_state.namespace)
+                if job_id:
+                    st.session_state.active_jobs.add(job_id)
+                    st.session_state.input_processed = True
+                    st.success(message)
+                else:
+                    st.error(message)
             else:
                 st.error("No content to process. Please provide input first.")
     
+    # Background processing status of this workspace's documents
+    jobs = list_ingestion_jobs(st.session_state.namespace, limit=5)
+    jobs_active = any(job['status'] in ("queued", "running") for job in jobs)
+    if jobs:
+        with st.expander("Processing Jobs", expanded=jobs_active):
+            st.fragment(show_ingestion_jobs, run_every=JOB_POLL_INTERVAL if jobs_active else None)()
+    
+    # Documents currently in the knowledge base
+    if st.session_state.knowledge_base_exists:
+        with st.expander("Documents in Knowledge Base"):
+            documents = list_documents(st.session_state.namespace)
+            if documents:
+                for document in documents:
+                    doc_cols = st.columns([4, 1])
+                    with doc_cols[0]:
+                        st.markdown(f"**{document['source'] or 'Pasted text'}** ({document['chunks']} chunks)")
+                    with doc_cols[1]:
+                        if st.button("Remove", key=f"remove_{document['doc_id']}"):
+                            if delete_document(document['doc_id'], st.session_state.namespace):
+                                initialize_knowledge_base_state()
+                                st.rerun()
+                            else:
+                                st.error("Failed to remove document. Check logs for details.")
+            else:
+                st.info("No documents found")
+    
     # Previous conversations section
     st.markdown("### 📜 Conversation History")
     history_btn = st.button("Toggle History View", use_container_width=True, on_click=toggle_history)
@@ -317,11 +443,14 @@ with col2:
                 </div>
                 """, unsafe_allow_html=True)
             else:
+                incomplete = ' <em>(incomplete answer)</em>' if message.get("error") else ''
                 st.markdown(f"""
                 <div class="message bot-message">
-                    <strong>Bot:</strong> {message['content']}
+                    <strong>Bot:</strong> {message['content']}{incomplete}
                 </div>
                 """, unsafe_allow_html=True)
+                if message.get("error"):
+                    st.error(message["error"])
     else:
         if st.session_state.knowledge_base_exists:
             st.markdown("""
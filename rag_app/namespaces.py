@@ -0,0 +1,129 @@
+# rag_app/namespaces.py
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from rag_app.logging_config import logger
+
+# Namespace of the original single knowledge base directory
+DEFAULT_NAMESPACE = "default"
+
+# Directory next to the default knowledge base that holds the other namespaces
+NAMESPACES_DIR = "namespaces"
+
+# Per-namespace quotas; None disables a limit
+NAMESPACE_MAX_ROWS: Optional[int] = 200000
+NAMESPACE_MAX_BYTES: Optional[int] = 2 * 1024 ** 3
+
+# Directory sizes for the byte quota are measured once and then kept up to
+# date with the bytes written; they are measured again after this many
+# seconds, since LanceDB's files do not match the written bytes exactly
+DIRECTORY_SIZE_RESCAN_INTERVAL = 60.0
+
+_NAMESPACE_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+
+class NamespaceQuotaError(RuntimeError):
+    """Writing to a namespace would take it over its row or byte quota"""
+
+def validate_namespace(namespace: str) -> str:
+    """Check a namespace name is safe to use as a directory name
+
+    Raises:
+        ValueError: If the name is empty, too long or has characters other than letters, digits, _ . -
+    """
+    if not isinstance(namespace, str) or not _NAMESPACE_PATTERN.match(namespace) or namespace in (".", ".."):
+        raise ValueError(f"Invalid workspace name: {namespace!r}. Use up to 64 letters, digits, '_', '.' or '-'.")
+    return namespace
+
+def namespace_path(default_path: str, namespace: Optional[str]) -> str:
+    """Knowledge base directory of a namespace
+
+    The default namespace keeps the original knowledge base directory, so
+    existing deployments need no migration; the others live in
+    NAMESPACES_DIR next to it, one directory each.
+    """
+    if namespace is None or namespace == DEFAULT_NAMESPACE:
+        return default_path
+    root = os.path.dirname(os.path.normpath(default_path)) or "."
+    return os.path.join(root, NAMESPACES_DIR, validate_namespace(namespace))
+
+def list_namespaces(default_path: str) -> List[str]:
+    """Names of the default namespace and every namespace created so far"""
+    root = os.path.join(os.path.dirname(os.path.normpath(default_path)) or ".", NAMESPACES_DIR)
+    names = []
+    if os.path.isdir(root):
+        names = sorted(name for name in os.listdir(root)
+                       if os.path.isdir(os.path.join(root, name)) and _NAMESPACE_PATTERN.match(name))
+    return [DEFAULT_NAMESPACE] + [name for name in names if name != DEFAULT_NAMESPACE]
+
+def directory_size(path: str) -> int:
+    """Total bytes of the files under a directory (0 if it does not exist)"""
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                # Files can disappear while LanceDB compacts
+                pass
+    return total
+
+# path -> (bytes, time measured) of the directories sized so far
+_directory_sizes: Dict[str, Tuple[int, float]] = {}
+_directory_sizes_lock = threading.Lock()
+
+def cached_directory_size(path: str) -> int:
+    """Size of a directory as last measured plus the bytes recorded since, measuring it when stale"""
+    now = time.monotonic()
+    with _directory_sizes_lock:
+        cached = _directory_sizes.get(path)
+        if cached is not None and now - cached[1] < DIRECTORY_SIZE_RESCAN_INTERVAL:
+            return cached[0]
+    size = directory_size(path)
+    with _directory_sizes_lock:
+        _directory_sizes[path] = (size, now)
+    return size
+
+def record_written_bytes(path: str, size: int):
+    """Add bytes just written under a directory to its cached size"""
+    with _directory_sizes_lock:
+        cached = _directory_sizes.get(path)
+        if cached is not None:
+            _directory_sizes[path] = (cached[0] + size, cached[1])
+
+def forget_directory_size(path: str):
+    """Measure a directory again on next use, after files under it were removed"""
+    with _directory_sizes_lock:
+        _directory_sizes.pop(path, None)
+
+def check_quota(namespace: str, path: str, rows: int, incoming_bytes: int = 0,
+                max_rows: Optional[int] = NAMESPACE_MAX_ROWS, max_bytes: Optional[int] = NAMESPACE_MAX_BYTES,
+                compact: Optional[Callable[[], None]] = None):
+    """Check a namespace with this many rows, after writing incoming_bytes more, stays within its quotas
+
+    The directory size comes from cached_directory_size(), so callers
+    record what they write with record_written_bytes(). Deleted rows keep
+    their files until old table versions are cleaned up, so when the
+    directory would go over the byte quota, compact (if given) is called
+    once before the size is measured again.
+
+    Raises:
+        NamespaceQuotaError: If the row count or the directory size would be over its quota
+    """
+    if max_rows is not None and rows > max_rows:
+        logger.warning(f"Namespace {namespace} would hold {rows} chunks, quota is {max_rows}")
+        raise NamespaceQuotaError(f"Workspace {namespace} is full: {rows} chunks would exceed its quota of "
+                                  f"{max_rows}. Remove documents to make room.")
+    if max_bytes is not None:
+        size = cached_directory_size(path)
+        if size + incoming_bytes > max_bytes and compact is not None:
+            compact()
+            forget_directory_size(path)
+            size = cached_directory_size(path)
+        if size + incoming_bytes > max_bytes:
+            logger.warning(f"Namespace {namespace} uses {size} bytes and would grow by about {incoming_bytes}, "
+                           f"quota is {max_bytes}")
+            raise NamespaceQuotaError(f"Workspace {namespace} is full: it uses {size / 1024 ** 2:.0f} MB of its "
+                                      f"{max_bytes / 1024 ** 2:.0f} MB quota and this batch needs about "
+                                      f"{incoming_bytes / 1024 ** 2:.1f} MB more. Remove documents to make room.")
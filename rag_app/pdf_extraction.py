@@ -0,0 +1,109 @@
+# rag_app/pdf_extraction.py
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+from typing import Callable, Dict, List, Optional, Tuple
+from rag_app.chunking import PAGE_BREAK
+from rag_app.logging_config import logger
+from rag_app.pdf_worker import PageResult, extract_pages, extract_range, init_worker
+
+# Worker processes for page extraction; each one parses its own copy of the PDF
+PDF_EXTRACTION_MAX_WORKERS = 4
+
+# Documents with fewer pages are extracted serially: starting the worker
+# processes costs more than it saves
+PARALLEL_MIN_PAGES = 32
+
+# Pages per task; ranges get smaller for short documents so every worker is busy
+MAX_PAGES_PER_TASK = 32
+
+def page_ranges(total_pages: int, workers: int) -> List[Tuple[int, int]]:
+    """Split pages into contiguous [start, end) ranges, about four per worker"""
+    size = max(1, min(MAX_PAGES_PER_TASK, math.ceil(total_pages / (workers * 4))))
+    return [(start, min(start + size, total_pages)) for start in range(0, total_pages, size)]
+
+def default_workers() -> int:
+    """Worker processes to use: PDF_EXTRACTION_MAX_WORKERS, at most one per CPU"""
+    return max(1, min(PDF_EXTRACTION_MAX_WORKERS, os.cpu_count() or 1))
+
+def extract_pdf_pages(pdf_bytes: bytes, on_progress: Optional[Callable[[int, int], None]] = None,
+                      max_workers: Optional[int] = None, name: str = "PDF",
+                      reader=None) -> Tuple[List[str], List[int]]:
+    """Extract the text of every page of a PDF, in page order
+
+    Page ranges are extracted in parallel by a pool of worker processes
+    running rag_app.pdf_worker (PyPDF2 is pure Python, so threads would not
+    help). Short documents, and max_workers=1, use a serial loop in this
+    process instead. A range whose worker fails is extracted serially, and
+    pages that fail are skipped and reported instead of aborting the
+    document.
+
+    Args:
+        pdf_bytes: Contents of the PDF file
+        on_progress: Optional callback(pages_done, total_pages), called from
+            the calling thread as ranges complete
+        max_workers: Cap on worker processes, default_workers() if omitted
+        name: Document name used in log messages
+        reader: PdfReader already opened on pdf_bytes, to avoid parsing it again
+
+    Returns:
+        Tuple of (text of each page that has any, followed by PAGE_BREAK,
+        in page order; numbers of the pages that failed)
+    """
+    if reader is None:
+        from PyPDF2 import PdfReader
+        reader = PdfReader(BytesIO(pdf_bytes))
+    total_pages = len(reader.pages)
+    workers = min(max_workers or default_workers(), default_workers())
+    start_time = time.perf_counter()
+
+    results: Dict[int, PageResult] = {}
+    if workers <= 1 or total_pages < PARALLEL_MIN_PAGES:
+        workers = 1
+        for index in range(total_pages):
+            for result in extract_pages(reader, index, index + 1):
+                results[result[0]] = result
+            if on_progress is not None:
+                on_progress(index + 1, total_pages)
+    else:
+        ranges = page_ranges(total_pages, workers)
+        workers = min(workers, len(ranges))
+        # spawn: forking a process that runs model and event loop threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=init_worker, initargs=(pdf_bytes,)) as executor:
+            futures = {executor.submit(extract_range, start, end): (start, end) for start, end in ranges}
+            done = 0
+            for future in as_completed(futures):
+                start, end = futures[future]
+                try:
+                    range_results = future.result()
+                except Exception as e:
+                    # The worker died (or could not start); extract its range here instead
+                    logger.error(f"Worker extraction of pages {start + 1}-{end} of {name} failed, "
+                                 f"extracting them serially: {str(e)}")
+                    range_results = extract_pages(reader, start, end)
+                for result in range_results:
+                    results[result[0]] = result
+                done += end - start
+                if on_progress is not None:
+                    on_progress(done, total_pages)
+
+    pages = []
+    failed = []
+    for page_number in range(1, total_pages + 1):
+        _, text, error = results[page_number]
+        if error is not None:
+            logger.warning(f"Could not extract page {page_number} of {name}: {error}")
+            failed.append(page_number)
+        elif text:
+            pages.append(text + PAGE_BREAK)
+        else:
+            logger.warning(f"No text extracted from page {page_number} in {name}")
+    elapsed = time.perf_counter() - start_time
+    logger.info(f"Extracted {total_pages} pages of {name} with {workers} worker(s) in {elapsed:.2f}s "
+                f"({total_pages / elapsed if elapsed else 0:.1f} pages/s), {len(failed)} failed")
+    return pages, failed
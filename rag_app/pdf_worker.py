@@ -0,0 +1,32 @@
+# rag_app/pdf_worker.py
+# Entry points of the page extraction worker processes (see rag_app.pdf_extraction).
+# Spawned workers import this module, so it must not import rag_app.logging_config
+# (which sets up a log file at import) or anything else that does.
+from io import BytesIO
+from typing import List, Optional, Tuple
+
+# Extraction result of one page: (page number from 1, text, error message)
+PageResult = Tuple[int, str, Optional[str]]
+
+# PdfReader of the document, loaded once per worker process
+_worker_reader = None
+
+def init_worker(pdf_bytes: bytes):
+    """Parse the document once when a worker process starts"""
+    global _worker_reader
+    from PyPDF2 import PdfReader
+    _worker_reader = PdfReader(BytesIO(pdf_bytes))
+
+def extract_pages(reader, start: int, end: int) -> List[PageResult]:
+    """Extract pages start..end-1 (0-based); a failing page is reported, not raised"""
+    results = []
+    for index in range(start, end):
+        try:
+            results.append((index + 1, reader.pages[index].extract_text() or "", None))
+        except Exception as e:
+            results.append((index + 1, "", f"{type(e).__name__}: {str(e)}"))
+    return results
+
+def extract_range(start: int, end: int) -> List[PageResult]:
+    """Worker task: extract one page range of the document loaded by init_worker"""
+    return extract_pages(_worker_reader, start, end)
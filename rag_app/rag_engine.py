@@ -1,12 +1,42 @@
 # Modified rag_engine.py with improved path handling
+import asyncio
+import hashlib
+import importlib.util
 import os
-import re
-import sys
+import threading
+import time
 import traceback
-from typing import Tuple, List, Dict, Any
+import uuid
+import datetime
+from typing import Tuple, List, Dict, Any, Callable, Optional, Iterator, Iterable, Union
 import numpy as np
 import logging
 from rag_app.logging_config import logger
+from rag_app.embedding_cache import EmbeddingCache
+from rag_app.vector_index import ensure_vector_index, ensure_fts_index
+from rag_app.knowledge_base import (HANDLE_IDLE_TIMEOUT, MAX_OPEN_HANDLES, KnowledgeBaseHandle,
+                                    get_handle_pool, get_knowledge_base_handle)
+from rag_app.ingestion_jobs import (IngestionJobManager, IngestionJobStore, JobCancelledError, JobProgress,
+                                    JobQueueFullError)
+from rag_app.namespaces import (DEFAULT_NAMESPACE, NamespaceQuotaError, check_quota, forget_directory_size,
+                                list_namespaces, namespace_path, record_written_bytes)
+from rag_app.query_cache import TTLCache, normalize_query
+from rag_app.scheduler import GenerationScheduler, SchedulerRejectedError, estimate_tokens
+from rag_app.single_flight import SingleFlight
+from rag_app.answer_cache import SemanticAnswerCache
+from rag_app.rank_fusion import reciprocal_rank_fusion
+from rag_app.reranker import CrossEncoderReranker
+from rag_app.compact_vectors import DEFAULT_VECTOR_STORAGE, drop_code_index
+from rag_app.vector_store import (ROW_FIELDS, LanceDBVectorStore, NumpyVectorStore, VectorStore,
+                                  choose_vector_store_backend, estimate_row_bytes)
+from rag_app.generators import (GeneratorBackend, GenerationInterruptedError, GenerationUnavailableError,
+                                create_generator)
+from rag_app.embedding_backends import DEFAULT_EMBEDDING_BACKEND, EmbeddingBackend, load_embedding_backend
+from rag_app.async_runtime import run_sync, run_in_embedding_executor
+from rag_app.context_assembly import CONTEXT_TOKEN_BUDGET, assemble_context
+from rag_app.chunking import (CHUNK_SIZE, CHUNK_OVERLAP, FRAGMENT_SLICE_SIZE, CHUNKING_STRATEGIES,
+                              DEFAULT_CHUNKING_STRATEGY, approximate_token_counter, get_chunker, iter_text_chunks,
+                              make_token_counter)
 
 
 # Configure tensor operations before imports
@@ -14,16 +44,26 @@ os.environ['TOKENIZERS_PARALLELISM'] = 'false'
 os.environ['OMP_NUM_THREADS'] = '1'
 os.environ['MKL_NUM_THREADS'] = '1'
 
-# Import large models in a try-except block
-try:
-    import lancedb
-    import google.generativeai as genai
-    from sentence_transformers import SentenceTransformer
-    # Flag to indicate imports succeeded
-    IMPORTS_SUCCESSFUL = True
-except ImportError as e:
-    logger.error(f"Failed to import required libraries: {str(e)}")
-    IMPORTS_SUCCESSFUL = False
+# Heavy libraries (torch, sentence_transformers, lancedb, google.generativeai)
+# are imported lazily where they are used. Only check that they are installed.
+_REQUIRED_MODULES = ["lancedb", "pyarrow", "google.generativeai", "sentence_transformers"]
+
+def _modules_available(names: List[str]) -> bool:
+    """Check that modules can be imported without importing them"""
+    missing = []
+    for name in names:
+        try:
+            if importlib.util.find_spec(name) is None:
+                missing.append(name)
+        except (ImportError, ValueError):
+            missing.append(name)
+    if missing:
+        logger.error(f"Failed to import required libraries: {', '.join(missing)} not installed")
+        return False
+    return True
+
+# Flag to indicate imports succeeded
+IMPORTS_SUCCESSFUL = _modules_available(_REQUIRED_MODULES)
 
 # Function to get proper paths with permission handling
 def get_kb_path():
@@ -46,191 +86,885 @@ def get_kb_path():
 
 # Constants for settings
 VECTOR_TABLE_NAME = "documents"
-CHUNK_SIZE = 500
-CHUNK_OVERLAP = 50
+
+def get_kb_handle(namespace: Optional[str] = None) -> KnowledgeBaseHandle:
+    """Get the knowledge base handle (connection, table, version, row count) of a namespace
+    
+    Handles come from a process-wide LRU pool, so a namespace's table stays
+    open between queries. namespace defaults to DEFAULT_NAMESPACE.
+    """
+    return get_knowledge_base_handle(namespace_path(get_kb_path(), namespace), VECTOR_TABLE_NAME)
+
+def get_namespaces() -> List[str]:
+    """List the knowledge base namespaces (workspaces), the default one first"""
+    return list_namespaces(get_kb_path())
 TOP_K_RESULTS = 5
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+RETRIEVAL_MODE = "hybrid"  # One of RETRIEVAL_MODES
+HYBRID_CANDIDATE_MULTIPLIER = 4  # Each retriever returns top_k * this candidates for rank fusion
+BATCH_PREPARE_CONCURRENCY = 16  # Questions of answer_questions retrieved and prompted at once
+GENERATION_CONCURRENCY = 4  # Gemini requests of answer_questions in flight at once
+RERANK_ENABLED = False  # Re-score retrieved chunks with a cross-encoder before building the prompt
+RERANK_CANDIDATES = 20  # Chunks retrieved for the reranker to choose TOP_K_RESULTS from
+EMBEDDING_BATCH_SIZE = 32  # Chunks per model.encode call during ingestion
+INGEST_BATCH_SIZE = 256  # Chunks embedded and written to LanceDB per batch during ingestion
+CHUNKING_STRATEGY = DEFAULT_CHUNKING_STRATEGY  # One of CHUNKING_STRATEGIES
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+VECTOR_STORE_BACKEND = "auto"  # One of VECTOR_STORE_BACKENDS: "auto" (by corpus size), "lancedb" or "numpy" for vector search
+NUMPY_STORE_DIR = "numpy_store"  # NumPy mirror of the documents table, inside the knowledge base directory
+VECTOR_STORAGE = DEFAULT_VECTOR_STORAGE  # "float32", "float16" or "binary" (float16 + sign codes); for new tables
+EMBEDDING_BACKEND = DEFAULT_EMBEDDING_BACKEND  # "pytorch", or "onnx-int8" for faster CPU encoding
+EMBEDDING_CACHE_MAX_ENTRIES = 100000  # Embeddings kept on disk before LRU eviction
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+QUERY_EMBEDDING_CACHE_TTL = 24 * 3600  # Seconds; query embeddings only depend on the model
+RETRIEVAL_CACHE_SIZE = 512
+RETRIEVAL_CACHE_TTL = 600  # Seconds
+ANSWER_CACHE_SIMILARITY = 0.92  # Minimum cosine similarity between queries to reuse an answer
+ANSWER_CACHE_MAX_ENTRIES = 2000  # Per namespace
+ANSWER_CACHE_TTL = 7 * 24 * 3600  # Seconds
+
+# Answer generator: "gemini", or "local" for an offline deterministic stand-in (load tests, benchmarks)
+GENERATOR_BACKEND = os.environ.get("RAG_GENERATOR_BACKEND", "gemini")
+LOCAL_GENERATOR_LATENCY = float(os.environ.get("RAG_LOCAL_GENERATOR_LATENCY", "0.5"))  # Seconds
+GENERATION_BUSY_MESSAGE = "The answer service is busy right now. Please try again in a moment."
+NO_CONTEXT_MESSAGE = ("I couldn't find relevant information to answer your question or encountered an error "
+                      "retrieving context.")
+
+class AnswerUnavailableError(Exception):
+    """A question cannot be answered from the knowledge base; the message is meant for the user"""
 
 # Ensure API key is available
-if "GEMINI_API_KEY" not in os.environ:
+if GENERATOR_BACKEND == "gemini" and "GEMINI_API_KEY" not in os.environ:
     logger.error("GEMINI_API_KEY environment variable not set")
     raise ValueError("GEMINI_API_KEY environment variable not set. Please set it before running the application.")
 
-# Global model variable
-model = None
+# Global embedding backend (see rag_app.embedding_backends)
+model: Optional[EmbeddingBackend] = None
+
+# Global embedding cache, created on first use
+embedding_cache = None
+
+# In-memory caches shared by all sessions: query text -> embedding, and
+# (query, table id and version, search settings) -> search results
+query_embedding_cache = TTLCache("query embedding", QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL)
+retrieval_cache = TTLCache("retrieval result", RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_TTL)
+
+# Identical questions asked while one is already being answered share its
+# retrieval and generation; keyed by (normalized query, table path, id and version)
+answer_flights = SingleFlight("answer")
+
+# Admission control in front of every generation request, shared by all
+# sessions so they stay within the provider's request and token rate limits
+generation_scheduler = GenerationScheduler()
+
+def _get_cache_dir() -> str:
+    """Directory next to the knowledge base where the persistent caches live"""
+    cache_dir = os.path.dirname(os.path.normpath(get_kb_path())) or "."
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Get the on-disk embedding cache stored next to the knowledge base"""
+    global embedding_cache
+    if embedding_cache is None:
+        try:
+            embedding_cache = EmbeddingCache(
+                os.path.join(_get_cache_dir(), "embedding_cache.db"),
+                max_entries=EMBEDDING_CACHE_MAX_ENTRIES
+            )
+        except Exception as e:
+            logger.error(f"Embedding cache unavailable: {str(e)}")
+            return None
+    return embedding_cache
+
+# Global semantic answer cache, created on first use
+answer_cache = None
+
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """Get the persistent semantic answer cache stored next to the knowledge base"""
+    global answer_cache
+    if answer_cache is None:
+        try:
+            answer_cache = SemanticAnswerCache(
+                os.path.join(_get_cache_dir(), "answer_cache.db"),
+                similarity_threshold=ANSWER_CACHE_SIMILARITY,
+                max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                ttl_seconds=ANSWER_CACHE_TTL
+            )
+        except Exception as e:
+            logger.error(f"Semantic answer cache unavailable: {str(e)}")
+            return None
+    return answer_cache
+
+# Cross-encoder reranker, created on first use when RERANK_ENABLED
+reranker = None
+_reranker_lock = threading.Lock()
+
+def get_reranker() -> Optional[CrossEncoderReranker]:
+    """Get the process-wide reranker, or None if reranking is disabled"""
+    global reranker
+    if not RERANK_ENABLED:
+        return None
+    with _reranker_lock:
+        if reranker is None:
+            reranker = CrossEncoderReranker()
+        return reranker
+
+# Model loading state: "not_started", "loading", "ready" or "failed"
+MODEL_LOAD_TIMEOUT = 300  # Seconds a request waits for the background model load
+_model_status = "not_started"
+_model_ready = threading.Event()
+_model_lock = threading.Lock()
 
 # Initialize in a function to better handle errors
 def initialize_embedding_model():
-    global model
+    global model, _model_status
     
     if not IMPORTS_SUCCESSFUL:
         logger.error("Cannot initialize embedding model due to import failures")
+        _model_status = "failed"
         return False
         
     try:
-        # Load the model with minimal settings
-        logger.info("Attempting to load SentenceTransformer model...")
-        
-        # Suppress stdout/stderr during model loading
-        old_stdout, old_stderr = sys.stdout, sys.stderr
-        sys.stdout = open(os.devnull, 'w')
-        sys.stderr = open(os.devnull, 'w')
-        
-        try:
-            token = os.environ.get("HUGGING_FACE_HUB_TOKEN")
-            model = SentenceTransformer('all-MiniLM-L6-v2', device='cpu', use_auth_token=token)
-            # Test the model with a simple encoding
-            test_embedding = model.encode("Test sentence for embedding.")
-            logger.info(f"SentenceTransformer model loaded successfully. Embedding shape: {test_embedding.shape}")
-            return True
-        finally:
-            # Restore stdout/stderr
-            sys.stdout, sys.stderr = old_stdout, old_stderr
+        logger.info(f"Attempting to load embedding model {EMBEDDING_MODEL_NAME} with the {EMBEDDING_BACKEND} backend...")
+        start_time = time.perf_counter()
+        loaded_model = load_embedding_backend(EMBEDDING_BACKEND, EMBEDDING_MODEL_NAME, _get_cache_dir())
+        # Test the model with a simple encoding
+        test_embedding = loaded_model.encode("Test sentence for embedding.")
+        model = loaded_model
+        _model_status = "ready"
+        logger.info(f"Embedding model {loaded_model.model_id} ({loaded_model.name}) loaded successfully in "
+                    f"{time.perf_counter() - start_time:.2f}s. Embedding shape: {test_embedding.shape}")
+        return True
             
     except Exception as e:
-        logger.error(f"Failed to load SentenceTransformer model: {str(e)}")
+        logger.error(f"Failed to load embedding model: {str(e)}")
         logger.error(traceback.format_exc())
         model = None
+        _model_status = "failed"
         logger.warning("Embedding model unavailable. RAG functionality will be limited.")
         return False
 
-# Try to initialize the model
-initialize_embedding_model()
+def _warm_up():
+    """Load the embedding model, then import the remaining heavy libraries"""
+    try:
+        initialize_embedding_model()
+    finally:
+        _model_ready.set()
+    
+    if IMPORTS_SUCCESSFUL:
+        try:
+            import lancedb  # noqa: F401
+            get_generator().warm_up()
+            if get_reranker() is not None:
+                reranker.warm_up()
+        except Exception as e:
+            logger.error(f"Error warming up libraries: {str(e)}")
+
+def start_model_warmup():
+    """Start loading the embedding model on a background thread (no-op if already started)"""
+    global _model_status
+    with _model_lock:
+        if _model_status != "not_started":
+            return
+        _model_status = "loading"
+    threading.Thread(target=_warm_up, name="rag-model-warmup", daemon=True).start()
+
+def get_model_status() -> str:
+    """Get the embedding model loading state: not_started, loading, ready or failed"""
+    return _model_status
+
+def wait_for_model(timeout: Optional[float] = MODEL_LOAD_TIMEOUT) -> bool:
+    """Block until the background model load finishes
+    
+    Returns:
+        Boolean indicating whether the embedding model is available
+    """
+    start_model_warmup()
+    _model_ready.wait(timeout)
+    return model is not None
+
+# Answer generator, one client per process, created on first use
+generator: Optional[GeneratorBackend] = None
+_generator_lock = threading.Lock()
+
+def get_generator() -> GeneratorBackend:
+    """Get the process-wide answer generator selected by GENERATOR_BACKEND"""
+    global generator
+    with _generator_lock:
+        if generator is None:
+            generator = create_generator(GENERATOR_BACKEND, os.environ.get("GEMINI_API_KEY"),
+                                         LOCAL_GENERATOR_LATENCY)
+            logger.info(f"Using the {generator.name} answer generator")
+        return generator
 
-# Configure Gemini API if imports succeeded
-if IMPORTS_SUCCESSFUL:
-    genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+# Start loading the model without blocking the importer (e.g. the Streamlit UI)
+start_model_warmup()
+
+def build_chunker(strategy: Optional[str] = None):
+    """Build a chunker for a strategy, bounded by the embedding model's tokenizer and sequence limit
+    
+    Raises:
+        ValueError: If the strategy is unknown
+    """
+    strategy = strategy or CHUNKING_STRATEGY
+    count_tokens = None
+    max_tokens = None
+    if strategy != "character" and model is not None:
+        count_tokens = make_token_counter(model.tokenizer)
+        # Leave room for the [CLS] and [SEP] tokens the model adds
+        max_tokens = model.max_seq_length - 2
+    return get_chunker(strategy, count_tokens, max_tokens)
 
 def text_to_chunks(text: str) -> List[str]:
     """Split text into overlapping chunks for processing"""
     logger.info(f"Splitting text into chunks of size {CHUNK_SIZE} with overlap {CHUNK_OVERLAP}")
+    chunks = list(iter_text_chunks([text]))
+    logger.info(f"Created {len(chunks)} text chunks")
+    return chunks
+
+def _encode_in_batches(texts: List[str], batch_size: int) -> List[Optional[np.ndarray]]:
+    """Encode texts in batches, grouping texts of similar length together
     
-    # Clean the text - remove extra whitespace and normalize line breaks
-    text = re.sub(r'\s+', ' ', text).strip()
+    Texts are sorted by length before batching so each batch pads to a
+    similar sequence length. If a batch fails, its texts are retried one by
+    one so a single bad text cannot take the rest of the batch down with it.
     
-    # Simple chunking by character count with overlap
-    chunks = []
-    for i in range(0, len(text), CHUNK_SIZE - CHUNK_OVERLAP):
-        chunk = text[i:i + CHUNK_SIZE]
-        if len(chunk) > 50:  # Avoid too small chunks
-            chunks.append(chunk)
+    Args:
+        texts: Texts to encode
+        batch_size: Number of texts per encode call
+        
+    Returns:
+        List aligned with texts holding each embedding, or None where encoding failed
+    """
+    batch_size = max(1, batch_size)
+    embeddings: List[Optional[np.ndarray]] = [None] * len(texts)
     
-    logger.info(f"Created {len(chunks)} text chunks")
-    return chunks
+    # Sort by length to cut padding waste inside each batch
+    order = sorted(range(len(texts)), key=lambda idx: len(texts[idx]))
+    total = len(order)
+    processed = 0
+    failed = 0
+    start_time = time.perf_counter()
+    
+    logger.info(f"Generating embeddings for {total} chunks in batches of {batch_size}")
+    
+    for batch_start in range(0, total, batch_size):
+        batch_indices = order[batch_start:batch_start + batch_size]
+        batch_texts = [texts[idx] for idx in batch_indices]
+        try:
+            batch_embeddings = model.encode(batch_texts, batch_size=len(batch_texts))
+            for idx, embedding in zip(batch_indices, batch_embeddings):
+                embeddings[idx] = embedding
+        except Exception as e:
+            logger.error(f"Error encoding batch starting at {batch_start}: {str(e)}; retrying chunks individually")
+            for idx in batch_indices:
+                try:
+                    embeddings[idx] = model.encode(texts[idx])
+                except Exception as chunk_error:
+                    logger.error(f"Error encoding chunk {idx}: {str(chunk_error)}; chunk will be skipped")
+                    failed += 1
+        
+        processed += len(batch_indices)
+        elapsed = time.perf_counter() - start_time
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        logger.info(f"Processed {processed}/{total} chunks ({rate:.1f} chunks/sec)")
+    
+    elapsed = time.perf_counter() - start_time
+    rate = total / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Embedded {total - failed}/{total} chunks in {elapsed:.2f}s ({rate:.1f} chunks/sec)")
+    if failed:
+        logger.warning(f"{failed} chunks could not be embedded and were skipped")
+    
+    return embeddings
 
-def create_vector_store(chunks: List[str]) -> bool:
-    """Create a vector store from text chunks"""
+def embed_chunks(chunks: List[str], batch_size: int = EMBEDDING_BATCH_SIZE) -> List[Optional[np.ndarray]]:
+    """Embed chunks, running the model only on chunks missing from the embedding cache
+    
+    Args:
+        chunks: Text chunks to embed
+        batch_size: Number of chunks per encode call
+        
+    Returns:
+        List aligned with chunks holding each embedding, or None where encoding failed
+    """
+    cache = get_embedding_cache()
+    if cache is None:
+        return _encode_in_batches(chunks, batch_size)
+    
+    keys = [EmbeddingCache.make_key(model.cache_id, chunk) for chunk in chunks]
     try:
-        # Check if imports succeeded
-        if not IMPORTS_SUCCESSFUL:
-            logger.error("Required libraries not available, cannot create vector store")
-            return False
-            
-        # Get knowledge base path with permission handling
-        kb_path = get_kb_path()
+        cached = cache.get_many(keys)
+    except Exception as e:
+        logger.error(f"Error reading embedding cache: {str(e)}")
+        cached = {}
+    
+    # Encode each distinct missing chunk once
+    missing = {}
+    for key, chunk in zip(keys, chunks):
+        if key not in cached and key not in missing:
+            missing[key] = chunk
+    hits = sum(1 for key in keys if key in cached)
+    logger.info(f"Embedding cache: {hits} hits, {len(missing)} distinct misses out of {len(chunks)} chunks")
+    
+    if missing:
+        missing_keys = list(missing.keys())
+        encoded = _encode_in_batches(list(missing.values()), batch_size)
+        new_entries = {key: embedding for key, embedding in zip(missing_keys, encoded) if embedding is not None}
+        try:
+            cache.put_many(new_entries)
+        except Exception as e:
+            logger.error(f"Error writing embedding cache: {str(e)}")
+        cached.update(new_entries)
+    
+    stats = cache.stats()
+    logger.info(f"Embedding cache totals: {stats['hits']} hits, {stats['misses']} misses, "
+                f"{stats['entries']}/{stats['max_entries']} entries")
+    
+    return [cached.get(key) for key in keys]
+
+def _on_knowledge_base_changed(handle: KnowledgeBaseHandle, namespace: Optional[str]):
+    """Drop cached state that depends on the contents of a namespace's documents table
+    
+    Retrieval results are keyed by table path, id and version, so they go stale
+    on their own; only the namespace's stored answers have to be removed.
+    """
+    handle.invalidate()
+    cache = get_answer_cache()
+    if cache is not None:
+        cache.clear(namespace or DEFAULT_NAMESPACE)
+
+def _embedding_mismatch(handle: KnowledgeBaseHandle) -> Optional[str]:
+    """Check the knowledge base manifest against the loaded embedding backend
+    
+    Vectors from a different model (or dimension) cannot be compared with
+    ours. The int8 ONNX and PyTorch backends of one model produce nearly
+    identical vectors, so a backend change alone only logs a warning.
+    
+    Returns:
+        Description of the incompatibility, or None if the knowledge base can be used
+    """
+    manifest = handle.manifest()
+    if manifest is None or model is None:
+        return None
+    current = model.describe()
+    if manifest.get("model_id") != current["model_id"] or manifest.get("dimension") != current["dimension"]:
+        return (f"The knowledge base was built with {manifest.get('model_id')} ({manifest.get('dimension')} dimensions) "
+                f"but the engine uses {current['model_id']} ({current['dimension']} dimensions). "
+                f"Remove its documents or change EMBEDDING_MODEL_NAME.")
+    if manifest.get("backend") != current["backend"]:
+        logger.warning(f"Knowledge base was built with the {manifest.get('backend')} backend, "
+                       f"querying with {current['backend']}")
+    return None
+
+def make_document_id(source: Union[str, Iterable[str]]) -> str:
+    """Derive a stable document id from a document source (file name, URL list or text)
+    
+    The text may also be given as its fragments; the id is the same as for
+    the concatenated text, without building it.
+    """
+    digest = hashlib.sha1()
+    for fragment in [source] if isinstance(source, str) else source:
+        digest.update(fragment.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+def _hash_text(text: str) -> str:
+    """Hash chunk text so unchanged chunks can be detected without re-embedding"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _sql_quote(value: str) -> str:
+    """Quote a string literal for a LanceDB filter expression"""
+    return "'" + value.replace("'", "''") + "'"
+
+def _open_vector_store(handle: KnowledgeBaseHandle) -> LanceDBVectorStore:
+    """Open the LanceDB vector store of a knowledge base for writing
+    
+    A documents table still in the pre-document layout is dropped, along
+    with its NumPy mirror; store.table() is None until the next write
+    creates the table.
+    """
+    store = LanceDBVectorStore(handle, VECTOR_STORAGE)
+    table = store.table()
+    if table is not None and "doc_id" not in table.schema.names:
+        logger.warning(f"Table {VECTOR_TABLE_NAME} uses the legacy single-document layout, dropping it")
+        store.drop()
+        _numpy_stores.pop(handle.path)
+        NumpyVectorStore(os.path.join(handle.path, NUMPY_STORE_DIR)).drop()
+        forget_directory_size(handle.path)
+    return store
+
+def _get_document_chunk_hashes(table, doc_id: str) -> Dict[int, str]:
+    """Get the stored content hash of every chunk of a document, keyed by chunk index"""
+    where = f"doc_id = {_sql_quote(doc_id)}"
+    count = table.count_rows(where)
+    if count == 0:
+        return {}
+    rows = table.search().where(where).select(["chunk_index", "content_hash"]).limit(count).to_list()
+    return {row["chunk_index"]: row["content_hash"] for row in rows}
+
+def _upsert_document_chunks(chunks: Iterable[str], doc_id: str, source: str, namespace: Optional[str] = None,
+                            on_batch: Optional[Callable[[int, int], None]] = None,
+                            before_write: Optional[Callable[[], None]] = None) -> int:
+    """Stream the chunks of one document into the vector store in bounded batches
+    
+    Only chunks whose content changed since the last ingest of the same
+    document are embedded and written; chunks beyond the new end of the
+    document are deleted. At most INGEST_BATCH_SIZE chunks, embeddings and
+    rows are held in memory at a time. Every batch is checked against the
+    namespace's row and byte quotas, counting its estimated size, before it
+    is written, and on_batch (if given) is called with the chunks read and
+    written so far after each one.
+    before_write (if given) is called before every batch is embedded and
+    written, including the last partial one, and before the document is
+    committed; an exception from it (such as JobCancelledError) stops the
+    ingest.
+    
+    If ingest fails or is cancelled part way, a new document's written
+    chunks are removed again; an update of an existing document keeps the
+    batches written so far.
+    
+    Returns:
+        Number of chunks in the document
         
-        # Ensure directory exists
-        os.makedirs(kb_path, exist_ok=True)
-        logger.info(f"Using knowledge base path: {kb_path}")
+    Raises:
+        NamespaceQuotaError: If the namespace is full
+    """
+    # Reuse the pooled connection to the namespace's knowledge base
+    namespace = namespace or DEFAULT_NAMESPACE
+    handle = get_kb_handle(namespace)
+    logger.info(f"Using knowledge base path: {handle.path}")
+    store = _open_vector_store(handle)
+    if store.table() is not None:
+        mismatch = _embedding_mismatch(handle)
+        if mismatch:
+            raise RuntimeError(mismatch)
+    existing = _get_document_chunk_hashes(store.table(), doc_id) if store.table() is not None else {}
+    doc_filter = f"doc_id = {_sql_quote(doc_id)}"
+    # Existing tables keep the vector layout they were created with
+    if store.storage != VECTOR_STORAGE:
+        logger.info(f"Table stores {store.storage} vectors; VECTOR_STORAGE={VECTOR_STORAGE} applies to new tables only")
+    stored_rows = store.count()
+    
+    def compact():
+        # Reclaim the files of deleted rows held by old table versions
+        table = store.table()
+        if table is not None and hasattr(table, "optimize"):
+            table.optimize(cleanup_older_than=datetime.timedelta(0))
+    
+    total = 0
+    written = 0
+    removed = 0
+    batch: List[Tuple[int, str]] = []
+    
+    def check_before_write():
+        if before_write is not None:
+            before_write()
+    
+    def flush(batch):
+        nonlocal written, removed, stored_rows
+        check_before_write()
+        # Work out which chunks differ from what is already stored for this document
+        changed = [(i, chunk, content_hash) for i, chunk in batch
+                   for content_hash in [_hash_text(chunk)] if existing.get(i) != content_hash]
+        if not changed:
+            return
+        added = sum(1 for i, _, _ in changed if i not in existing)
+        incoming_bytes = sum(estimate_row_bytes(chunk, model.dimension, store.storage) for _, chunk, _ in changed)
+        check_quota(namespace, handle.path, stored_rows + added, incoming_bytes, compact=compact)
         
-        # Check if we have a valid model
-        if model is None:
-            logger.error("Embedding model not available, cannot create vector store")
-            return False
+        # Generate embeddings in length-sorted batches for the changed chunks only
+        embeddings = embed_chunks([chunk for _, chunk, _ in changed])
         
-        # Connect to LanceDB
-        logger.info(f"Connecting to LanceDB at: {kb_path}")
-        db = lancedb.connect(kb_path)
-        
-        # Generate embeddings for each chunk
-        logger.info(f"Generating embeddings for {len(chunks)} chunks")
-        
-        embeddings = []
-        for i, chunk in enumerate(chunks):
-            try:
-                # Process chunks individually to avoid memory issues
-                embedding = model.encode(chunk)
-                embeddings.append(embedding)
-                # Log progress for large datasets
-                if i % 20 == 0 and i > 0:
-                    logger.info(f"Processed {i}/{len(chunks)} chunks")
-            except Exception as e:
-                logger.error(f"Error encoding chunk {i}: {str(e)}")
-                # Use a zero vector as fallback (with correct dimensions)
-                embeddings.append(np.zeros(384))  # all-MiniLM-L6-v2 uses 384 dimensions
-        
-        # Create data for the table
-        data = []
-        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            data.append({
-                "id": i,
+        # Create data for the table, skipping chunks whose embedding failed
+        rows = []
+        vectors = []
+        failed = []
+        for (i, chunk, content_hash), embedding in zip(changed, embeddings):
+            if embedding is None:
+                failed.append(i)
+                continue
+            rows.append({
+                "id": f"{doc_id}:{i}",
+                "doc_id": doc_id,
+                "source": source,
+                "chunk_index": i,
+                "content_hash": content_hash,
                 "text": chunk,
-                "vector": embedding.tolist()
             })
+            vectors.append(embedding)
         
-        # Create or overwrite the table
-        logger.info(f"Creating LanceDB table: {VECTOR_TABLE_NAME}")
-        
-        # Check if table exists and drop it
-        if VECTOR_TABLE_NAME in db.table_names():
-            logger.info(f"Dropping existing table: {VECTOR_TABLE_NAME}")
-            db.drop_table(VECTOR_TABLE_NAME)
+        if rows:
+            # Embedding a batch takes a while, so check again right before writing it
+            check_before_write()
+            store.append(rows, np.asarray(vectors, dtype=np.float32))
+            record_written_bytes(handle.path, sum(estimate_row_bytes(row["text"], len(vector), store.storage)
+                                                  for row, vector in zip(rows, vectors)))
+            written += len(rows)
+            stored_rows += sum(1 for row in rows if row["chunk_index"] not in existing)
+            logger.info(f"Wrote {written} chunks of document {doc_id} so far")
         
-        # Create new table with explicit schema
-        table = db.create_table(
-            VECTOR_TABLE_NAME,
-            data=data,
-            mode="overwrite"
-        )
+        # Drop stored rows we failed to re-embed rather than keep outdated text
+        stale_failed = [i for i in failed if i in existing]
+        if stale_failed:
+            store.delete(f"{doc_filter} AND chunk_index IN ({', '.join(str(i) for i in stale_failed)})")
+            removed += len(stale_failed)
+    
+    try:
+        for chunk in chunks:
+            batch.append((total, chunk))
+            total += 1
+            if len(batch) >= INGEST_BATCH_SIZE:
+                flush(batch)
+                batch = []
+                if on_batch is not None:
+                    on_batch(total, written)
+        if batch:
+            flush(batch)
+        if total:
+            check_before_write()
+    except BaseException:
+        if written or removed:
+            if not existing:
+                logger.warning(f"Ingest of new document {doc_id} stopped, removing its {written} written chunks")
+                store.delete(doc_filter)
+                forget_directory_size(handle.path)
+            _on_knowledge_base_changed(handle, namespace)
+        raise
+    
+    if total == 0:
+        return 0
+    
+    # Drop rows past the new end of the document
+    stale_count = sum(1 for i in existing if i >= total)
+    if stale_count:
+        store.delete(f"{doc_filter} AND chunk_index >= {total}")
+        removed += stale_count
+    
+    logger.info(f"Document {doc_id}: {total} chunks, {written} new or changed chunks written, {removed} removed")
+    if not written and not removed:
+        logger.info(f"Document {doc_id} is unchanged, nothing to write")
+        return total
+    table = store.table()
+    if table is None:
+        raise RuntimeError("No chunks could be embedded, cannot create vector store")
+    
+    # Switch to approximate search once the table is large enough (binary storage
+    # searches its sign codes instead), and keep the full-text index up to date
+    vector_indexed = ensure_vector_index(table) if store.storage != "binary" else False
+    ensure_fts_index(table, optimize=not vector_indexed)
+    
+    # Record which backend and model produced the vectors
+    handle.write_manifest(dict(model.describe(), updated_at=time.time()))
+    
+    # Cached table state is stale now, reopen on next access
+    _on_knowledge_base_changed(handle, namespace)
+    return total
+
+def create_vector_store(chunks: Iterable[str], doc_id: str = "default", source: str = "",
+                        namespace: Optional[str] = None) -> bool:
+    """Add or update the chunks of one document in the vector store
+    
+    Only chunks whose content changed since the last ingest of the same
+    document are embedded and written; chunks beyond the new end of the
+    document are deleted. Other documents in the table are left untouched.
+    Chunks may be a lazy iterator; they are consumed and written in batches.
+    
+    Args:
+        chunks: Text chunks of the document, in order
+        doc_id: Identifier of the document the chunks belong to
+        source: Human-readable source of the document (file name, URL)
+        namespace: Knowledge base namespace (workspace), DEFAULT_NAMESPACE if omitted
         
-        # Verify table creation
-        if VECTOR_TABLE_NAME in db.table_names():
-            logger.info(f"Vector store created successfully with {len(data)} entries")
-            return True
-        else:
-            logger.error("Table creation failed: table not found in database")
+    Returns:
+        Boolean indicating success
+    """
+    try:
+        # Check if imports succeeded
+        if not IMPORTS_SUCCESSFUL:
+            logger.error("Required libraries not available, cannot create vector store")
+            return False
+            
+        # Check if we have a valid model (waits for the background load)
+        if not wait_for_model():
+            logger.error("Embedding model not available, cannot create vector store")
             return False
+        
+        return _upsert_document_chunks(chunks, doc_id, source, namespace) > 0
             
     except Exception as e:
         logger.error(f"Failed to create vector store: {str(e)}")
         logger.error(traceback.format_exc())
         return False
 
-def process_documents(text: str) -> Tuple[bool, str]:
-    """Process input documents and create knowledge base
+def delete_document(doc_id: str, namespace: Optional[str] = None) -> bool:
+    """Delete every chunk of a document from the vector store
+    
+    Args:
+        doc_id: Identifier of the document to delete
+        namespace: Knowledge base namespace (workspace), DEFAULT_NAMESPACE if omitted
+        
+    Returns:
+        Boolean indicating success
+    """
+    try:
+        if not IMPORTS_SUCCESSFUL:
+            logger.error("Required libraries not available, cannot delete document")
+            return False
+        
+        handle = get_kb_handle(namespace)
+        store = _open_vector_store(handle)
+        if store.table() is None:
+            logger.info(f"No knowledge base table, nothing to delete for document {doc_id}")
+            return True
+        
+        store.delete(f"doc_id = {_sql_quote(doc_id)}")
+        forget_directory_size(handle.path)
+        _on_knowledge_base_changed(handle, namespace)
+        logger.info(f"Deleted document {doc_id} from knowledge base")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to delete document {doc_id}: {str(e)}")
+        logger.error(traceback.format_exc())
+        return False
+
+def list_documents(namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+    """List the documents stored in the knowledge base
     
     Args:
-        text: The input text to process
+        namespace: Knowledge base namespace (workspace), DEFAULT_NAMESPACE if omitted
+        
+    Returns:
+        List of dicts with doc_id, source and chunk count
+    """
+    try:
+        if not IMPORTS_SUCCESSFUL:
+            return []
+        
+        handle = get_kb_handle(namespace)
+        table = handle.table()
+        if table is None or "doc_id" not in table.schema.names:
+            return []
+        
+        count = handle.row_count
+        if count == 0:
+            return []
+        
+        documents: Dict[str, Dict[str, Any]] = {}
+        for row in table.search().select(["doc_id", "source"]).limit(count).to_list():
+            entry = documents.setdefault(row["doc_id"], {"doc_id": row["doc_id"], "source": row["source"], "chunks": 0})
+            entry["chunks"] += 1
+        return list(documents.values())
+    except Exception as e:
+        logger.error(f"Error listing documents: {str(e)}")
+        return []
+
+def _track_ingest_progress(fragments: Iterable[str], progress: JobProgress
+                           ) -> Tuple[Iterator[str], Callable[[int, int], None]]:
+    """Wrap the fragments of a document so an ingestion job can report how far it got
+    
+    Progress is the share of input characters the chunker has read, when
+    the input size is known (a string or a list of fragments). Long
+    fragments are handed over in slices of FRAGMENT_SLICE_SIZE so progress
+    moves within a single string; chunkers give the same chunks for sliced
+    input.
+    
+    Returns:
+        Tuple of (wrapped fragments, callback for _upsert_document_chunks)
+    """
+    total_chars = sum(len(fragment) for fragment in fragments) if isinstance(fragments, (list, tuple)) else None
+    read_chars = 0
+    
+    def sliced():
+        nonlocal read_chars
+        for fragment in fragments:
+            for start in range(0, len(fragment), FRAGMENT_SLICE_SIZE):
+                piece = fragment[start:start + FRAGMENT_SLICE_SIZE]
+                yield piece
+                read_chars += len(piece)
+    
+    def on_batch(chunks: int, written: int):
+        fraction = read_chars / total_chars if total_chars else None
+        progress.update(fraction, f"{chunks} chunks processed, {written} new or changed")
+    
+    return sliced(), on_batch
+
+def process_documents(text: Union[str, Iterable[str]], doc_id: Optional[str] = None,
+                      source: Optional[str] = None, chunking: Optional[str] = None,
+                      namespace: Optional[str] = None, progress: Optional[JobProgress] = None) -> Tuple[bool, str]:
+    """Process an input document and add it to the knowledge base
+    
+    Documents are identified by doc_id. Processing a document again with
+    the same id updates it in place; other documents are kept. The text is
+    chunked, embedded and written as a stream, so memory use does not grow
+    with the size of the document.
+    
+    Args:
+        text: The input text, or an iterable of text fragments (pages, sections)
+        doc_id: Identifier of the document, derived from source (or the text) if omitted
+        source: Human-readable source of the document (file name, URL)
+        chunking: Chunking strategy (one of CHUNKING_STRATEGIES), CHUNKING_STRATEGY if omitted
+        namespace: Knowledge base namespace (workspace), DEFAULT_NAMESPACE if omitted
+        progress: Progress reporter of the ingestion job running this, if any
         
     Returns:
         Tuple of (success, message)
+        
+    Raises:
+        JobCancelledError: If the ingestion job was cancelled
     """
     try:
         logger.info("Starting document processing")
-        if not text or len(text) < 100:
+        chunking = chunking or CHUNKING_STRATEGY
+        if chunking not in CHUNKING_STRATEGIES:
+            logger.warning(f"Unknown chunking strategy: {chunking}")
+            return False, f"Unknown chunking strategy: {chunking}. Choose one of {', '.join(CHUNKING_STRATEGIES)}."
+        # Fragments held in memory (a string or a list) can be measured and hashed up front
+        fragments = [text] if isinstance(text, str) else text
+        sized = isinstance(fragments, (list, tuple))
+        if sized and sum(len(fragment) for fragment in fragments) < 100:
             logger.warning("Text too short for processing")
             return False, "Text too short for processing. Please provide more content."
         
-        # Split text into chunks
-        chunks = text_to_chunks(text)
-        if not chunks:
+        if doc_id is None:
+            if source:
+                doc_id = make_document_id(source)
+            elif sized:
+                doc_id = make_document_id(fragments)
+            else:
+                doc_id = uuid.uuid4().hex[:16]
+        
+        if not IMPORTS_SUCCESSFUL:
+            logger.error("Required libraries not available, cannot create vector store")
+            return False, "Failed to create knowledge base. Check logs for details."
+        if not wait_for_model():
+            logger.error("Embedding model not available, cannot create vector store")
+            return False, "Failed to create knowledge base. Check logs for details."
+        
+        # Chunk and add the document to the vector store as one stream
+        chunker = build_chunker(chunking)
+        logger.info(f"Splitting text into chunks with the {chunking} strategy")
+        on_batch = None
+        before_write = None
+        if progress is not None:
+            fragments, on_batch = _track_ingest_progress(fragments, progress)
+            before_write = progress.check_cancelled
+        chunk_count = _upsert_document_chunks(chunker.chunk(fragments), doc_id, source or "", namespace, on_batch,
+                                              before_write)
+        if chunk_count == 0:
             logger.warning("No chunks created from text")
             return False, "Could not create chunks from the provided text."
         
-        # Create vector store
-        if create_vector_store(chunks):
-            logger.info("Knowledge base created successfully")
-            return True, f"Knowledge base created successfully with {len(chunks)} text chunks."
-        else:
-            logger.error("Failed to create knowledge base")
-            return False, "Failed to create knowledge base. Check logs for details."
+        logger.info(f"Knowledge base updated with document {doc_id}")
+        return True, f"Knowledge base updated successfully with {chunk_count} text chunks."
+    except NamespaceQuotaError as e:
+        return False, str(e)
+    except JobCancelledError:
+        raise
     except Exception as e:
         logger.error(f"Error in document processing: {str(e)}")
         logger.error(traceback.format_exc())
         return False, f"Error processing documents: {str(e)}"
 
-def check_knowledge_base_exists() -> bool:
+async def process_documents_async(text: Union[str, Iterable[str]], doc_id: Optional[str] = None,
+                                  source: Optional[str] = None, chunking: Optional[str] = None,
+                                  namespace: Optional[str] = None) -> Tuple[bool, str]:
+    """Async counterpart of process_documents
+    
+    Ingestion is dominated by CPU-bound chunking and embedding, so it runs
+    on a worker thread and the event loop stays free for queries.
+    """
+    return await asyncio.to_thread(process_documents, text, doc_id, source, chunking, namespace)
+
+# Background ingestion jobs, created on first use
+ingestion_jobs: Optional[IngestionJobManager] = None
+_ingestion_jobs_lock = threading.Lock()
+
+def get_ingestion_jobs() -> IngestionJobManager:
+    """Get the process-wide ingestion job manager, with its status table next to the knowledge base"""
+    global ingestion_jobs
+    with _ingestion_jobs_lock:
+        if ingestion_jobs is None:
+            store = IngestionJobStore(os.path.join(_get_cache_dir(), "ingestion_jobs.db"))
+            ingestion_jobs = IngestionJobManager(store)
+        return ingestion_jobs
+
+def submit_ingestion_job(text: Union[str, Iterable[str]], doc_id: Optional[str] = None,
+                         source: Optional[str] = None, chunking: Optional[str] = None,
+                         namespace: Optional[str] = None) -> Tuple[Optional[str], str]:
+    """Queue a document for process_documents on the background ingestion workers
+    
+    Returns at once; poll get_ingestion_job for status and progress. At most
+    INGESTION_WORKERS documents are processed at a time.
+    
+    Args:
+        text: The input text, or an iterable of text fragments (pages, sections)
+        doc_id: Identifier of the document, derived from source (or the text) if omitted
+        source: Human-readable source of the document (file name, URL)
+        chunking: Chunking strategy (one of CHUNKING_STRATEGIES), CHUNKING_STRATEGY if omitted
+        namespace: Knowledge base namespace (workspace), DEFAULT_NAMESPACE if omitted
+        
+    Returns:
+        Tuple of (job id, message); the job id is None if the job was refused
+    """
+    namespace = namespace or DEFAULT_NAMESPACE
+    try:
+        job_id = get_ingestion_jobs().submit(
+            lambda progress: process_documents(text, doc_id, source, chunking, namespace, progress),
+            namespace, source or "")
+    except JobQueueFullError as e:
+        logger.warning(f"Ingestion job refused: {str(e)}")
+        return None, str(e)
+    except Exception as e:
+        logger.error(f"Failed to queue ingestion job: {str(e)}")
+        logger.error(traceback.format_exc())
+        return None, f"Error queueing document: {str(e)}"
+    return job_id, "Document queued for processing."
+
+def get_ingestion_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Get status, progress (0-1) and message of an ingestion job, or None if unknown"""
+    return get_ingestion_jobs().get(job_id)
+
+def list_ingestion_jobs(namespace: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+    """List recent ingestion jobs, most recent first, optionally of one namespace only"""
+    return get_ingestion_jobs().list_jobs(namespace, limit)
+
+def cancel_ingestion_job(job_id: str) -> bool:
+    """Request cancellation of a queued or running ingestion job
+    
+    A running job stops before it writes its next batch (or commits the
+    document). A new document's written chunks are removed again; an
+    updated document keeps the batches written.
+    
+    Returns:
+        True if the job was still queued or running
+    """
+    return get_ingestion_jobs().cancel(job_id)
+
+async def check_knowledge_base_exists_async(namespace: Optional[str] = None) -> bool:
+    """Async counterpart of check_knowledge_base_exists"""
+    try:
+        if not IMPORTS_SUCCESSFUL:
+            logger.error("Required libraries not available, cannot check knowledge base")
+            return False
+        
+        exists = await get_kb_handle(namespace).exists_async()
+        if not exists:
+            logger.info(f"Knowledge base table {VECTOR_TABLE_NAME} does not exist or has no data")
+        return exists
+    except Exception as e:
+        logger.error(f"Error checking knowledge base: {str(e)}")
+        logger.error(traceback.format_exc())
+        return False
+
+def check_knowledge_base_exists(namespace: Optional[str] = None) -> bool:
     """Check if the knowledge base exists and has data
     
+    Uses the cached row count of the pooled knowledge base handle, so this
+    is cheap enough to call on every query.
+    
+    Args:
+        namespace: Knowledge base namespace (workspace), DEFAULT_NAMESPACE if omitted
+        
     Returns:
         Boolean indicating if knowledge base exists and has data
     """
@@ -239,63 +973,371 @@ def check_knowledge_base_exists() -> bool:
         if not IMPORTS_SUCCESSFUL:
             logger.error("Required libraries not available, cannot check knowledge base")
             return False
-            
-        # Get knowledge base path with permission handling
-        kb_path = get_kb_path()
-        
-        # First check if the directory exists
-        if not os.path.exists(kb_path):
-            logger.info(f"Knowledge base directory does not exist: {kb_path}")
-            return False
-            
-        # Then check if it contains proper LanceDB files
-        db_files = os.listdir(kb_path)
-        if not db_files:
-            logger.info(f"Knowledge base directory is empty: {kb_path}")
-            return False
         
-        logger.info(f"Found files in knowledge base directory: {db_files}")
-            
-        # Try connecting to the database
-        try:
-            db = lancedb.connect(kb_path)
-            
-            # Check if our table exists
-            tables = db.table_names()
-            logger.info(f"Available tables in database: {tables}")
-            
-            if VECTOR_TABLE_NAME not in tables:
-                logger.info(f"Knowledge base table {VECTOR_TABLE_NAME} does not exist")
-                return False
-                
-            # Verify the table has data
-            try:
-                table = db.open_table(VECTOR_TABLE_NAME)
-                # Check if table has at least one entry
-                count = len(table.to_pandas().head(1))
-                
-                if count == 0:
-                    logger.info(f"Knowledge base table {VECTOR_TABLE_NAME} exists but has no data")
-                    return False
-                    
-                logger.info(f"Knowledge base verified with data")
-                return True
-            except Exception as e:
-                logger.error(f"Error checking table data: {str(e)}")
-                return False
-        except Exception as e:
-            logger.error(f"Error connecting to LanceDB: {str(e)}")
-            return False
+        exists = get_kb_handle(namespace).exists()
+        if not exists:
+            logger.info(f"Knowledge base table {VECTOR_TABLE_NAME} does not exist or has no data")
+        return exists
     except Exception as e:
         logger.error(f"Error checking knowledge base: {str(e)}")
         logger.error(traceback.format_exc())
         return False
 
-def retrieve_context(query: str) -> str:
+def embed_query(query: str) -> np.ndarray:
+    """Embed a query, reusing the cached embedding of the same normalized text
+    
+    Args:
+        query: The user query
+        
+    Returns:
+        Query embedding
+    """
+    normalized = normalize_query(query)
+    embedding = query_embedding_cache.get(normalized)
+    if embedding is None:
+        # The embedding model is uncased, so encoding the normalized text is equivalent
+        embedding = model.encode(normalized)
+        query_embedding_cache.put(normalized, embedding)
+    return embedding
+
+def embed_queries(queries: List[str]) -> List[np.ndarray]:
+    """Embed many queries, encoding every distinct uncached one in a single batched call
+    
+    Args:
+        queries: User queries
+        
+    Returns:
+        Query embeddings, aligned with queries
+    """
+    normalized = [normalize_query(query) for query in queries]
+    embeddings = {}
+    missing = []
+    for text in dict.fromkeys(normalized):
+        embedding = query_embedding_cache.get(text)
+        if embedding is None:
+            missing.append(text)
+        else:
+            embeddings[text] = embedding
+    
+    if missing:
+        start_time = time.perf_counter()
+        for text, embedding in zip(missing, model.encode(missing, batch_size=EMBEDDING_BATCH_SIZE)):
+            query_embedding_cache.put(text, embedding)
+            embeddings[text] = embedding
+        logger.info(f"Embedded {len(missing)} queries in {time.perf_counter() - start_time:.2f}s")
+    return [embeddings[text] for text in normalized]
+
+# NumPy mirrors of the documents tables, by knowledge base path, closed along
+# with idle knowledge base handles
+_numpy_stores = TTLCache("NumPy vector store", MAX_OPEN_HANDLES, HANDLE_IDLE_TIMEOUT)
+_numpy_store_lock: Optional[asyncio.Lock] = None
+
+def _release_knowledge_base_state(handle: KnowledgeBaseHandle):
+    """Drop the search structures of a knowledge base whose handle the pool closed"""
+    _numpy_stores.pop(handle.path)
+    drop_code_index(handle.path)
+
+get_handle_pool().add_close_listener(_release_knowledge_base_state)
+
+async def _get_numpy_store(table, handle: KnowledgeBaseHandle) -> Optional[NumpyVectorStore]:
+    """Get the NumPy mirror of the documents table when it should serve vector search
+    
+    LanceDB stays the source of truth for ingest, deletes and full-text
+    search. For small corpora (see VECTOR_STORE_BACKEND) vector search runs
+    on a memory-mapped NumPy copy instead, rebuilt whenever the table
+    version changes. Tables in the legacy single-document layout (without
+    the ROW_FIELDS metadata) stay on LanceDB until the next ingest replaces
+    them.
+    
+    Returns:
+        The up-to-date store, or None if LanceDB should serve the search
+    """
+    global _numpy_store_lock
+    if VECTOR_STORE_BACKEND == "lancedb":
+        return None
+    if VECTOR_STORE_BACKEND == "auto" and choose_vector_store_backend(handle.async_row_count) != "numpy":
+        return None
+    if not set(ROW_FIELDS).issubset((await table.schema()).names):
+        return None
+    
+    store = _numpy_stores.get(handle.path)
+    if store is None:
+        store = NumpyVectorStore(os.path.join(handle.path, NUMPY_STORE_DIR))
+        _numpy_stores.put(handle.path, store)
+    version = handle.async_table_key
+    if store.version == version:
+        return store
+    
+    if _numpy_store_lock is None:
+        _numpy_store_lock = asyncio.Lock()
+    async with _numpy_store_lock:
+        if store.version != version:
+            start_time = time.perf_counter()
+            arrow_table = await table.query().select(list(ROW_FIELDS) + ["vector"]).to_arrow()
+            column = arrow_table.column("vector").combine_chunks()
+            vectors = column.flatten().to_numpy(zero_copy_only=False).astype(np.float32).reshape(len(column), -1)
+            rows = arrow_table.drop(["vector"]).to_pylist()
+            await asyncio.to_thread(store.create, rows, vectors, version)
+            logger.info(f"Rebuilt NumPy vector store for table {version[0]} version {version[1]} "
+                        f"in {time.perf_counter() - start_time:.2f}s")
+    return store
+
+async def _get_search_store(table, handle: KnowledgeBaseHandle) -> VectorStore:
+    """Vector store that serves searches of a knowledge base: its NumPy mirror or LanceDB"""
+    numpy_store = await _get_numpy_store(table, handle)
+    return numpy_store if numpy_store is not None else LanceDBVectorStore(handle)
+
+async def _vector_search(table, handle: KnowledgeBaseHandle, query: str, limit: int, nprobes: Optional[int],
+                         refine_factor: Optional[int]) -> List[Dict[str, Any]]:
+    """Nearest-neighbour search on the chunk embeddings"""
+    query_embedding = await run_in_embedding_executor(embed_query, query)
+    return await _vector_search_by_embedding(table, handle, query_embedding, limit, nprobes, refine_factor)
+
+async def _vector_search_by_embedding(table, handle: KnowledgeBaseHandle, query_embedding: np.ndarray, limit: int,
+                                      nprobes: Optional[int], refine_factor: Optional[int]) -> List[Dict[str, Any]]:
+    """Nearest-neighbour search for an already embedded query"""
+    store = await _get_search_store(table, handle)
+    return await store.search_async(query_embedding, limit, nprobes, refine_factor)
+
+async def _vector_search_batch(table, handle: KnowledgeBaseHandle, query_embeddings: List[np.ndarray],
+                               limit: int) -> List[List[Dict[str, Any]]]:
+    """Nearest-neighbour search for many embedded queries, one result list per query
+    
+    The NumPy store answers all queries with a single matrix product; on
+    LanceDB the per-query searches run concurrently.
+    """
+    if not query_embeddings:
+        return []
+    store = await _get_search_store(table, handle)
+    return await store.search_batch_async(np.vstack(query_embeddings), limit)
+
+def _fuse_hybrid(vector_results: List[Dict[str, Any]], lexical_results: Optional[List[Dict[str, Any]]],
+                 top_k: int) -> List[Dict[str, Any]]:
+    """Merge the vector and full-text rankings of a hybrid search (vector only without a full-text index)"""
+    if lexical_results is None:
+        return vector_results[:top_k]
+    return reciprocal_rank_fusion([vector_results, lexical_results], top_k)
+
+async def _lexical_search(table, query: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+    """BM25 full-text search on the chunk text
+    
+    Returns:
+        Result rows, or None if the table has no usable full-text index
+    """
+    try:
+        rows = (await table.query().nearest_to_text(query).limit(limit).to_arrow()).to_pylist()
+    except Exception as e:
+        logger.warning(f"Full-text search unavailable ({str(e)}); re-process a document to build the index")
+        return None
+    return [{key: value for key, value in row.items() if key not in ("vector", "code")} for row in rows]
+
+async def search_chunks_async(query: str, top_k: int = TOP_K_RESULTS, nprobes: Optional[int] = None,
+                              refine_factor: Optional[int] = None, mode: Optional[str] = None,
+                              namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Find the chunks most relevant to a query
+    
+    In hybrid mode the vector and full-text searches run concurrently and
+    their rankings are merged with reciprocal rank fusion, so chunks matching
+    exact identifiers (codes, section numbers) surface within a small top_k.
+    Lexical and hybrid searches fall back to vector search when the table
+    has no full-text index yet.
+    
+    Results are cached per (normalized query, namespace table, its id and version, search settings),
+    so a repeated question skips both the embedding and the search until
+    the documents table changes. The embedding runs on the embedding executor
+    and the search uses LanceDB's async API, so the event loop is never blocked.
+    
+    Args:
+        query: The user query
+        top_k: Number of chunks to return
+        nprobes: ANN partitions to probe when the table is indexed
+        refine_factor: ANN exact re-rank factor when the table is indexed
+        mode: vector, lexical or hybrid (defaults to RETRIEVAL_MODE)
+        namespace: Knowledge base namespace (workspace), DEFAULT_NAMESPACE if omitted
+        
+    Returns:
+        List of result rows (without vectors), most relevant first
+    """
+    mode = mode or RETRIEVAL_MODE
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode: {mode}. Choose one of {', '.join(RETRIEVAL_MODES)}")
+    
+    handle = get_kb_handle(namespace)
+    table = await handle.async_table()
+    if table is None:
+        return []
+    
+    cache_key = (normalize_query(query), handle.path, handle.async_table_key, top_k, nprobes, refine_factor, mode)
+    results = retrieval_cache.get(cache_key)
+    if results is not None:
+        logger.info("Retrieval result cache hit")
+        return results
+    
+    start_time = time.perf_counter()
+    if mode == "vector":
+        results = await _vector_search(table, handle, query, top_k, nprobes, refine_factor)
+    elif mode == "lexical":
+        results = await _lexical_search(table, query, top_k)
+        if results is None:
+            results = await _vector_search(table, handle, query, top_k, nprobes, refine_factor)
+    else:
+        candidates = top_k * HYBRID_CANDIDATE_MULTIPLIER
+        vector_results, lexical_results = await asyncio.gather(
+            _vector_search(table, handle, query, candidates, nprobes, refine_factor),
+            _lexical_search(table, query, candidates),
+        )
+        results = _fuse_hybrid(vector_results, lexical_results, top_k)
+    logger.info(f"{mode.capitalize()} search returned {len(results)} chunks in {time.perf_counter() - start_time:.3f}s")
+    
+    retrieval_cache.put(cache_key, results)
+    return results
+
+def search_chunks(query: str, top_k: int = TOP_K_RESULTS, nprobes: Optional[int] = None,
+                  refine_factor: Optional[int] = None, mode: Optional[str] = None,
+                  namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Synchronous wrapper around search_chunks_async"""
+    return run_sync(search_chunks_async(query, top_k, nprobes, refine_factor, mode, namespace))
+
+async def _retrieve_async(query: str, nprobes: Optional[int] = None, refine_factor: Optional[int] = None,
+                          mode: Optional[str] = None, namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Retrieve the TOP_K_RESULTS chunks for a query, reranked when RERANK_ENABLED"""
+    active_reranker = get_reranker()
+    if active_reranker is None:
+        return await search_chunks_async(query, nprobes=nprobes, refine_factor=refine_factor, mode=mode,
+                                         namespace=namespace)
+    
+    start_time = time.perf_counter()
+    candidates = await search_chunks_async(query, top_k=RERANK_CANDIDATES, nprobes=nprobes,
+                                           refine_factor=refine_factor, mode=mode, namespace=namespace)
+    retrieval_time = time.perf_counter() - start_time
+    results, info = await asyncio.to_thread(active_reranker.rerank, query, candidates, TOP_K_RESULTS)
+    outcome = "reranked" if info["reranked"] else f"not reranked ({info.get('fallback')})"
+    logger.info(f"Retrieval {retrieval_time:.3f}s for {len(candidates)} candidates, "
+                f"rerank {info.get('rerank_s', 0.0):.3f}s with {info['cached']} cached scores: {outcome}")
+    return results
+
+async def search_chunks_batch_async(queries: List[str], top_k: int = TOP_K_RESULTS, mode: Optional[str] = None,
+                                    namespace: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+    """Search for many queries at once
+    
+    All queries are embedded in one batch, and the vector searches of every
+    distinct uncached query run as one batch: a single matrix product on the
+    NumPy store, concurrent searches on LanceDB. In hybrid mode the
+    full-text searches run concurrently alongside and each query's rankings
+    are fused afterwards, as in search_chunks_async. Results land in the
+    retrieval cache, so later single-query calls reuse them.
+    
+    Args:
+        queries: User queries
+        top_k: Number of chunks per query
+        mode: vector, lexical or hybrid (defaults to RETRIEVAL_MODE)
+        namespace: Knowledge base namespace (workspace), DEFAULT_NAMESPACE if omitted
+        
+    Returns:
+        One result list per query, aligned with queries
+    """
+    mode = mode or RETRIEVAL_MODE
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode: {mode}. Choose one of {', '.join(RETRIEVAL_MODES)}")
+    handle = get_kb_handle(namespace)
+    table = await handle.async_table()
+    if table is None or not queries:
+        return [[] for _ in queries]
+    
+    distinct = list(dict.fromkeys(normalize_query(query) for query in queries))
+    embeddings = dict(zip(distinct, await run_in_embedding_executor(embed_queries, distinct)))
+    
+    def cache_key(text):
+        return (text, handle.path, handle.async_table_key, top_k, None, None, mode)
+    
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    pending = []
+    for text in distinct:
+        cached = retrieval_cache.get(cache_key(text))
+        if cached is not None:
+            results[text] = cached
+        else:
+            pending.append(text)
+    if not pending:
+        return [results[normalize_query(query)] for query in queries]
+    
+    start_time = time.perf_counter()
+    semaphore = asyncio.Semaphore(BATCH_PREPARE_CONCURRENCY)
+    
+    async def lexical_one(text, limit):
+        async with semaphore:
+            return await _lexical_search(table, text, limit)
+    
+    if mode == "vector":
+        vector_results = await _vector_search_batch(table, handle, [embeddings[text] for text in pending], top_k)
+        fresh = dict(zip(pending, vector_results))
+    elif mode == "lexical":
+        lexical_results = await asyncio.gather(*(lexical_one(text, top_k) for text in pending))
+        fresh = {text: rows for text, rows in zip(pending, lexical_results) if rows is not None}
+        # Without a full-text index, fall back to vector search as search_chunks_async does
+        missing = [text for text in pending if text not in fresh]
+        vector_results = await _vector_search_batch(table, handle, [embeddings[text] for text in missing], top_k)
+        fresh.update(zip(missing, vector_results))
+    else:
+        candidates = top_k * HYBRID_CANDIDATE_MULTIPLIER
+        vector_results, lexical_results = await asyncio.gather(
+            _vector_search_batch(table, handle, [embeddings[text] for text in pending], candidates),
+            asyncio.gather(*(lexical_one(text, candidates) for text in pending)),
+        )
+        fresh = {text: _fuse_hybrid(vector_rows, lexical_rows, top_k)
+                 for text, vector_rows, lexical_rows in zip(pending, vector_results, lexical_results)}
+    
+    for text, rows in fresh.items():
+        results[text] = rows
+        retrieval_cache.put(cache_key(text), rows)
+    logger.info(f"Batch {mode} search for {len(pending)} queries in {time.perf_counter() - start_time:.3f}s")
+    return [results[normalize_query(query)] for query in queries]
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Get hit rates and sizes of the engine caches, for sizing them
+    
+    Also reports how many answer_question calls were collapsed into an
+    identical call already in flight.
+    
+    Returns:
+        Dictionary of cache name to its statistics
+    """
+    stats = {
+        "query_embeddings": query_embedding_cache.stats(),
+        "retrieval_results": retrieval_cache.stats(),
+    }
+    cache = get_embedding_cache()
+    if cache is not None:
+        stats["chunk_embeddings"] = cache.stats()
+    cache = get_answer_cache()
+    if cache is not None:
+        stats["answers"] = cache.stats()
+    if reranker is not None:
+        stats["rerank_scores"] = reranker.score_cache.stats()
+    stats["coalesced_answers"] = answer_flights.stats()
+    stats["knowledge_base_handles"] = get_handle_pool().stats()
+    return stats
+
+def get_generation_stats() -> Dict[str, Any]:
+    """Get the generation scheduler's queue depth, admission counters and wait times"""
+    return generation_scheduler.stats()
+
+def _format_context(search_results: List[Dict[str, Any]]) -> str:
+    """Merge search results into a prompt context of at most CONTEXT_TOKEN_BUDGET tokens"""
+    logger.info(f"Retrieved {len(search_results)} context chunks")
+    count_tokens = make_token_counter(model.tokenizer) if model is not None else approximate_token_counter
+    return assemble_context(search_results, count_tokens, CONTEXT_TOKEN_BUDGET)
+
+async def retrieve_context_async(query: str, nprobes: Optional[int] = None, refine_factor: Optional[int] = None,
+                                 mode: Optional[str] = None, namespace: Optional[str] = None) -> str:
     """Retrieve relevant context for a query
     
     Args:
         query: The user query
+        nprobes: ANN partitions to probe when the table is indexed (defaults to ANN_NPROBES)
+        refine_factor: ANN exact re-rank factor when the table is indexed (defaults to ANN_REFINE_FACTOR)
+        mode: vector, lexical or hybrid retrieval (defaults to RETRIEVAL_MODE)
+        namespace: Knowledge base namespace (workspace), DEFAULT_NAMESPACE if omitted
         
     Returns:
         String containing relevant context
@@ -308,101 +1350,412 @@ def retrieve_context(query: str) -> str:
             logger.error("Required libraries not available, cannot retrieve context")
             return "Error: Required libraries not available"
             
-        # Check if model is available
-        if model is None:
+        # Check if model is available (waits for the background load)
+        if not await asyncio.to_thread(wait_for_model):
             logger.error("Embedding model not available, cannot retrieve context")
             return "Error: Embedding model not available"
         
-        # Get knowledge base path with permission handling
-        kb_path = get_kb_path()
-            
-        # Get query embedding
-        query_embedding = model.encode(query).tolist()
-        
-        # Connect to database
-        db = lancedb.connect(kb_path)
-        
-        if VECTOR_TABLE_NAME not in db.table_names():
+        # Reuse the opened table from the pooled handle
+        handle = get_kb_handle(namespace)
+        if await handle.async_table() is None:
             logger.error(f"Table {VECTOR_TABLE_NAME} not found in database")
             return "Error: Knowledge base table not found"
-        
-        table = db.open_table(VECTOR_TABLE_NAME)
+        mismatch = _embedding_mismatch(handle)
+        if mismatch:
+            logger.error(mismatch)
+            return f"Error: {mismatch}"
         
         # Search for similar chunks
-        search_results = table.search(query_embedding).limit(TOP_K_RESULTS).to_list()
-        
-        # Extract and concatenate the text from results
-        context_chunks = [result["text"] for result in search_results]
-        context = "\n\n".join(context_chunks)
+        search_results = await _retrieve_async(query, nprobes=nprobes, refine_factor=refine_factor, mode=mode,
+                                               namespace=namespace)
         
-        logger.info(f"Retrieved {len(context_chunks)} context chunks")
-        
-        # If context is too long, truncate it
-        max_context_length = 5000  # Gemini has token limits
-        if len(context) > max_context_length:
-            logger.warning(f"Context too long ({len(context)} chars), truncating")
-            context = context[:max_context_length] + "..."
-            
-        return context
+        return _format_context(search_results)
     except Exception as e:
         logger.error(f"Error retrieving context: {str(e)}")
         logger.error(traceback.format_exc())
         return f"Error retrieving context: {str(e)}"
 
-def answer_question(query: str) -> str:
-    """Answer a question using RAG
+def retrieve_context(query: str, nprobes: Optional[int] = None, refine_factor: Optional[int] = None,
+                     mode: Optional[str] = None, namespace: Optional[str] = None) -> str:
+    """Synchronous wrapper around retrieve_context_async"""
+    return run_sync(retrieve_context_async(query, nprobes, refine_factor, mode, namespace))
+
+async def _prepare_answer_async(query: str, context_memo: Optional[Dict[Tuple[str, ...], str]] = None,
+                                namespace: Optional[str] = None) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """Run everything before generation: checks, retrieval, answer cache, prompt
+    
+    Args:
+        query: The user's question
+        context_memo: Contexts already assembled by this batch, by retrieved chunk ids
+        namespace: Knowledge base namespace (workspace), DEFAULT_NAMESPACE if omitted
+        
+    Returns:
+        Tuple of (cached answer, None) on an answer cache hit, otherwise
+        (None, generation state with the prompt)
+        
+    Raises:
+        AnswerUnavailableError: If there is no knowledge base, embedding model or relevant context to answer from
+    """
+    # Check if required imports succeeded
+    if not IMPORTS_SUCCESSFUL:
+        logger.error("Required libraries not available, cannot answer question")
+        raise AnswerUnavailableError("I'm sorry, but the required AI libraries are not available. "
+                                     "Please check the application logs.")
+        
+    # Check if knowledge base exists
+    if not await check_knowledge_base_exists_async(namespace):
+        logger.error("Knowledge base does not exist")
+        raise AnswerUnavailableError("I don't have any knowledge base to answer from. Please process documents first.")
+    
+    # Check if model is available (waits for the background load)
+    if not await asyncio.to_thread(wait_for_model):
+        logger.error("Embedding model not available, cannot answer question")
+        raise AnswerUnavailableError(NO_CONTEXT_MESSAGE)
+    mismatch = _embedding_mismatch(get_kb_handle(namespace))
+    if mismatch:
+        logger.error(mismatch)
+        raise AnswerUnavailableError(f"I can't search this knowledge base: {mismatch}")
+    
+    # Retrieve relevant context
+    search_results = await _retrieve_async(query, namespace=namespace)
+    context_key = tuple(str(result["id"]) for result in search_results)
+    if context_memo is not None and context_key in context_memo:
+        context = context_memo[context_key]
+    else:
+        context = _format_context(search_results)
+        if context_memo is not None:
+            context_memo[context_key] = context
+    if not context:
+        logger.warning("No relevant context found")
+        raise AnswerUnavailableError(NO_CONTEXT_MESSAGE)
+    
+    # Serve a stored answer if a similar question retrieved the same chunks
+    # (chunk ids are qualified by namespace, as document ids can repeat across them)
+    chunk_ids = [f"{namespace or DEFAULT_NAMESPACE}/{result['id']}" for result in search_results]
+    query_embedding = await run_in_embedding_executor(embed_query, query)
+    cache = get_answer_cache()
+    if cache is not None:
+        cached_answer = await asyncio.to_thread(cache.lookup, query_embedding, chunk_ids,
+                                                namespace or DEFAULT_NAMESPACE)
+        if cached_answer is not None:
+            return cached_answer, None
+    
+    # Prepare prompt for the model
+    prompt = f"""
+    Answer the following question based on the provided context. 
+    If the context doesn't contain information to answer the question, say so honestly.
+    
+    CONTEXT:
+    {context}
+    
+    QUESTION:
+    {query}
+    
+    ANSWER:
+    """
+    prompt_tokens = estimate_tokens(prompt)
+    logger.info(f"Prompt length: {len(prompt)} characters, ~{prompt_tokens} tokens with the answer reserve")
+    
+    return None, {
+        "prompt": prompt,
+        "prompt_tokens": prompt_tokens,
+        "chunk_ids": chunk_ids,
+        "namespace": namespace or DEFAULT_NAMESPACE,
+        "query_embedding": query_embedding,
+        "cache": cache,
+    }
+
+def _prepare_answer(query: str, namespace: Optional[str] = None) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """Synchronous wrapper around _prepare_answer_async"""
+    return run_sync(_prepare_answer_async(query, namespace=namespace))
+
+def _store_answer(query: str, state: Dict[str, Any], answer: str):
+    """Remember a generated answer in the semantic answer cache"""
+    cache = state["cache"]
+    if cache is not None and answer:
+        cache.store(query, state["query_embedding"], state["chunk_ids"], answer, state["namespace"])
+
+async def _generate_answer_async(state: Dict[str, Any]) -> Optional[str]:
+    """Generate an answer for a prepared prompt with the answer generator
+    
+    Returns:
+        The answer text, or None if the generator returned nothing
+        
+    Raises:
+        SchedulerRejectedError: If the generation scheduler shed the request
+        GenerationUnavailableError: If the generator kept failing with retryable errors
+    """
+    wait = await generation_scheduler.acquire_async(state["prompt_tokens"])
+    if wait > 0.01:
+        logger.info(f"Generation request waited {wait:.2f}s for rate limit budget")
+    active_generator = get_generator()
+    logger.info(f"Generating response with {active_generator.name}")
+    start_time = time.perf_counter()
+    answer = await active_generator.generate(state["prompt"])
+    if not answer:
+        logger.error("No response from the answer generator")
+        return None
+    
+    logger.info(f"Generated response of length {len(answer)} in {time.perf_counter() - start_time:.2f}s")
+    return answer
+
+async def _answer_flight_key(query: str, namespace: Optional[str] = None) -> Tuple[str, str, Tuple[Optional[str], Optional[int]]]:
+    """Key under which identical in-flight questions are coalesced"""
+    handle = get_kb_handle(namespace)
+    await handle.async_table()
+    return normalize_query(query), handle.path, handle.async_table_key
+
+async def answer_question_async(query: str, namespace: Optional[str] = None) -> str:
+    """Answer a question using RAG without blocking the event loop
+    
+    Concurrent calls with the same normalized question against the same
+    knowledge base version share one retrieval and generation, and all of
+    them get its answer.
     
     Args:
         query: The user's question
+        namespace: Knowledge base namespace (workspace), DEFAULT_NAMESPACE if omitted
         
     Returns:
         Answer string
     """
     try:
-        # Check if required imports succeeded
-        if not IMPORTS_SUCCESSFUL:
-            logger.error("Required libraries not available, cannot answer question")
-            return "I'm sorry, but the required AI libraries are not available. Please check the application logs."
-            
-        # Check if knowledge base exists
-        if not check_knowledge_base_exists():
-            logger.error("Knowledge base does not exist")
-            return "I don't have any knowledge base to answer from. Please process documents first."
-        
-        # Retrieve relevant context
-        context = retrieve_context(query)
-        if not context or context.startswith("Error:"):
-            logger.warning("No relevant context found or error retrieving context")
-            return "I couldn't find relevant information to answer your question or encountered an error retrieving context."
-        
-        # Prepare prompt for the model
-        prompt = f"""
-        Answer the following question based on the provided context. 
-        If the context doesn't contain information to answer the question, say so honestly.
-        
-        CONTEXT:
-        {context}
-        
-        QUESTION:
-        {query}
-        
-        ANSWER:
-        """
-        logger.info(f"Prompt length: {len(prompt)} characters")
-        # Generate response using Gemini
-        logger.info("Generating response with Gemini")
-        model = genai.GenerativeModel('gemini-2.0-flash-lite')
-        response = model.generate_content(prompt)
-        
-        if not response or not hasattr(response, 'text'):
-            logger.error("No response from Gemini API")
+        key = await _answer_flight_key(query, namespace)
+    except Exception as e:
+        logger.error(f"Error answering question: {str(e)}")
+        logger.error(traceback.format_exc())
+        return f"Error generating answer: {str(e)}"
+    return await answer_flights.run(key, lambda: _answer_question_uncoalesced(query, namespace))
+
+async def _answer_question_uncoalesced(query: str, namespace: Optional[str] = None) -> str:
+    """Answer a question: retrieval, answer cache, generation (see answer_question_async)"""
+    try:
+        answer, state = await _prepare_answer_async(query, namespace=namespace)
+        if state is None:
+            return answer
+        
+        answer = await _generate_answer_async(state)
+        if answer is None:
             return "I'm having trouble generating a response. Please try again."
-            
-        answer = response.text.strip()
-        logger.info(f"Generated response of length {len(answer)}")
         
+        await asyncio.to_thread(_store_answer, query, state, answer)
         return answer
+    except (AnswerUnavailableError, SchedulerRejectedError) as e:
+        return str(e)
+    except GenerationUnavailableError as e:
+        logger.error(f"Answer generator unavailable after retries: {str(e)}")
+        return GENERATION_BUSY_MESSAGE
+    except Exception as e:
+        logger.error(f"Error answering question: {str(e)}")
+        logger.error(traceback.format_exc())
+        return f"Error generating answer: {str(e)}"
+
+def answer_question(query: str, namespace: Optional[str] = None) -> str:
+    """Answer a question using RAG
+    
+    Synchronous wrapper around answer_question_async; the work runs on the
+    shared event loop.
+    
+    Args:
+        query: The user's question
+        namespace: Knowledge base namespace (workspace), DEFAULT_NAMESPACE if omitted
+        
+    Returns:
+        Answer string
+    """
+    return run_sync(answer_question_async(query, namespace))
+
+async def answer_questions_async(queries: List[str], namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Answer many questions, sharing work between them
+    
+    All questions are embedded in one batch and searched together (see
+    search_chunks_batch_async). Questions that retrieve the same chunks
+    reuse one assembled context, identical prompts are generated once, and
+    at most GENERATION_CONCURRENCY Gemini requests are in flight at a time.
+    
+    Args:
+        queries: The questions
+        namespace: Knowledge base namespace (workspace), DEFAULT_NAMESPACE if omitted
+        
+    Returns:
+        One dict per question, in input order, with query, answer and error.
+        When a question gets no generated or cached answer (no knowledge
+        base, no relevant context, an unusable embedding model, a refused or
+        failed generation), answer is None and error holds the message.
+    """
+    results: List[Dict[str, Any]] = [{"query": query, "answer": None, "error": None} for query in queries]
+    if not queries:
+        return results
+    start_time = time.perf_counter()
+    
+    # Batch embedding and search; failures here only lose the head start
+    if IMPORTS_SUCCESSFUL and await asyncio.to_thread(wait_for_model):
+        try:
+            if get_reranker() is None:
+                await search_chunks_batch_async(queries, namespace=namespace)
+            else:
+                await run_in_embedding_executor(embed_queries, queries)
+        except Exception as e:
+            logger.error(f"Batch retrieval failed, retrieving per question: {str(e)}")
+    
+    context_memo: Dict[Tuple[str, ...], str] = {}
+    prepare_semaphore = asyncio.Semaphore(BATCH_PREPARE_CONCURRENCY)
+    generation_semaphore = asyncio.Semaphore(GENERATION_CONCURRENCY)
+    generations: Dict[str, asyncio.Task] = {}
+    
+    async def generate(state):
+        async with generation_semaphore:
+            return await _generate_answer_async(state)
+    
+    async def answer_one(position, query):
+        try:
+            async with prepare_semaphore:
+                try:
+                    answer, state = await _prepare_answer_async(query, context_memo, namespace)
+                except AnswerUnavailableError as e:
+                    results[position]["error"] = str(e)
+                    return
+            if state is None:
+                results[position]["answer"] = answer
+                return
+            
+            # Questions with identical prompts share one generation
+            task = generations.get(state["prompt"])
+            owner = task is None
+            if owner:
+                task = generations[state["prompt"]] = asyncio.ensure_future(generate(state))
+            answer = await task
+            if answer is None:
+                results[position]["error"] = "No response from the answer generator"
+                return
+            results[position]["answer"] = answer
+            if owner:
+                await asyncio.to_thread(_store_answer, query, state, answer)
+        except Exception as e:
+            logger.error(f"Error answering question {position}: {str(e)}")
+            results[position]["error"] = str(e)
+    
+    await asyncio.gather(*(answer_one(position, query) for position, query in enumerate(queries)))
+    
+    failed = sum(1 for result in results if result["error"])
+    logger.info(f"Answered {len(queries) - failed}/{len(queries)} questions with {len(generations)} generations "
+                f"and {len(context_memo)} distinct contexts in {time.perf_counter() - start_time:.2f}s")
+    return results
+
+def answer_questions(queries: List[str], namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Answer many questions at once
+    
+    Synchronous wrapper around answer_questions_async; the work runs on the
+    shared event loop.
+    
+    Args:
+        queries: The questions
+        namespace: Knowledge base namespace (workspace), DEFAULT_NAMESPACE if omitted
+        
+    Returns:
+        One dict per question, in input order, with query, answer and error
+    """
+    return run_sync(answer_questions_async(queries, namespace))
+
+def answer_question_stream(query: str, namespace: Optional[str] = None) -> Iterator[str]:
+    """Answer a question using RAG, yielding the answer text as the generator produces it
+    
+    Cached answers and error messages are yielded as a single piece. Logs
+    time-to-first-token and total generation time for each request. When the
+    same question is already being answered (streamed or not), this waits
+    for that answer and yields it as a single piece instead.
+    
+    Args:
+        query: The user's question
+        namespace: Knowledge base namespace (workspace), DEFAULT_NAMESPACE if omitted
+        
+    Yields:
+        Pieces of the answer text
+        
+    Raises:
+        GenerationInterruptedError: If generation failed after part of the answer was yielded;
+            the pieces yielded so far are an incomplete answer
+    """
+    try:
+        key = run_sync(_answer_flight_key(query, namespace))
+    except Exception as e:
+        logger.error(f"Error answering question: {str(e)}")
+        logger.error(traceback.format_exc())
+        yield f"Error generating answer: {str(e)}"
+        return
+    
+    while True:
+        flight, leader = answer_flights.begin(key)
+        if leader:
+            break
+        try:
+            logger.info("Waiting for the identical question already in flight")
+            yield flight.result()
+            return
+        except Exception as e:
+            answer_flights.follower_failed(key, e)
+    
+    pieces = []
+    try:
+        for piece in _stream_answer(query, namespace):
+            pieces.append(piece)
+            yield piece
+    except BaseException as e:
+        # Includes the caller closing the stream early; waiting callers answer for themselves
+        answer_flights.finish(key, flight, error=e if isinstance(e, Exception) else RuntimeError("stream closed"))
+        raise
+    answer_flights.finish(key, flight, "".join(pieces).strip())
+
+def _stream_answer(query: str, namespace: Optional[str] = None) -> Iterator[str]:
+    """Stream the answer to a question (see answer_question_stream)"""
+    try:
+        answer, state = _prepare_answer(query, namespace)
+        if state is None:
+            yield answer
+            return
+        
+        # Stream the response from the answer generator
+        wait = generation_scheduler.acquire(state["prompt_tokens"])
+        if wait > 0.01:
+            logger.info(f"Generation request waited {wait:.2f}s for rate limit budget")
+        active_generator = get_generator()
+        logger.info(f"Streaming response from {active_generator.name}")
+        start_time = time.perf_counter()
+        first_token_time = None
+        pieces = []
+        
+        try:
+            for text in active_generator.generate_stream(state["prompt"]):
+                if first_token_time is None:
+                    first_token_time = time.perf_counter() - start_time
+                    logger.info(f"Time to first token: {first_token_time:.2f}s")
+                pieces.append(text)
+                yield text
+        except Exception as e:
+            if not pieces:
+                raise
+            # An error message appended to the partial text would read as part of the answer
+            logger.error(f"Answer stream failed after {len(pieces)} pieces: {str(e)}")
+            raise GenerationInterruptedError(f"The answer was cut off by an error: {str(e)}") from e
+        
+        total_time = time.perf_counter() - start_time
+        answer = "".join(pieces).strip()
+        if not answer:
+            logger.error("No response from the answer generator")
+            yield "I'm having trouble generating a response. Please try again."
+            return
+        
+        logger.info(f"Streamed response of length {len(answer)}: time to first token "
+                    f"{first_token_time:.2f}s, total generation time {total_time:.2f}s")
+        _store_answer(query, state, answer)
+    except (AnswerUnavailableError, SchedulerRejectedError) as e:
+        yield str(e)
+    except GenerationUnavailableError as e:
+        logger.error(f"Answer generator unavailable after retries: {str(e)}")
+        yield GENERATION_BUSY_MESSAGE
+    except GenerationInterruptedError:
+        raise
     except Exception as e:
         logger.error(f"Error answering question: {str(e)}")
         logger.error(traceback.format_exc())
-        return f"Error generating answer: {str(e)}"
\ No newline at end of file
+        yield f"Error generating answer: {str(e)}"
@@ -0,0 +1,38 @@
+# rag_app/rank_fusion.py
+from typing import Any, Dict, List
+
+# Damping constant of reciprocal rank fusion; 60 is the usual choice
+RRF_K = 60
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Dict[str, Any]]], limit: int, k: int = RRF_K,
+                           key: str = "id") -> List[Dict[str, Any]]:
+    """Merge ranked result lists with reciprocal rank fusion
+
+    Each result scores the sum of 1 / (k + rank) over the lists it appears
+    in (rank starting at 1), so results found by several retrievers rise to
+    the top without having to compare their raw scores.
+
+    Args:
+        ranked_lists: Result rows of each retriever, best first
+        limit: Number of results to return
+        k: Damping constant
+        key: Row field identifying the same result across lists
+
+    Returns:
+        Fused rows, best first, each with an added _rrf_score
+    """
+    scores: Dict[Any, float] = {}
+    rows: Dict[Any, Dict[str, Any]] = {}
+    for results in ranked_lists:
+        for rank, row in enumerate(results, start=1):
+            row_key = row[key]
+            scores[row_key] = scores.get(row_key, 0.0) + 1.0 / (k + rank)
+            # Keep the first copy, adding fields only the other retriever returned (e.g. _score)
+            if row_key in rows:
+                for name, value in row.items():
+                    rows[row_key].setdefault(name, value)
+            else:
+                rows[row_key] = dict(row)
+
+    ordered = sorted(scores, key=lambda row_key: scores[row_key], reverse=True)[:limit]
+    return [dict(rows[row_key], _rrf_score=scores[row_key]) for row_key in ordered]
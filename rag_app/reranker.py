@@ -0,0 +1,152 @@
+# rag_app/reranker.py
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Tuple
+from rag_app.logging_config import logger
+from rag_app.query_cache import TTLCache, normalize_query
+
+RERANKER_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_TIME_BUDGET = 0.25  # Seconds a query may spend waiting for cross-encoder scores
+RERANK_MAX_LENGTH = 256  # Tokens per (query, chunk) pair; chunks are sized below this
+RERANK_SCORE_CACHE_SIZE = 8192
+RERANK_SCORE_CACHE_TTL = 3600  # Seconds; scores only depend on the query and chunk text
+
+class CrossEncoderReranker:
+    """Re-scores retrieved chunks with a small cross-encoder on CPU
+
+    Candidates are scored in one batch on a dedicated worker thread. A query
+    waits at most time_budget seconds for the scores and otherwise keeps the
+    retrieval order; a batch that finishes late still fills the score cache,
+    so the next identical query is reranked without waiting. At most one
+    batch is queued or running: while a late batch is still scoring, other
+    queries keep the retrieval order at once instead of queueing work whose
+    scores would arrive too late. Scores are cached per (normalized query,
+    chunk id, chunk content hash).
+    """
+
+    def __init__(self, model_name: str = RERANKER_MODEL_NAME, time_budget: float = RERANK_TIME_BUDGET,
+                 cache_size: int = RERANK_SCORE_CACHE_SIZE, cache_ttl: float = RERANK_SCORE_CACHE_TTL):
+        self.model_name = model_name
+        self.time_budget = time_budget
+        self.score_cache = TTLCache("rerank score", cache_size, cache_ttl)
+        self.reranked = 0
+        self.fallbacks = 0
+        self._model = None
+        self._model_failed = False
+        self._lock = threading.Lock()
+        self._loading = False
+        self._pending: Optional[Future] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-rerank")
+
+    def _load_model(self):
+        """Load the cross-encoder (runs on the rerank worker thread)"""
+        try:
+            start_time = time.perf_counter()
+            from sentence_transformers import CrossEncoder
+            model = CrossEncoder(self.model_name, device="cpu", max_length=RERANK_MAX_LENGTH)
+            model.predict([("warm up", "warm up")], show_progress_bar=False)
+            self._model = model
+            logger.info(f"Cross-encoder {self.model_name} loaded in {time.perf_counter() - start_time:.2f}s")
+        except Exception as e:
+            self._model_failed = True
+            logger.error(f"Failed to load cross-encoder {self.model_name}: {str(e)}")
+
+    def warm_up(self):
+        """Start loading the model in the background (no-op if already started)"""
+        with self._lock:
+            if self._loading:
+                return
+            self._loading = True
+        self._executor.submit(self._load_model)
+
+    @property
+    def ready(self) -> bool:
+        return self._model is not None
+
+    def _cache_key(self, query_key: str, row: Dict[str, Any]) -> Tuple[str, Any, Any]:
+        return (query_key, row.get("id"), row.get("content_hash") or hash(row["text"]))
+
+    def _score(self, pairs: List[Tuple[str, str]], keys: List[Tuple[str, Any, Any]]) -> List[float]:
+        """Score pairs in one batch and remember the scores"""
+        scores = [float(score) for score in
+                  self._model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)]
+        for key, score in zip(keys, scores):
+            self.score_cache.put(key, score)
+        return scores
+
+    def rerank(self, query: str, results: List[Dict[str, Any]], top_k: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Order results by cross-encoder score and keep the best top_k
+
+        Args:
+            query: The user query
+            results: Retrieved rows (with text), in retrieval order
+            top_k: Number of rows to keep
+
+        Returns:
+            Tuple of (rows, timing info). The rows are results[:top_k] in
+            retrieval order if the model is not loaded yet or the time
+            budget ran out.
+        """
+        start_time = time.perf_counter()
+        info: Dict[str, Any] = {"candidates": len(results), "cached": 0, "reranked": False}
+        if not results:
+            return results, info
+        if self._model is None:
+            self.warm_up()
+            info["fallback"] = "model failed to load" if self._model_failed else "model loading"
+            self.fallbacks += 1
+            return results[:top_k], info
+
+        query_key = normalize_query(query)
+        keys = [self._cache_key(query_key, row) for row in results]
+        scores: List[Optional[float]] = [self.score_cache.get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        info["cached"] = len(results) - len(missing)
+
+        if missing:
+            pairs = [(query, results[i]["text"]) for i in missing]
+            with self._lock:
+                if self._pending is not None and not self._pending.done():
+                    future = None
+                else:
+                    future = self._pending = self._executor.submit(self._score, pairs, [keys[i] for i in missing])
+            if future is None:
+                info["fallback"] = "scorer busy"
+                info["rerank_s"] = time.perf_counter() - start_time
+                self.fallbacks += 1
+                logger.warning("A rerank batch that ran past its budget is still scoring, keeping retrieval order")
+                return results[:top_k], info
+            try:
+                new_scores = future.result(timeout=self.time_budget)
+            except FutureTimeoutError:
+                # The batch keeps running and fills the cache for the next time
+                info["fallback"] = "time budget exceeded"
+                info["rerank_s"] = time.perf_counter() - start_time
+                self.fallbacks += 1
+                logger.warning(f"Rerank exceeded its {self.time_budget:.2f}s budget, keeping retrieval order")
+                return results[:top_k], info
+            except Exception as e:
+                info["fallback"] = f"error: {str(e)}"
+                self.fallbacks += 1
+                logger.error(f"Rerank failed, keeping retrieval order: {str(e)}")
+                return results[:top_k], info
+            for i, score in zip(missing, new_scores):
+                scores[i] = score
+
+        order = sorted(range(len(results)), key=lambda i: scores[i], reverse=True)[:top_k]
+        reranked = [dict(results[i], _rerank_score=scores[i]) for i in order]
+        info["reranked"] = True
+        info["rerank_s"] = time.perf_counter() - start_time
+        self.reranked += 1
+        return reranked, info
+
+    def stats(self) -> Dict[str, Any]:
+        """Return rerank and fallback counters and the score cache statistics"""
+        return {
+            "model_ready": self.ready,
+            "reranked": self.reranked,
+            "fallbacks": self.fallbacks,
+            "time_budget": self.time_budget,
+            "score_cache": self.score_cache.stats(),
+        }
@@ -0,0 +1,191 @@
+# rag_app/scheduler.py
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+from rag_app.logging_config import logger
+
+# Provider budgets for generation requests from the whole process
+REQUESTS_PER_MINUTE = 30
+TOKENS_PER_MINUTE = 1_000_000
+
+SCHEDULER_MAX_QUEUE = 64  # Requests waiting for budget before new ones are shed
+SCHEDULER_MAX_WAIT = 20.0  # Seconds a request may wait for budget before giving up
+
+CHARS_PER_TOKEN = 4  # Rough prompt size estimate, characters per token
+OUTPUT_TOKEN_RESERVE = 512  # Tokens budgeted for the answer of every request
+
+_POLL_INTERVAL = 0.05  # Seconds between checks of a request waiting behind others
+_RECENT_WAITS = 1000  # Admitted wait times kept for the statistics
+
+def estimate_tokens(prompt: str) -> int:
+    """Estimate the tokens a generation request uses: the prompt plus the answer reserve"""
+    return len(prompt) // CHARS_PER_TOKEN + OUTPUT_TOKEN_RESERVE
+
+class SchedulerRejectedError(Exception):
+    """A generation request was not admitted: the queue is full, the wait ran out or it is too large"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+class TokenBucket:
+    """Continuously refilling budget of rate_per_minute units, holding at most capacity"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        """Seconds until amount units are available (0 if they are now)"""
+        self._refill(now)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def consume(self, amount: float):
+        self.level -= amount
+
+class GenerationScheduler:
+    """Process-wide admission control for generation requests
+
+    Every request needs one unit from the requests-per-minute bucket and its
+    estimated tokens from the tokens-per-minute bucket. Requests are admitted
+    in arrival order; those that cannot go yet wait in a queue of at most
+    max_queue requests for at most max_wait seconds. A request arriving at a
+    full queue is shed immediately, so under overload users get a clear
+    message instead of a provider rate limit error. Both sync callers (their
+    own threads) and async callers (the shared event loop) are supported.
+    """
+
+    def __init__(self, requests_per_minute: float = REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = TOKENS_PER_MINUTE,
+                 max_queue: int = SCHEDULER_MAX_QUEUE, max_wait: float = SCHEDULER_MAX_WAIT):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+        self.max_depth = 0
+        self._queue: deque = deque()
+        self._tickets = itertools.count()
+        self._waits: deque = deque(maxlen=_RECENT_WAITS)
+        self._lock = threading.Lock()
+
+    def _enqueue(self, tokens: int) -> int:
+        """Take a place in the queue, or raise SchedulerRejectedError"""
+        with self._lock:
+            if tokens > self.tokens.capacity:
+                self.shed += 1
+                raise SchedulerRejectedError(
+                    "too_large", f"The question and its context are too long to answer ({tokens} tokens, "
+                                 f"at most {int(self.tokens.capacity)}).")
+            if len(self._queue) >= self.max_queue:
+                self.shed += 1
+                logger.warning(f"Generation queue full ({len(self._queue)} waiting), shedding request")
+                raise SchedulerRejectedError(
+                    "queue_full", "Too many questions are being answered right now. Please try again in a moment.")
+            ticket = next(self._tickets)
+            self._queue.append(ticket)
+            self.max_depth = max(self.max_depth, len(self._queue))
+            return ticket
+
+    def _try_admit(self, ticket: int, tokens: int, start: float) -> float:
+        """Admit the request if it is first in line and the budget allows
+
+        Returns:
+            0 when admitted, otherwise seconds to wait before trying again
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._queue[0] != ticket:
+                delay = _POLL_INTERVAL
+            else:
+                delay = max(self.requests.time_until(1, now), self.tokens.time_until(tokens, now))
+                if delay == 0:
+                    self.requests.consume(1)
+                    self.tokens.consume(tokens)
+                    self._queue.popleft()
+                    self.admitted += 1
+                    self._waits.append(now - start)
+                    return 0.0
+            if now - start + delay > self.max_wait:
+                self._queue.remove(ticket)
+                self.timed_out += 1
+                logger.warning(f"Generation request gave up after waiting {now - start:.2f}s for budget")
+                raise SchedulerRejectedError(
+                    "timeout", "The answer service is at capacity right now. Please try again in a moment.")
+            return max(delay, 0.001)
+
+    def acquire(self, tokens: int) -> float:
+        """Block until a request of this many tokens is admitted
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            SchedulerRejectedError: If the request was shed or waited too long
+        """
+        start = time.monotonic()
+        ticket = self._enqueue(tokens)
+        try:
+            while True:
+                delay = self._try_admit(ticket, tokens, start)
+                if delay == 0:
+                    return time.monotonic() - start
+                time.sleep(delay)
+        except BaseException:
+            self._leave(ticket)
+            raise
+
+    async def acquire_async(self, tokens: int) -> float:
+        """Wait without blocking the event loop until a request of this many tokens is admitted
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            SchedulerRejectedError: If the request was shed or waited too long
+        """
+        start = time.monotonic()
+        ticket = self._enqueue(tokens)
+        try:
+            while True:
+                delay = self._try_admit(ticket, tokens, start)
+                if delay == 0:
+                    return time.monotonic() - start
+                await asyncio.sleep(delay)
+        except BaseException:
+            # Includes cancellation; a dead ticket at the head would stall the queue
+            self._leave(ticket)
+            raise
+
+    def _leave(self, ticket: int):
+        with self._lock:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, admission counters and recent wait times"""
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self.max_depth,
+                "admitted": self.admitted,
+                "shed": self.shed,
+                "timed_out": self.timed_out,
+                "wait_avg_s": sum(waits) / len(waits) if waits else 0.0,
+                "wait_p95_s": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                "wait_max_s": waits[-1] if waits else 0.0,
+                "requests_per_minute": self.requests.rate * 60,
+                "tokens_per_minute": self.tokens.rate * 60,
+            }
@@ -0,0 +1,87 @@
+# rag_app/single_flight.py
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+from rag_app.logging_config import logger
+
+class SingleFlight:
+    """Coalesce identical concurrent calls into one execution
+
+    The first caller for a key becomes the leader and does the work; callers
+    arriving while it is in flight wait for the leader's result instead of
+    repeating the work. Flights are concurrent.futures.Future objects, so
+    sync callers (on their own threads) and async callers (on the shared
+    event loop) can join the same flight. Only results are shared: if the
+    leader fails or is abandoned, each waiting caller does the work itself.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.leaders = 0
+        self.collapsed = 0
+        self.retried = 0
+        self._flights: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def begin(self, key: Hashable) -> Tuple[Future, bool]:
+        """Join the flight for key, starting one if none is in flight
+
+        Returns:
+            Tuple of (flight, is_leader); the leader must call finish
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.collapsed += 1
+                return flight, False
+            flight = self._flights[key] = Future()
+            self.leaders += 1
+            return flight, True
+
+    def finish(self, key: Hashable, flight: Future, result: Any = None, error: BaseException = None):
+        """End a flight, handing its result (or error) to every waiting caller"""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        if error is not None:
+            flight.set_exception(error)
+        else:
+            flight.set_result(result)
+
+    def follower_failed(self, key: Hashable, error: BaseException):
+        """Record that a follower has to redo the work because its leader failed"""
+        with self._lock:
+            self.retried += 1
+        logger.warning(f"{self.name} flight leader failed ({type(error).__name__}), running the call again")
+
+    async def run(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> Any:
+        """Await work() once per key across all concurrent callers"""
+        flight, leader = self.begin(key)
+        if not leader:
+            try:
+                return await asyncio.shield(asyncio.wrap_future(flight))
+            except Exception as e:
+                self.follower_failed(key, e)
+            return await self.run(key, work)
+
+        try:
+            result = await work()
+        except BaseException as e:
+            self.finish(key, flight, error=e if isinstance(e, Exception) else RuntimeError("flight cancelled"))
+            raise
+        self.finish(key, flight, result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many calls ran and how many were collapsed into another call"""
+        with self._lock:
+            calls = self.leaders + self.collapsed
+            return {
+                "calls": calls,
+                "executions": self.leaders,
+                "collapsed": self.collapsed,
+                "collapse_rate": self.collapsed / calls if calls else 0.0,
+                "follower_retries": self.retried,
+                "in_flight": len(self._flights),
+            }
@@ -0,0 +1,163 @@
+# rag_app/vector_index.py
+import math
+from typing import Any, Dict, Optional
+from rag_app.logging_config import logger
+
+# Build an approximate (IVF-PQ) index once the table has at least this many rows.
+# Below this a brute-force scan is fast enough and exact.
+ANN_INDEX_MIN_ROWS = 20000
+
+# Query-time knobs: partitions probed per query, and how many extra candidates
+# (as a multiple of the limit) are re-ranked with exact distances
+ANN_NPROBES = 20
+ANN_REFINE_FACTOR: Optional[int] = None
+
+ANN_METRIC = "L2"
+
+def choose_index_params(row_count: int, dimension: int) -> Dict[str, int]:
+    """Pick IVF partition and PQ sub-vector counts from the table size
+
+    Uses roughly sqrt(rows) partitions and sub-vectors of 8 dimensions
+    (falling back to smaller sub-vectors when the dimension is not divisible).
+
+    Args:
+        row_count: Number of rows in the table
+        dimension: Vector dimension
+
+    Returns:
+        Dictionary with num_partitions and num_sub_vectors
+    """
+    num_partitions = int(math.sqrt(max(row_count, 1)))
+    num_partitions = max(1, min(num_partitions, 4096, row_count))
+
+    num_sub_vectors = 1
+    for sub_vector_dim in (8, 4, 2, 1):
+        if dimension % sub_vector_dim == 0:
+            num_sub_vectors = dimension // sub_vector_dim
+            break
+
+    return {"num_partitions": num_partitions, "num_sub_vectors": num_sub_vectors}
+
+def has_index(table, column: str) -> bool:
+    """Check whether the table has an index (vector or full-text) on a column"""
+    try:
+        indices = table.list_indices()
+    except AttributeError:
+        # Older LanceDB releases do not expose index listings
+        return False
+    except Exception as e:
+        logger.warning(f"Could not list table indices: {str(e)}")
+        return False
+
+    for index in indices:
+        columns = getattr(index, "columns", None) or []
+        if column in columns:
+            return True
+    return False
+
+def has_vector_index(table, vector_column: str = "vector") -> bool:
+    """Check whether the table has an index on its vector column"""
+    return has_index(table, vector_column)
+
+def build_vector_index(table, vector_column: str = "vector", **overrides) -> Dict[str, int]:
+    """Build (or replace) the IVF-PQ index on the vector column
+
+    Args:
+        table: LanceDB table
+        vector_column: Name of the vector column
+        **overrides: num_partitions / num_sub_vectors to use instead of the automatic choice
+
+    Returns:
+        The index parameters that were used
+    """
+    row_count = table.count_rows()
+    dimension = table.schema.field(vector_column).type.list_size
+    params = choose_index_params(row_count, dimension)
+    params.update({key: value for key, value in overrides.items() if value is not None})
+
+    logger.info(f"Building IVF-PQ index on {row_count} rows: {params}")
+    table.create_index(
+        metric=ANN_METRIC,
+        vector_column_name=vector_column,
+        replace=True,
+        **params
+    )
+    return params
+
+def ensure_vector_index(table, min_rows: int = ANN_INDEX_MIN_ROWS, vector_column: str = "vector") -> bool:
+    """Build the vector index once the table is large enough, or fold new rows into it
+
+    Args:
+        table: LanceDB table
+        min_rows: Row count at which an index is built
+        vector_column: Name of the vector column
+
+    Returns:
+        Boolean indicating whether the table is indexed afterwards
+    """
+    try:
+        if has_vector_index(table, vector_column):
+            # Rows written after the index was built are scanned brute-force
+            # until the table is optimized
+            if hasattr(table, "optimize"):
+                table.optimize()
+            return True
+
+        row_count = table.count_rows()
+        if row_count < min_rows:
+            logger.info(f"Table has {row_count} rows (< {min_rows}), using exact search without an index")
+            return False
+
+        build_vector_index(table, vector_column)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to build vector index: {str(e)}")
+        return False
+
+def ensure_fts_index(table, text_column: str = "text", optimize: bool = True) -> bool:
+    """Build the full-text (BM25) index on the text column if it is missing
+
+    Rows written after the index was built are still found by full-text
+    queries (they are scanned), and optimize folds them into the index.
+
+    Args:
+        table: LanceDB table
+        text_column: Name of the text column
+        optimize: Fold new rows into an existing index (skip if the caller optimizes anyway)
+
+    Returns:
+        Boolean indicating whether the table has a full-text index afterwards
+    """
+    try:
+        if has_index(table, text_column):
+            if optimize and hasattr(table, "optimize"):
+                table.optimize()
+            return True
+
+        logger.info(f"Building full-text index on column {text_column}")
+        table.create_fts_index(text_column, use_tantivy=False, replace=True)
+        return True
+    except Exception as e:
+        logger.error(f"Failed to build full-text index: {str(e)}")
+        return False
+
+def apply_search_params(query: Any, nprobes: Optional[int] = None, refine_factor: Optional[int] = None) -> Any:
+    """Apply ANN query-time knobs to a LanceDB vector query
+
+    Both knobs are ignored by LanceDB when the table has no index.
+
+    Args:
+        query: LanceDB vector query builder
+        nprobes: Number of IVF partitions to probe (defaults to ANN_NPROBES)
+        refine_factor: Re-rank limit * refine_factor candidates exactly (defaults to ANN_REFINE_FACTOR)
+
+    Returns:
+        The query builder with the knobs applied
+    """
+    nprobes = ANN_NPROBES if nprobes is None else nprobes
+    refine_factor = ANN_REFINE_FACTOR if refine_factor is None else refine_factor
+    if nprobes:
+        query = query.nprobes(nprobes)
+    if refine_factor:
+        query = query.refine_factor(refine_factor)
+    return query
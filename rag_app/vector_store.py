@@ -0,0 +1,372 @@
+# rag_app/vector_store.py
+import asyncio
+import json
+import os
+import shutil
+import threading
+from typing import Any, Dict, List, Optional, Protocol
+import numpy as np
+from rag_app.compact_vectors import (BINARY_PREFILTER_MULTIPLIER, DEFAULT_VECTOR_STORAGE, code_bytes, get_code_index,
+                                     rescore, sign_codes, storage_of_schema, vector_arrow_type, vector_dtype)
+from rag_app.knowledge_base import TABLE_ID_METADATA_KEY, KnowledgeBaseHandle, new_table_id
+from rag_app.logging_config import logger
+from rag_app.vector_index import apply_search_params
+
+VECTOR_STORE_BACKENDS = ("auto", "lancedb", "numpy")
+
+# Corpora up to this many chunks are searched with one NumPy matmul; larger
+# ones stay on LanceDB, where the ANN index takes over from this size
+NUMPY_STORE_MAX_ROWS = 20000
+
+# Queries of a batch searched at once on LanceDB
+BATCH_SEARCH_CONCURRENCY = 16
+
+# Metadata kept with every chunk besides its vector
+ROW_FIELDS = ("id", "doc_id", "source", "chunk_index", "content_hash", "text")
+
+# Rough stored bytes of a row's fields other than its text and vector
+ROW_METADATA_BYTES = 128
+
+def documents_schema(dimension: int, storage: str = DEFAULT_VECTOR_STORAGE, table_id: Optional[str] = None):
+    """Schema of the documents table: one row per chunk, tagged with its document
+
+    table_id, given when the table is created, is stored in the schema metadata.
+    """
+    import pyarrow as pa
+    fields = [
+        pa.field("id", pa.string()),
+        pa.field("doc_id", pa.string()),
+        pa.field("source", pa.string()),
+        pa.field("chunk_index", pa.int32()),
+        pa.field("content_hash", pa.string()),
+        pa.field("text", pa.string()),
+        pa.field("vector", pa.list_(vector_arrow_type(storage), dimension)),
+    ]
+    if storage == "binary":
+        fields.append(pa.field("code", pa.binary(code_bytes(dimension))))
+    return pa.schema(fields, metadata={TABLE_ID_METADATA_KEY: table_id} if table_id else None)
+
+def documents_batch(rows: List[Dict[str, Any]], vectors: np.ndarray, storage: str = DEFAULT_VECTOR_STORAGE,
+                    table_id: Optional[str] = None):
+    """Build an Arrow table of chunk rows, storing their vectors in the given layout"""
+    import pyarrow as pa
+    dimension = vectors.shape[1]
+    vectors = vectors.astype(vector_dtype(storage))
+    columns = {name: [row[name] for row in rows] for name in ROW_FIELDS}
+    columns["vector"] = pa.FixedSizeListArray.from_arrays(pa.array(vectors.reshape(-1)), dimension)
+    if storage == "binary":
+        columns["code"] = [code.tobytes() for code in sign_codes(vectors)]
+    return pa.table(columns, schema=documents_schema(dimension, storage, table_id))
+
+def estimate_row_bytes(text: str, dimension: int, storage: str = DEFAULT_VECTOR_STORAGE) -> int:
+    """Rough bytes one chunk row takes on disk, for the namespace byte quota"""
+    size = len(text.encode("utf-8")) + ROW_METADATA_BYTES + dimension * np.dtype(vector_dtype(storage)).itemsize
+    if storage == "binary":
+        size += code_bytes(dimension)
+    return size
+
+def choose_vector_store_backend(row_count: int, max_rows: int = NUMPY_STORE_MAX_ROWS) -> str:
+    """Pick the search backend for a corpus size: numpy for small corpora, lancedb otherwise"""
+    return "numpy" if row_count <= max_rows else "lancedb"
+
+def _strip_vectors(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{key: value for key, value in row.items() if key not in ("vector", "code")} for row in rows]
+
+class VectorStore(Protocol):
+    """Storage and nearest-neighbour search of chunk rows and their embeddings
+
+    Rows are dicts with the ROW_FIELDS keys; vectors are a float array with
+    one row per chunk. Search results are rows, closest first, with an L2
+    _distance (for normalized embeddings, 2 - 2 * cosine similarity). The
+    async searches are what the query path uses; they never block the
+    event loop.
+    """
+
+    def create(self, rows: List[Dict[str, Any]], vectors: np.ndarray) -> None:
+        """Replace the whole store with these rows"""
+
+    def append(self, rows: List[Dict[str, Any]], vectors: np.ndarray) -> None:
+        """Add rows, replacing stored rows with the same id"""
+
+    def search(self, query_vector: np.ndarray, limit: int) -> List[Dict[str, Any]]:
+        """Return the limit rows closest to the query vector"""
+
+    async def search_async(self, query_vector: np.ndarray, limit: int, nprobes: Optional[int] = None,
+                           refine_factor: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Async search; nprobes and refine_factor tune an ANN index where the backend has one"""
+
+    async def search_batch_async(self, query_vectors: np.ndarray, limit: int) -> List[List[Dict[str, Any]]]:
+        """Async search of many queries, one result list per query row"""
+
+    def count(self) -> int:
+        """Number of stored rows"""
+
+    def drop(self) -> None:
+        """Delete the store and its data"""
+
+class LanceDBVectorStore:
+    """VectorStore on the LanceDB documents table of a knowledge base handle
+
+    LanceDB is the source of truth of every knowledge base. Writes open the
+    table through the handle's connection, so they see other processes'
+    writes, and invalidate the handle's cached state afterwards; the async
+    searches use the handle's async table, with its ANN index once it has
+    one and the Hamming prefilter for binary storage. A new table is
+    created with storage and a new table id (see TABLE_ID_METADATA_KEY);
+    an existing one keeps the layout it was created with.
+    """
+
+    def __init__(self, handle: KnowledgeBaseHandle, storage: str = DEFAULT_VECTOR_STORAGE):
+        self.handle = handle
+        self.new_table_storage = storage
+        self._table = None
+
+    def table(self):
+        """The table opened for writing, or None if it does not exist"""
+        if self._table is None:
+            db = self.handle.db()
+            if self.handle.table_name not in db.table_names():
+                return None
+            self._table = db.open_table(self.handle.table_name)
+        return self._table
+
+    @property
+    def storage(self) -> str:
+        """Vector layout of the table, or the one create will use if there is no table"""
+        table = self.table()
+        return storage_of_schema(table.schema) if table is not None else self.new_table_storage
+
+    def create(self, rows: List[Dict[str, Any]], vectors: np.ndarray) -> None:
+        data = documents_batch(rows, np.asarray(vectors, dtype=np.float32), self.storage, new_table_id())
+        logger.info(f"Creating LanceDB table {self.handle.table_name} ({self.storage} vectors)")
+        self._table = self.handle.db().create_table(self.handle.table_name, data=data, schema=data.schema,
+                                                    mode="overwrite")
+        self.handle.invalidate()
+
+    def append(self, rows: List[Dict[str, Any]], vectors: np.ndarray) -> None:
+        table = self.table()
+        if table is None:
+            self.create(rows, vectors)
+            return
+        data = documents_batch(rows, np.asarray(vectors, dtype=np.float32), self.storage)
+        table.merge_insert("id").when_matched_update_all().when_not_matched_insert_all().execute(data)
+        self.handle.invalidate()
+
+    def delete(self, where: str) -> None:
+        """Delete the rows matching a LanceDB filter expression"""
+        table = self.table()
+        if table is not None:
+            table.delete(where)
+            self.handle.invalidate()
+
+    def search(self, query_vector: np.ndarray, limit: int) -> List[Dict[str, Any]]:
+        table = self.handle.table()
+        if table is None:
+            return []
+        return _strip_vectors(table.search(np.asarray(query_vector, dtype=np.float32).tolist()).limit(limit).to_list())
+
+    async def search_async(self, query_vector: np.ndarray, limit: int, nprobes: Optional[int] = None,
+                           refine_factor: Optional[int] = None) -> List[Dict[str, Any]]:
+        table = await self.handle.async_table()
+        if table is None:
+            return []
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        if "code" in (await table.schema()).names:
+            return await self._binary_prefilter_search(table, query_vector, limit)
+        search = apply_search_params(table.query().nearest_to(query_vector.tolist()).limit(limit),
+                                     nprobes, refine_factor)
+        return _strip_vectors((await search.to_arrow()).to_pylist())
+
+    async def _binary_prefilter_search(self, table, query_vector: np.ndarray, limit: int) -> List[Dict[str, Any]]:
+        """Hamming-distance prefilter on the sign codes, then exact rescoring of the candidates"""
+        code_index = await get_code_index(table, self.handle.path, self.handle.async_table_key)
+        candidate_ids = code_index.candidates(query_vector, limit * BINARY_PREFILTER_MULTIPLIER)
+        if not candidate_ids:
+            return []
+        id_list = ", ".join("'" + candidate_id.replace("'", "''") + "'" for candidate_id in candidate_ids)
+        rows = (await table.query().where(f"id IN ({id_list})").to_arrow()).to_pylist()
+        return rescore(query_vector, rows, limit)
+
+    async def search_batch_async(self, query_vectors: np.ndarray, limit: int) -> List[List[Dict[str, Any]]]:
+        """Search each query, at most BATCH_SEARCH_CONCURRENCY at a time"""
+        semaphore = asyncio.Semaphore(BATCH_SEARCH_CONCURRENCY)
+
+        async def search_one(query_vector):
+            async with semaphore:
+                return await self.search_async(query_vector, limit)
+        return list(await asyncio.gather(*(search_one(query_vector) for query_vector in query_vectors)))
+
+    def count(self) -> int:
+        table = self.table()
+        return table.count_rows() if table is not None else 0
+
+    def drop(self) -> None:
+        db = self.handle.db()
+        if self.handle.table_name in db.table_names():
+            db.drop_table(self.handle.table_name)
+        self._table = None
+        self.handle.invalidate()
+
+class NumpyVectorStore:
+    """VectorStore as a normalized float32 matrix in a memory-mapped .npy file
+
+    Row metadata lives in a JSON-lines sidecar next to the matrix. A search
+    is one matrix-vector product plus argpartition, which for a few thousand
+    chunks is faster than any index. Files are replaced atomically, so
+    readers in other processes never see a half-written store. The engine
+    keeps one as a mirror of each small documents table, tagged with the
+    table version it copies, and searches it instead of LanceDB.
+    """
+
+    VECTORS_FILE = "vectors.npy"
+    ROWS_FILE = "rows.jsonl"
+    META_FILE = "meta.json"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._rows: List[Dict[str, Any]] = []
+        self._meta: Dict[str, Any] = {}
+        self._loaded = False
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        """Map the matrix and read the sidecar (no-op if already loaded or missing)"""
+        if self._loaded:
+            return
+        if os.path.exists(self._path(self.META_FILE)):
+            with open(self._path(self.META_FILE), encoding="utf-8") as f:
+                self._meta = json.load(f)
+            self._vectors = np.load(self._path(self.VECTORS_FILE), mmap_mode="r")
+            with open(self._path(self.ROWS_FILE), encoding="utf-8") as f:
+                self._rows = [json.loads(line) for line in f]
+            if not len(self._rows) == self._vectors.shape[0] == self._meta.get("rows"):
+                # Caught another process between file replacements; read again next time
+                logger.warning(f"NumPy vector store in {self.directory} is being rewritten, treating it as empty")
+                self._vectors = None
+                self._rows = []
+                self._meta = {}
+                return
+        self._loaded = True
+
+    @property
+    def version(self) -> Optional[Any]:
+        """Version tag the store was written with, or None"""
+        with self._lock:
+            self._load()
+            version = self._meta.get("version")
+        # JSON turns tuple tags into lists
+        return tuple(version) if isinstance(version, list) else version
+
+    def create(self, rows: List[Dict[str, Any]], vectors: np.ndarray, version: Optional[Any] = None) -> None:
+        """Replace the whole store with these rows, tagged with version"""
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(rows), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms > 0, norms, 1.0)
+
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(self.VECTORS_FILE + ".tmp"), "wb") as f:
+                np.save(f, matrix)
+            with open(self._path(self.ROWS_FILE + ".tmp"), "w", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps({name: row[name] for name in ROW_FIELDS}) + "\n")
+            with open(self._path(self.META_FILE + ".tmp"), "w", encoding="utf-8") as f:
+                json.dump({"version": version, "rows": len(rows)}, f)
+            # The meta file goes last: it marks the store as complete
+            os.replace(self._path(self.VECTORS_FILE + ".tmp"), self._path(self.VECTORS_FILE))
+            os.replace(self._path(self.ROWS_FILE + ".tmp"), self._path(self.ROWS_FILE))
+            os.replace(self._path(self.META_FILE + ".tmp"), self._path(self.META_FILE))
+            self._loaded = False
+            self._vectors = None
+            self._load()
+        logger.info(f"Wrote NumPy vector store with {len(rows)} rows to {self.directory}")
+
+    def append(self, rows: List[Dict[str, Any]], vectors: np.ndarray) -> None:
+        with self._lock:
+            self._load()
+            existing_rows = list(self._rows)
+            existing = np.array(self._vectors) if self._vectors is not None else None
+
+        positions = {row["id"]: i for i, row in enumerate(existing_rows)}
+        new_vectors = np.asarray(vectors, dtype=np.float32).reshape(len(rows), -1)
+        added_rows = []
+        added_vectors = []
+        for row, vector in zip(rows, new_vectors):
+            if row["id"] in positions:
+                existing_rows[positions[row["id"]]] = row
+                existing[positions[row["id"]]] = vector
+            else:
+                added_rows.append(row)
+                added_vectors.append(vector)
+
+        if existing is None:
+            matrix = np.asarray(added_vectors, dtype=np.float32).reshape(len(added_rows), -1)
+        elif added_rows:
+            matrix = np.vstack([existing, np.asarray(added_vectors, dtype=np.float32)])
+        else:
+            matrix = existing
+        self.create(existing_rows + added_rows, matrix)
+
+    def search(self, query_vector: np.ndarray, limit: int) -> List[Dict[str, Any]]:
+        """Return the limit rows closest to the query vector"""
+        with self._lock:
+            self._load()
+            vectors, rows = self._vectors, self._rows
+        if vectors is None or not rows or limit <= 0:
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        scores = vectors @ query
+        limit = min(limit, len(rows))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [dict(rows[i], _distance=float(2.0 - 2.0 * scores[i])) for i in top]
+
+    def search_batch(self, query_vectors: np.ndarray, limit: int) -> List[List[Dict[str, Any]]]:
+        """Search many queries with one matrix product, one result list per query row"""
+        with self._lock:
+            self._load()
+            vectors, rows = self._vectors, self._rows
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(-1, vectors.shape[1] if vectors is not None else 1)
+        if vectors is None or not rows or limit <= 0:
+            return [[] for _ in range(len(queries))]
+
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms > 0, norms, 1.0)
+        scores = queries @ vectors.T
+        limit = min(limit, len(rows))
+        top = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+        results = []
+        for query_scores, candidates in zip(scores, top):
+            ordered = candidates[np.argsort(-query_scores[candidates])]
+            results.append([dict(rows[i], _distance=float(2.0 - 2.0 * query_scores[i])) for i in ordered])
+        return results
+
+    async def search_async(self, query_vector: np.ndarray, limit: int, nprobes: Optional[int] = None,
+                           refine_factor: Optional[int] = None) -> List[Dict[str, Any]]:
+        """search on a worker thread (the search is exact, so the ANN knobs do not apply)"""
+        return await asyncio.to_thread(self.search, query_vector, limit)
+
+    async def search_batch_async(self, query_vectors: np.ndarray, limit: int) -> List[List[Dict[str, Any]]]:
+        """search_batch on a worker thread"""
+        return await asyncio.to_thread(self.search_batch, query_vectors, limit)
+
+    def count(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._rows)
+
+    def drop(self) -> None:
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self._vectors = None
+            self._rows = []
+            self._meta = {}
+            self._loaded = False
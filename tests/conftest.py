@@ -0,0 +1,61 @@
+# tests/conftest.py
+import os
+import re
+import sys
+import tempfile
+import zlib
+from typing import List, Union
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The engine reads these at import: answer offline and keep logs out of the repository
+os.environ.setdefault("RAG_GENERATOR_BACKEND", "local")
+os.environ.setdefault("RAG_LOCAL_GENERATOR_LATENCY", "0")
+os.environ.setdefault("RAG_PATH_CHAT_DATA_LOGS", tempfile.mkdtemp(prefix="rag_test_logs_"))
+
+from rag_app.embedding_backends import EmbeddingBackend
+
+def whitespace_tokenizer(texts: List[str], add_special_tokens: bool = False):
+    """Stand-in for a Hugging Face tokenizer: one token per word"""
+    return {"input_ids": [text.split() for text in texts]}
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """Bag-of-words embeddings hashed into a small vector, so texts sharing words are close"""
+
+    name = "hashing"
+
+    def __init__(self, dimension: int = 64):
+        super().__init__("test-hashing")
+        self.dimension = dimension
+        self.tokenizer = whitespace_tokenizer
+
+    def encode(self, texts: Union[str, List[str]], batch_size: int = 32) -> np.ndarray:
+        single = isinstance(texts, str)
+        matrix = np.zeros((1 if single else len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate([texts] if single else texts):
+            for word in re.findall(r"\w+", text.lower()):
+                matrix[row, zlib.crc32(word.encode("utf-8")) % self.dimension] += 1.0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms > 0, norms, 1.0)
+        return matrix[0] if single else matrix
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """rag_engine on an empty knowledge base under tmp_path, with the hashing embedding backend"""
+    from rag_app import rag_engine
+    # Let the import-time model warm-up finish before replacing its outcome
+    rag_engine._model_ready.wait()
+    monkeypatch.setenv("RAG_PATH_CHAT_DATA_KNOWLEDGE_BASE", str(tmp_path / "knowledge_base"))
+    monkeypatch.setattr(rag_engine, "IMPORTS_SUCCESSFUL", True)
+    monkeypatch.setattr(rag_engine, "model", HashingEmbeddingBackend())
+    for name in ("embedding_cache", "answer_cache", "ingestion_jobs"):
+        monkeypatch.setattr(rag_engine, name, None)
+    rag_engine.query_embedding_cache.clear()
+    rag_engine.retrieval_cache.clear()
+    return rag_engine
+
+def make_document(topic: str, sentences: int = 40) -> str:
+    """Text of about 60 characters per sentence about a topic"""
+    return " ".join(f"Sentence {i} explains how {topic} works in part {i}." for i in range(sentences))
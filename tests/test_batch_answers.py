@@ -0,0 +1,22 @@
+# tests/test_batch_answers.py
+from conftest import make_document
+
+def test_unanswerable_questions_are_reported_as_errors(engine):
+    results = engine.answer_questions(["what is hydraulics?", "how do pumps work?"])
+    assert [result["answer"] for result in results] == [None, None]
+    assert all("knowledge base" in result["error"] for result in results)
+    # Single questions still show the message as their answer
+    assert "knowledge base" in engine.answer_question("what is hydraulics?")
+
+def test_answers_and_errors_per_question(engine):
+    assert engine.process_documents(make_document("hydraulics"), source="manual.txt")[0]
+    results = engine.answer_questions(["how does hydraulics work?", "how does hydraulics work?"])
+    assert all(result["answer"] and result["error"] is None for result in results)
+    assert results[0]["answer"] == results[1]["answer"]
+
+def test_embedding_model_mismatch_is_an_error(engine):
+    assert engine.process_documents(make_document("hydraulics"), source="manual.txt")[0]
+    handle = engine.get_kb_handle()
+    handle.write_manifest(dict(handle.manifest(), model_id="another/model"))
+    result, = engine.answer_questions(["how does hydraulics work?"])
+    assert result["answer"] is None and "another/model" in result["error"]
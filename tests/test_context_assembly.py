@@ -0,0 +1,42 @@
+# tests/test_context_assembly.py
+from rag_app.context_assembly import SPAN_SEPARATOR, assemble_context
+
+def count_words(texts):
+    return [len(text.split()) for text in texts]
+
+def words(prefix, count):
+    return " ".join(f"{prefix}{i}" for i in range(count))
+
+def row(doc_id, chunk_index, text):
+    return {"doc_id": doc_id, "chunk_index": chunk_index, "text": text}
+
+def test_overlapping_adjacent_chunks_are_merged():
+    first = words("a", 20)
+    second = words("a", 20)[len(words("a", 15)) + 1:] + " " + words("b", 10)  # Starts with a15..a19
+    context = assemble_context([row("doc", 1, second), row("doc", 0, first)], count_words)
+    assert context == first + " " + words("b", 10)
+
+def test_adjacent_chunks_without_overlap_are_joined_and_gaps_split_spans():
+    results = [row("doc", 0, words("a", 5)), row("doc", 1, words("b", 5)), row("doc", 5, words("c", 5))]
+    assert assemble_context(results, count_words) == (words("a", 5) + " " + words("b", 5) + SPAN_SEPARATOR +
+                                                      words("c", 5))
+
+def test_duplicate_text_is_included_once():
+    results = [row("one", 0, words("a", 10)), row("two", 3, words("a", 10))]
+    assert assemble_context(results, count_words) == words("a", 10)
+
+def test_spans_are_added_by_rank_within_the_budget():
+    results = [row("best", 0, words("a", 60)), row("second", 0, words("b", 30)), row("third", 0, words("c", 30))]
+    context = assemble_context(results, count_words, token_budget=100)
+    spans = context.split(SPAN_SEPARATOR)
+    assert spans == [words("a", 60), words("b", 30)]
+    assert sum(count_words(spans)) <= 100
+
+def test_a_span_over_the_budget_is_split_and_its_best_chunk_kept():
+    results = [row("doc", 1, words("b", 100)), row("doc", 0, words("a", 100)), row("doc", 2, words("c", 100))]
+    context = assemble_context(results, count_words, token_budget=280)
+    spans = context.split(SPAN_SEPARATOR)
+    assert spans[:2] == [words("b", 100), words("a", 100)]
+    # The third chunk is cut at a word boundary to fill the rest of the budget
+    assert spans[2].endswith("...") and spans[2].startswith("c0 c1")
+    assert 0 < len(spans[2].rstrip(".").split()) <= 80
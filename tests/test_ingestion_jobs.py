@@ -0,0 +1,100 @@
+# tests/test_ingestion_jobs.py
+import os
+import socket
+import sqlite3
+import threading
+import time
+import pytest
+from rag_app import ingestion_jobs
+from rag_app.ingestion_jobs import IngestionJobManager, IngestionJobStore
+from conftest import HashingEmbeddingBackend, make_document
+
+class BlockingEmbeddingBackend(HashingEmbeddingBackend):
+    """Blocks its block_on_call-th encode call until released"""
+
+    def __init__(self, block_on_call: int):
+        super().__init__()
+        self.block_on_call = block_on_call
+        self.calls = 0
+        self.blocked = threading.Event()
+        self.release = threading.Event()
+
+    def encode(self, texts, batch_size=32):
+        self.calls += 1
+        if self.calls == self.block_on_call:
+            self.blocked.set()
+            self.release.wait(10)
+        return super().encode(texts, batch_size)
+
+def wait_for_job(engine, job_id, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = engine.get_ingestion_job(job_id)
+        if job["status"] not in ingestion_jobs.ACTIVE_JOB_STATUSES:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Ingestion job {job_id} did not finish")
+
+def cancel_while_embedding(engine, monkeypatch, text, block_on_call):
+    backend = BlockingEmbeddingBackend(block_on_call)
+    monkeypatch.setattr(engine, "model", backend)
+    job_id, _ = engine.submit_ingestion_job(text, source="manual.txt")
+    assert backend.blocked.wait(10)
+    assert engine.cancel_ingestion_job(job_id)
+    backend.release.set()
+    return wait_for_job(engine, job_id)
+
+def test_cancel_within_the_only_partial_batch(engine, monkeypatch):
+    text = make_document("hydraulics")
+    assert len(list(engine.build_chunker().chunk([text]))) < engine.INGEST_BATCH_SIZE
+    job = cancel_while_embedding(engine, monkeypatch, text, block_on_call=1)
+    assert job["status"] == "cancelled"
+    assert engine.list_documents() == []
+
+def test_cancel_after_full_batches_removes_a_new_document(engine, monkeypatch):
+    monkeypatch.setattr(engine, "INGEST_BATCH_SIZE", 8)
+    text = make_document("hydraulics", sentences=200)
+    assert len(list(engine.build_chunker().chunk([text]))) > 2 * 8
+    job = cancel_while_embedding(engine, monkeypatch, text, block_on_call=2)
+    assert job["status"] == "cancelled"
+    assert engine.list_documents() == []
+
+def test_uncancelled_job_succeeds(engine):
+    job_id, _ = engine.submit_ingestion_job(make_document("hydraulics"), source="manual.txt")
+    job = wait_for_job(engine, job_id)
+    assert job["status"] == "succeeded" and job["progress"] == 1.0
+    assert [document["source"] for document in engine.list_documents()] == ["manual.txt"]
+
+def test_submit_releases_its_slot_when_the_job_cannot_be_recorded(tmp_path, monkeypatch):
+    manager = IngestionJobManager(IngestionJobStore(str(tmp_path / "jobs.db")), max_pending=1)
+
+    def fail_create(*args):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(manager.store, "create", fail_create)
+    with pytest.raises(sqlite3.OperationalError):
+        manager.submit(lambda progress: (True, "done"), "default", "a.txt")
+    assert manager.pending() == 0
+
+def test_startup_fails_only_jobs_of_stopped_processes(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    store = IngestionJobStore(path)
+    store.create("mine", "default", "a.txt")
+    now = time.time()
+    host = socket.gethostname()
+    jobs = {
+        "legacy": (None, None),
+        "dead_pid": (f"{host}:999999:token", now),
+        "live": (f"{host}:1:token", now),
+        "stale_heartbeat": (f"{host}:1:token", now - 10 * ingestion_jobs.JOB_STALE_AFTER),
+        "reused_pid": (f"{host}:{os.getpid()}:earlier", now),
+    }
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO ingestion_jobs (id, status, owner, heartbeat_at, created_at) "
+                     "VALUES (?, 'running', ?, ?, ?)", [(job_id, owner, beat, now) for job_id, (owner, beat) in jobs.items()])
+    conn.commit()
+    conn.close()
+
+    IngestionJobStore(path)  # Another app process starting up on the same database
+    statuses = {job["id"]: job["status"] for job in store.list_jobs(limit=10)}
+    assert statuses == {"mine": "queued", "live": "running", "legacy": "failed", "dead_pid": "failed",
+                        "stale_heartbeat": "failed", "reused_pid": "failed"}
@@ -0,0 +1,60 @@
+# tests/test_knowledge_base.py
+import asyncio
+import lancedb
+import numpy as np
+from rag_app.knowledge_base import KnowledgeBaseHandle
+from rag_app.vector_store import documents_batch
+
+def make_batch(start, count):
+    rows = [{"id": f"doc:{i}", "doc_id": "doc", "source": "test", "chunk_index": i,
+             "content_hash": str(i), "text": f"chunk {i}"} for i in range(start, start + count)]
+    return documents_batch(rows, np.ones((count, 4), dtype=np.float32))
+
+class PausingConnection:
+    """Async LanceDB connection that stops inside open_table until resumed"""
+
+    def __init__(self, db):
+        self.db = db
+        self.paused = asyncio.Event()
+        self.resume = asyncio.Event()
+
+    async def table_names(self):
+        return await self.db.table_names()
+
+    async def open_table(self, name):
+        table = await self.db.open_table(name)
+        self.paused.set()
+        await self.resume.wait()
+        return table
+
+def test_refresh_racing_an_invalidate_drops_its_stale_result(tmp_path):
+    path = str(tmp_path / "knowledge_base")
+    table = lancedb.connect(path).create_table("documents", data=make_batch(0, 1))
+    handle = KnowledgeBaseHandle(path, "documents")
+
+    async def scenario():
+        connection = PausingConnection(await lancedb.connect_async(path))
+        handle._async_db = connection
+        refresh = asyncio.ensure_future(handle.async_table())
+        await connection.paused.wait()
+        # An ingest lands while the refresh is between opening the table and reading its state
+        table.add(make_batch(1, 2))
+        handle.invalidate()
+        connection.resume.set()
+        await refresh
+        assert handle.async_row_count == 0
+        await handle.async_table()
+        return handle.async_row_count
+
+    assert asyncio.run(scenario()) == 3
+
+def test_invalidate_makes_the_next_access_see_new_rows(tmp_path):
+    path = str(tmp_path / "knowledge_base")
+    table = lancedb.connect(path).create_table("documents", data=make_batch(0, 2))
+    handle = KnowledgeBaseHandle(path, "documents")
+    assert asyncio.run(handle.exists_async()) and handle.async_row_count == 2
+    table.add(make_batch(2, 1))
+    assert handle.exists() and handle.row_count == 3
+    handle.invalidate()
+    asyncio.run(handle.async_table())
+    assert handle.async_row_count == 3
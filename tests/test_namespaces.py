@@ -0,0 +1,53 @@
+# tests/test_namespaces.py
+import functools
+import pytest
+from rag_app import namespaces
+from rag_app.namespaces import NamespaceQuotaError, check_quota
+from conftest import make_document
+
+QUERY = "how does a volcanic eruption work"
+
+def test_namespaces_are_isolated(engine):
+    assert engine.process_documents(make_document("volcanic eruption"), source="volcanoes.txt", namespace="a")[0]
+    assert engine.process_documents(make_document("photosynthesis"), source="plants.txt", namespace="b")[0]
+    assert {"a", "b"} <= set(engine.get_namespaces())
+    assert {row["source"] for row in engine.search_chunks(QUERY, top_k=5, mode="vector", namespace="a")} == {"volcanoes.txt"}
+    assert {row["source"] for row in engine.search_chunks(QUERY, top_k=5, mode="vector", namespace="b")} == {"plants.txt"}
+    assert not engine.check_knowledge_base_exists()
+
+    assert engine.delete_document(engine.make_document_id("volcanoes.txt"), namespace="b")  # Not in b: no effect
+    assert [doc["source"] for doc in engine.list_documents(namespace="a")] == ["volcanoes.txt"]
+
+def test_row_quota_rejects_the_batch_that_goes_over(engine, monkeypatch):
+    monkeypatch.setattr(engine, "check_quota", functools.partial(check_quota, max_rows=10))
+    success, message = engine.process_documents(make_document("volcanic eruption", sentences=200),
+                                                source="volcanoes.txt", namespace="small")
+    assert not success and "is full" in message
+    assert engine.list_documents(namespace="small") == []
+
+def test_byte_quota_counts_the_incoming_batch(engine, monkeypatch):
+    # The namespace is empty, so only the estimate of the first batch can take it over
+    monkeypatch.setattr(engine, "check_quota", functools.partial(check_quota, max_bytes=4096))
+    success, message = engine.process_documents(make_document("volcanic eruption", sentences=200),
+                                                source="volcanoes.txt", namespace="small")
+    assert not success and "is full" in message
+    assert engine.list_documents(namespace="small") == []
+
+def test_directory_size_is_cached_and_updated_with_writes(tmp_path):
+    (tmp_path / "data").write_bytes(b"x" * 1000)
+    check_quota("ns", str(tmp_path), rows=1, incoming_bytes=400, max_bytes=1500)
+    with pytest.raises(NamespaceQuotaError):
+        check_quota("ns", str(tmp_path), rows=1, incoming_bytes=600, max_bytes=1500)
+
+    (tmp_path / "more").write_bytes(b"x" * 300)  # Not seen until recorded or measured again
+    assert namespaces.cached_directory_size(str(tmp_path)) == 1000
+    namespaces.record_written_bytes(str(tmp_path), 300)
+    assert namespaces.cached_directory_size(str(tmp_path)) == 1300
+    (tmp_path / "data").unlink()
+    namespaces.forget_directory_size(str(tmp_path))
+    assert namespaces.cached_directory_size(str(tmp_path)) == 300
+
+def test_compaction_is_tried_before_rejecting(tmp_path):
+    (tmp_path / "old_version").write_bytes(b"x" * 1000)
+    check_quota("ns", str(tmp_path), rows=1, incoming_bytes=600, max_bytes=1500,
+                compact=lambda: (tmp_path / "old_version").unlink())
@@ -0,0 +1,18 @@
+# tests/test_pdf_extraction.py
+import os
+import subprocess
+import sys
+from rag_app.pdf_extraction import page_ranges
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_worker_module_does_not_set_up_logging():
+    # Spawned workers import only rag_app.pdf_worker; importing logging_config would open a log file in each
+    code = "import sys, rag_app.pdf_worker; print(sorted(m for m in sys.modules if m.startswith('rag_app')))"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "['rag_app', 'rag_app.pdf_worker']"
+
+def test_page_ranges_cover_every_page_once():
+    ranges = page_ranges(100, 4)
+    assert ranges[0][0] == 0 and ranges[-1][1] == 100
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
@@ -0,0 +1,39 @@
+# tests/test_reranker.py
+import threading
+from rag_app.reranker import CrossEncoderReranker
+
+class SlowCrossEncoder:
+    """Scores pairs by shared words, after being released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.batches = 0
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.batches += 1
+        self.release.wait(10)
+        return [len(set(query.split()) & set(text.split())) for query, text in pairs]
+
+def make_results(count):
+    return [{"id": i, "content_hash": str(i), "text": f"chunk {i} about topic {i % 3}"} for i in range(count)]
+
+def test_late_batch_blocks_new_batches_and_fills_the_cache():
+    reranker = CrossEncoderReranker(time_budget=0.05)
+    reranker._model = SlowCrossEncoder()
+    results = make_results(6)
+
+    _, info = reranker.rerank("topic 2", results, 3)
+    assert info["fallback"] == "time budget exceeded"
+    # While the late batch runs, other queries fall back without queueing more work
+    for query in ("topic 0", "topic 1", "chunk 4"):
+        kept, info = reranker.rerank(query, results, 3)
+        assert info["fallback"] == "scorer busy"
+        assert kept == results[:3]
+    assert reranker._executor._work_queue.qsize() == 0
+
+    reranker._model.release.set()
+    reranker._pending.result(timeout=10)
+    reranked, info = reranker.rerank("topic 2", results, 3)
+    assert info["reranked"] and info["cached"] == len(results)
+    assert sorted(row["id"] for row in reranked[:2]) == [2, 5]
+    assert reranker._model.batches == 1
@@ -0,0 +1,30 @@
+# tests/test_retrieval_cache.py
+import pytest
+from rag_app.vector_store import LanceDBVectorStore
+from conftest import make_document
+
+QUERY = "how does a volcanic eruption work"
+
+def test_ingest_invalidates_cached_results(engine):
+    assert engine.process_documents(make_document("photosynthesis"), source="plants.txt")[0]
+    assert engine.search_chunks(QUERY, top_k=3, mode="vector")[0]["source"] == "plants.txt"
+    assert engine.process_documents(make_document("volcanic eruption"), source="volcanoes.txt")[0]
+    assert engine.search_chunks(QUERY, top_k=3, mode="vector")[0]["source"] == "volcanoes.txt"
+
+@pytest.mark.parametrize("backend", ["numpy", "lancedb"])
+def test_recreated_table_at_the_same_version_is_not_served_stale(engine, monkeypatch, backend):
+    monkeypatch.setattr(engine, "VECTOR_STORE_BACKEND", backend)
+    handle = engine.get_kb_handle()
+    assert engine.process_documents(make_document("photosynthesis"), source="plants.txt")[0]
+    assert engine.search_chunks(QUERY, top_k=3, mode="vector")[0]["source"] == "plants.txt"
+    table_id, version = handle.async_table_key
+
+    LanceDBVectorStore(handle).drop()
+    assert engine.process_documents(make_document("volcanic eruption"), source="volcanoes.txt")[0]
+    engine.run_sync(handle.async_table())
+    assert handle.async_version == version  # Versions restart with the new table
+    assert handle.async_table_key[0] != table_id
+
+    assert engine.search_chunks(QUERY, top_k=3, mode="vector")[0]["source"] == "volcanoes.txt"
+    engine.retrieval_cache.clear()  # Also without the cached result, from the NumPy mirror or the table
+    assert {row["source"] for row in engine.search_chunks(QUERY, top_k=3, mode="vector")} == {"volcanoes.txt"}
@@ -0,0 +1,61 @@
+# tests/test_vector_store.py
+import asyncio
+import numpy as np
+import pytest
+from rag_app.knowledge_base import KnowledgeBaseHandle
+from rag_app.vector_store import LanceDBVectorStore, NumpyVectorStore
+from conftest import make_document
+
+def make_rows(count, dimension=16, seed=0, prefix="doc"):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    rows = [{"id": f"{prefix}:{i}", "doc_id": prefix, "source": "test", "chunk_index": i,
+             "content_hash": str(i), "text": f"chunk {i}"} for i in range(count)]
+    return rows, vectors
+
+@pytest.fixture(params=["numpy", "lancedb"])
+def store(request, tmp_path):
+    if request.param == "numpy":
+        return NumpyVectorStore(str(tmp_path / "numpy"))
+    return LanceDBVectorStore(KnowledgeBaseHandle(str(tmp_path / "lancedb"), "documents", check_interval=0))
+
+def test_create_search_count_drop(store):
+    rows, vectors = make_rows(50)
+    store.create(rows, vectors)
+    assert store.count() == 50
+    assert store.search(vectors[7], 3)[0]["id"] == "doc:7"
+    assert asyncio.run(store.search_async(vectors[9], 3))[0]["id"] == "doc:9"
+    batch = asyncio.run(store.search_batch_async(vectors[[1, 2]], 2))
+    assert [results[0]["id"] for results in batch] == ["doc:1", "doc:2"]
+    store.drop()
+    assert store.count() == 0
+
+def test_append_replaces_rows_with_the_same_id(store):
+    rows, vectors = make_rows(10)
+    store.create(rows, vectors)
+    new_rows, new_vectors = make_rows(3, seed=1, prefix="other")
+    store.append([dict(rows[0], text="replaced")] + new_rows, np.vstack([vectors[0:1], new_vectors]))
+    assert store.count() == 13
+    assert store.search(vectors[0], 1)[0]["text"] == "replaced"
+    assert store.search(new_vectors[2], 1)[0]["id"] == "other:2"
+
+def test_backends_agree_on_top_results(tmp_path):
+    rows, vectors = make_rows(200, dimension=32)
+    numpy_store = NumpyVectorStore(str(tmp_path / "numpy"))
+    lance_store = LanceDBVectorStore(KnowledgeBaseHandle(str(tmp_path / "lancedb"), "documents"))
+    numpy_store.create(rows, vectors)
+    lance_store.create(rows, vectors)
+    for query in vectors[:10]:
+        assert ([row["id"] for row in numpy_store.search(query, 5)] ==
+                [row["id"] for row in lance_store.search(query, 5)])
+
+@pytest.mark.parametrize("backend", ["numpy", "lancedb"])
+def test_engine_searches_through_the_selected_backend(engine, monkeypatch, backend):
+    monkeypatch.setattr(engine, "VECTOR_STORE_BACKEND", backend)
+    assert engine.process_documents(make_document("photosynthesis"), source="plants.txt")[0]
+    assert engine.process_documents(make_document("volcanic eruption"), source="volcanoes.txt")[0]
+    results = engine.search_chunks("how does a volcanic eruption work", top_k=3, mode="vector")
+    assert results and all(row["source"] == "volcanoes.txt" for row in results)
+    batch = engine.search_chunks_batch_async  # Same backend for the batch path
+    assert engine.run_sync(batch(["photosynthesis explained"], top_k=2, mode="vector"))[0][0]["source"] == "plants.txt"